@@ -1,5 +1,12 @@
 from sqlalchemy.orm import Session
 from . import models, schemas
+from .services import lookup_index, fleet_rollups
+from .services.scan_engine import section_failed
+from .services.tracing import traced
+from .utils.format_responses import (
+    _format_fetch_aws_resources_response, _format_eks, _format_node_group, _format_rds, _format_elasticsearch,
+    _format_redis, _format_load_balancer, _format_public_ip, _split_resource_sections
+)
 
 def get_asset(db: Session, asset_id: int):
     return db.query(models.Asset).filter(models.Asset.id == asset_id).first()
@@ -15,4 +22,271 @@ def create_asset(db: Session, asset: schemas.AssetCreate):
     db.add(db_asset)
     db.commit()
     db.refresh(db_asset)
-    return db_asset
\ No newline at end of file
+    return db_asset
+
+@traced
+def create_aws_resource(db: Session, env_id: int, resources: dict):
+    """Persist a scan result from any ScanEngine provider; the caller commits."""
+    aws_resource = models.AWSResource(env_id=env_id)
+    db.add(aws_resource)
+    db.flush()
+
+    if resources.get("eks") and not resources["eks"].get("error"):
+        _add_eks(db, aws_resource, resources["eks"])
+    if resources.get("rds") and not resources["rds"].get("error"):
+        _add_rds(db, aws_resource, resources["rds"])
+    if resources.get("elasticsearch") and not resources["elasticsearch"].get("error"):
+        _add_elasticsearch(db, aws_resource, resources["elasticsearch"])
+    if resources.get("redis") and not resources["redis"].get("error"):
+        _add_redis(db, aws_resource, resources["redis"])
+    _add_load_balancers(aws_resource, resources.get("load_balancers") or [])
+    _add_public_ips(aws_resource, resources.get("public_ips") or [])
+
+    lookup_index.reindex(db, env_id, lookup_index.SCAN, lookup_index.scan_entries(resources))
+    fleet_rollups.refresh_environment(db, env_id)
+    return aws_resource
+
+def _build_eks(eks_data: dict, **keys) -> models.EKSCluster:
+    return models.EKSCluster(
+        **keys,
+        name=eks_data["name"],
+        status=eks_data.get("status"),
+        kubernetes_version=eks_data.get("kubernetes_version"),
+        endpoint=eks_data.get("endpoint"),
+        arn=eks_data.get("arn"),
+        vpc_id=eks_data.get("vpc_id"),
+        subnet_ids=eks_data.get("subnet_ids"),
+        nat_gateway_ips=eks_data.get("nat_gateway_ips"),
+        total_nodes=eks_data.get("total_nodes")
+    )
+
+def _build_node_group(ng: dict, **keys) -> models.EKSNodeGroup:
+    return models.EKSNodeGroup(
+        **keys,
+        name=ng["name"],
+        instance_types=ng.get("instance_types"),
+        desired_size=ng.get("desired_size"),
+        min_size=ng.get("min_size"),
+        max_size=ng.get("max_size"),
+        status=ng.get("status")
+    )
+
+def _build_rds(rds_data: dict, **keys) -> models.RDSInstance:
+    perf = rds_data.get("performance", {})
+    return models.RDSInstance(
+        **keys,
+        identifier=rds_data["identifier"],
+        endpoint=rds_data.get("endpoint"),
+        status=rds_data.get("status"),
+        engine=rds_data.get("engine"),
+        engine_version=rds_data.get("engine_version"),
+        instance_class=rds_data.get("instance_class"),
+        allocated_storage_gb=rds_data.get("allocated_storage_gb"),
+        multi_az=rds_data.get("multi_az", False),
+        storage_encrypted=rds_data.get("storage_encrypted", False),
+        cpu_percent=perf.get("cpu_percent"),
+        free_storage_gb=perf.get("free_storage_gb"),
+        connections=perf.get("connections")
+    )
+
+def _build_elasticsearch(es_data: dict, **keys) -> models.ElasticSearch:
+    return models.ElasticSearch(
+        **keys,
+        domain_name=es_data["domain_name"],
+        status=es_data.get("status"),
+        version=es_data.get("version"),
+        endpoint=es_data.get("endpoint"),
+        instance_type=es_data.get("instance_type"),
+        instance_count=es_data.get("instance_count"),
+        volume_size_gb=es_data.get("volume_size_gb")
+    )
+
+def _build_redis(redis_data: dict, **keys) -> models.RedisCache:
+    return models.RedisCache(
+        **keys,
+        name=redis_data["name"],
+        resource_id=redis_data.get("resource_id"),
+        host=redis_data.get("host"),
+        port=redis_data.get("port"),
+        status=redis_data.get("status"),
+        engine_version=redis_data.get("engine_version"),
+        node_type=redis_data.get("node_type"),
+        shard_count=redis_data.get("shard_count")
+    )
+
+def _build_load_balancer(lb_data: dict) -> models.LoadBalancer:
+    created_time = lb_data.get("created_time")
+    return models.LoadBalancer(
+        name=lb_data["name"],
+        arn=lb_data.get("arn"),
+        dns_name=lb_data.get("dns_name"),
+        type=lb_data.get("type"),
+        scheme=lb_data.get("scheme"),
+        state=lb_data.get("state"),
+        vpc_id=lb_data.get("vpc_id"),
+        availability_zones=lb_data.get("availability_zones"),
+        security_groups=lb_data.get("security_groups"),
+        ip_address_type=lb_data.get("ip_address_type"),
+        hosted_zone_id=lb_data.get("hosted_zone_id"),
+        # AWS returns UTC; the column is naive and keeps the wall time either way
+        created_time=created_time.replace(tzinfo=None) if created_time else None,
+        attributes=lb_data.get("attributes"),
+        tags=lb_data.get("tags"),
+        target_groups=[
+            models.TargetGroup(
+                name=tg["name"],
+                arn=tg.get("arn"),
+                protocol=tg.get("protocol"),
+                port=tg.get("port"),
+                target_type=tg.get("target_type"),
+                health_check=tg.get("health_check"),
+                healthy_count=tg.get("healthy_count"),
+                unhealthy_count=tg.get("unhealthy_count"),
+                targets=tg.get("targets")
+            )
+            for tg in lb_data.get("target_groups", [])
+        ],
+        listeners=[
+            models.LoadBalancerListener(
+                arn=listener.get("arn"),
+                protocol=listener.get("protocol"),
+                port=listener.get("port"),
+                ssl_policy=listener.get("ssl_policy"),
+                certificates=listener.get("certificates"),
+                default_actions=listener.get("default_actions")
+            )
+            for listener in lb_data.get("listeners", [])
+        ]
+    )
+
+def _build_public_ip(ip_data: dict) -> models.PublicIP:
+    return models.PublicIP(
+        public_ip=ip_data["public_ip"],
+        private_ip=ip_data.get("private_ip"),
+        allocation_id=ip_data.get("allocation_id"),
+        association_id=ip_data.get("association_id"),
+        domain=ip_data.get("domain"),
+        instance_id=ip_data.get("instance_id"),
+        network_interface_id=ip_data.get("network_interface_id"),
+        source_type=ip_data.get("source_type"),
+        source_id=ip_data.get("source_id"),
+        source_name=ip_data.get("source_name"),
+        tags=ip_data.get("tags")
+    )
+
+def _add_eks(db: Session, aws_resource: models.AWSResource, eks_data: dict):
+    eks = _build_eks(eks_data, aws_resource_id=aws_resource.id)
+    db.add(eks)
+    db.flush()
+    _add_node_groups(db, eks, eks_data.get("node_groups", []))
+
+def _add_node_groups(db: Session, eks: models.EKSCluster, node_groups: list):
+    for ng in node_groups:
+        db.add(_build_node_group(ng, eks_cluster_id=eks.id))
+
+def _add_rds(db: Session, aws_resource: models.AWSResource, rds_data: dict):
+    db.add(_build_rds(rds_data, aws_resource_id=aws_resource.id))
+
+def _add_elasticsearch(db: Session, aws_resource: models.AWSResource, es_data: dict):
+    db.add(_build_elasticsearch(es_data, aws_resource_id=aws_resource.id))
+
+def _add_redis(db: Session, aws_resource: models.AWSResource, redis_data: dict):
+    db.add(_build_redis(redis_data, aws_resource_id=aws_resource.id))
+
+def _add_load_balancers(aws_resource: models.AWSResource, load_balancers: list):
+    for lb_data in load_balancers:
+        aws_resource.load_balancers.append(_build_load_balancer(lb_data))
+
+def _add_public_ips(aws_resource: models.AWSResource, public_ips: list):
+    for ip_data in public_ips:
+        aws_resource.public_ips.append(_build_public_ip(ip_data))
+
+def format_scan_section(section: str, data):
+    """A section as iter_cluster_resources yields it, in the shape the stored response gives it.
+
+    Built into unsaved models and run through the same formatters, so a streamed section
+    matches its cached counterpart. Failed and empty sections pass through unchanged.
+    """
+    if not data or section_failed(data):
+        return data
+    if section == "eks":
+        return _split_resource_sections({"eks": _format_eks(_build_eks(data))})["eks"]
+    if section == "node_groups":
+        return {"node_groups": [_format_node_group(_build_node_group(ng)) for ng in data.get("node_groups", [])],
+                "total_nodes": data.get("total_nodes")}
+    if section == "rds":
+        return _format_rds(_build_rds(data))
+    if section == "elasticsearch":
+        return _format_elasticsearch(_build_elasticsearch(data))
+    if section == "redis":
+        return _format_redis(_build_redis(data))
+    if section == "load_balancers":
+        return [_format_load_balancer(_build_load_balancer(lb)) for lb in data]
+    if section == "public_ips":
+        return [_format_public_ip(_build_public_ip(ip)) for ip in data]
+    return data
+
+def update_rds_metrics(db: Session, aws_resource: models.AWSResource, performance: dict):
+    """Update only the CloudWatch-backed RDS columns in place; the caller commits."""
+    if aws_resource.rds:
+        aws_resource.rds.cpu_percent = performance.get("cpu_percent")
+        aws_resource.rds.free_storage_gb = performance.get("free_storage_gb")
+        aws_resource.rds.connections = performance.get("connections")
+    aws_resource.metrics_last_synced = models.ist_now()
+    return aws_resource
+
+@traced
+def replace_sections(db: Session, aws_resource: models.AWSResource, sections: dict):
+    """Swap freshly scanned sections into an existing scan, leaving the others untouched.
+
+    Sections that came back with an error keep their stored data. The caller commits.
+    """
+    def scanned(section: str) -> bool:
+        return sections.get(section) is not None and not section_failed(sections[section])
+
+    eks_data = sections.get("eks")
+    if eks_data and not eks_data.get("error"):
+        if aws_resource.eks:
+            for field in ("name", "status", "kubernetes_version", "endpoint", "arn", "vpc_id", "subnet_ids"):
+                setattr(aws_resource.eks, field, eks_data.get(field))
+        else:
+            _add_eks(db, aws_resource, {**eks_data, "node_groups": []})
+            db.expire(aws_resource, ["eks"])
+
+    eks = aws_resource.eks
+    if eks and scanned("node_groups"):
+        for node_group in list(eks.node_groups):
+            db.delete(node_group)
+        db.flush()
+        _add_node_groups(db, eks, sections["node_groups"]["node_groups"])
+        eks.total_nodes = sections["node_groups"]["total_nodes"]
+        db.expire(eks, ["node_groups"])
+    if eks and scanned("nat_gateway_ips"):
+        eks.nat_gateway_ips = sections["nat_gateway_ips"]
+
+    for section, relation, add in (("rds", "rds", _add_rds), ("elasticsearch", "elasticsearch", _add_elasticsearch),
+                                 ("redis", "redis", _add_redis)):
+        data = sections.get(section)
+        if data and not data.get("error"):
+            if getattr(aws_resource, relation):
+                db.delete(getattr(aws_resource, relation))
+                db.flush()
+            add(db, aws_resource, data)
+            db.expire(aws_resource, [relation])
+
+    if scanned("load_balancers"):
+        aws_resource.load_balancers.clear()
+        db.flush()
+        _add_load_balancers(aws_resource, sections["load_balancers"])
+    if scanned("public_ips"):
+        aws_resource.public_ips.clear()
+        db.flush()
+        _add_public_ips(aws_resource, sections["public_ips"])
+
+    aws_resource.last_synced = models.ist_now()
+    db.flush()
+
+    resources = _format_fetch_aws_resources_response(None, None, None, aws_resource)["resources"]
+    lookup_index.reindex(db, aws_resource.env_id, lookup_index.SCAN, lookup_index.scan_entries(resources))
+    fleet_rollups.refresh_environment(db, aws_resource.env_id)
+    return aws_resource
@@ -1,10 +1,10 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Header, status
 from fastapi.security import OAuth2PasswordBearer
-import requests
-from jose import jwt
 from app.database import SessionLocal
+from app.services.tracing import traced
 from sqlalchemy.orm import Session
 import os 
+import hmac
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -17,15 +17,24 @@ def get_db():
 
 GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
 _google_certs = {}
+jwks_cache_stats = {"hits": 0, "misses": 0}
 
+@traced
 def get_google_certs():
     global _google_certs
     if not _google_certs:
+        import requests
+        jwks_cache_stats["misses"] += 1
         response = requests.get(GOOGLE_CERTS_URL)
         _google_certs = response.json()
+    else:
+        jwks_cache_stats["hits"] += 1
     return _google_certs
 
+@traced
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    # python-jose loads its crypto backends on import; the startup warmup imports it ahead of the first request
+    from jose import jwt
     try:
         certs = get_google_certs()
         
@@ -79,4 +88,12 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise HTTPException(status_code=401, detail="Incorrect claims, check audience/issuer")
     except Exception as e:
         print(f"DEBUG: Validation Error: {e}")
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+
+def verify_event_token(x_event_token: str = Header(None)):
+    """Shared-secret check for machine callers such as EventBridge API destinations"""
+    expected = os.getenv("EVENT_INGEST_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=500, detail="Event ingestion token not configured")
+    if not x_event_token or not hmac.compare_digest(x_event_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid event token")
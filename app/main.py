@@ -1,12 +1,36 @@
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from . import models
+from starlette.concurrency import run_in_threadpool
+from . import dependencies
 from .database import engine
+from .migrations import migrate
 from .routers import cloud
+from .services import instrumentation, tracing, event_ingestion, warmup
+from .services.cache import inventory_cache
 
-models.Base.metadata.create_all(bind=engine)
+# For local runs and single-instance deploys; elsewhere run app/scripts/init_db.py once per release
+MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "false").lower() == "true"
 
-app = FastAPI(title="SRE Stack Catalogue API")
+instrumentation.instrument_engine(engine)
+tracing.instrument_engine(engine)
+instrumentation.register_cache_stats("inventory", lambda: inventory_cache.stats)
+instrumentation.register_cache_stats("jwks", lambda: dependencies.jwks_cache_stats)
+instrumentation.register_queue_depth("event_refresh", event_ingestion.event_batcher.pending)
+
+# Importing the app touches neither the database nor AWS: the schema is migrated by
+# app/scripts/init_db.py, and the pool, JWKS and boto3 models are warmed here
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Unlike the warmup, the migration has no time limit and a failure aborts startup
+    if MIGRATE_ON_STARTUP:
+        await run_in_threadpool(migrate, engine)
+    await warmup.warm_up()
+    yield
+    engine.dispose()
+
+app = FastAPI(title="SRE Stack Catalogue API", lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",  
@@ -21,8 +45,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(instrumentation.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+
 app.include_router(cloud.router)
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = instrumentation.render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/")
 def read_root():
     return {"message": "SRE Backend is running!"}
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""Schema management, run once per deploy instead of on every worker import.
+
+    python app/scripts/init_db.py
+
+creates the tables that are missing, then adds the columns and indexes the models
+gained after a table was created, which create_all() alone never does. Nothing is
+dropped or altered; anything that needs that is a manual migration.
+"""
+import logging
+from typing import Dict, List
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from app import models
+
+logger = logging.getLogger(__name__)
+
+def migrate(engine: Engine) -> Dict[str, List[str]]:
+    """Bring the database up to the models; returns what was created"""
+    applied = {"tables": [], "columns": [], "indexes": []}
+    existing = set(inspect(engine).get_table_names())
+    missing_tables = [table for table in models.Base.metadata.sorted_tables if table.name not in existing]
+    models.Base.metadata.create_all(bind=engine, tables=missing_tables)
+    applied["tables"] = [table.name for table in missing_tables]
+
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in models.Base.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    logger.warning(f"Cannot add NOT NULL column {table.name}.{column.name} without a default, migrate it by hand")
+                    continue
+                table_name = conn.dialect.identifier_preparer.format_table(table)
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}"))
+                applied["columns"].append(f"{table.name}.{column.name}")
+
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(bind=conn)
+                    applied["indexes"].append(index.name)
+
+    for kind, names in applied.items():
+        if names:
+            logger.info(f"Created {kind}: {', '.join(names)}")
+    return applied
+
+def missing_tables(engine: Engine) -> List[str]:
+    """Tables the models expect that the database lacks; a single catalogue query"""
+    existing = set(inspect(engine).get_table_names())
+    return [table.name for table in models.Base.metadata.sorted_tables if table.name not in existing]
@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Float, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Float, DateTime, JSON, LargeBinary, UniqueConstraint, BigInteger, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
 import pytz
 
+def ist_now():
+    return datetime.now(pytz.timezone('Asia/Kolkata'))
+
 class Environment(Base):
     __tablename__ = "environments"
 
@@ -26,6 +29,8 @@ class Environment(Base):
     data_store = relationship("DataStore", back_populates="environment", uselist=False, cascade="all, delete-orphan")
     application = relationship("Application", back_populates="environment", uselist=False, cascade="all, delete-orphan")
     aws_resources = relationship("AWSResource", back_populates="environment", uselist=False, cascade="all, delete-orphan")
+    lookup_entries = relationship("ResourceLookup", back_populates="environment", cascade="all, delete-orphan")
+    rollup_contributions = relationship("FleetRollupContribution", back_populates="environment", cascade="all, delete-orphan")
 
 class Infrastructure(Base):
     __tablename__ = "infrastructure"
@@ -108,12 +113,18 @@ class AWSResource(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     env_id = Column(Integer, ForeignKey("environments.id"), unique=True, nullable=False)
-    last_synced = Column(DateTime, default=lambda: datetime.now(pytz.timezone('Asia/Kolkata')), onupdate=lambda: datetime.now(pytz.timezone('Asia/Kolkata')))
+    last_synced = Column(DateTime, default=ist_now, onupdate=ist_now)
+    # Topology (describe calls) and CloudWatch metrics are refreshed on separate TTLs
+    topology_last_synced = Column(DateTime, default=ist_now, nullable=True)
+    metrics_last_synced = Column(DateTime, default=ist_now, nullable=True)
 
     environment = relationship("Environment", back_populates="aws_resources")
     eks = relationship("EKSCluster", back_populates="aws_resource", uselist=False, cascade="all, delete-orphan")
     rds = relationship("RDSInstance", back_populates="aws_resource", uselist=False, cascade="all, delete-orphan")
     elasticsearch = relationship("ElasticSearch", back_populates="aws_resource", uselist=False, cascade="all, delete-orphan")
+    redis = relationship("RedisCache", back_populates="aws_resource", uselist=False, cascade="all, delete-orphan")
+    load_balancers = relationship("LoadBalancer", back_populates="aws_resource", cascade="all, delete-orphan")
+    public_ips = relationship("PublicIP", back_populates="aws_resource", cascade="all, delete-orphan")
 
 class EKSCluster(Base):
     __tablename__ = "eks_clusters"
@@ -184,4 +195,164 @@ class ElasticSearch(Base):
     instance_count = Column(Integer, nullable=True)
     volume_size_gb = Column(Integer, nullable=True)
 
-    aws_resource = relationship("AWSResource", back_populates="elasticsearch")
\ No newline at end of file
+    aws_resource = relationship("AWSResource", back_populates="elasticsearch")
+
+class RedisCache(Base):
+    __tablename__ = "redis_caches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    aws_resource_id = Column(Integer, ForeignKey("aws_resources.id"), unique=True, nullable=False)
+
+    name = Column(String, nullable=False)
+    resource_id = Column(String, nullable=True)
+    host = Column(String, nullable=True)
+    port = Column(Integer, nullable=True)
+    status = Column(String, nullable=True)
+    engine_version = Column(String, nullable=True)
+    node_type = Column(String, nullable=True)
+    shard_count = Column(Integer, nullable=True)
+
+    aws_resource = relationship("AWSResource", back_populates="redis")
+
+class LoadBalancer(Base):
+    __tablename__ = "load_balancers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    aws_resource_id = Column(Integer, ForeignKey("aws_resources.id"), nullable=False, index=True)
+
+    name = Column(String, nullable=False)
+    arn = Column(String, nullable=True)
+    dns_name = Column(String, nullable=True)
+    type = Column(String, nullable=True)
+    scheme = Column(String, nullable=True)
+    state = Column(String, nullable=True)
+    vpc_id = Column(String, nullable=True)
+    availability_zones = Column(JSON, nullable=True)
+    security_groups = Column(JSON, nullable=True)
+    ip_address_type = Column(String, nullable=True)
+    hosted_zone_id = Column(String, nullable=True)
+    created_time = Column(DateTime, nullable=True)
+    attributes = Column(JSON, nullable=True)
+    tags = Column(JSON, nullable=True)
+
+    aws_resource = relationship("AWSResource", back_populates="load_balancers")
+    target_groups = relationship("TargetGroup", back_populates="load_balancer", cascade="all, delete-orphan")
+    listeners = relationship("LoadBalancerListener", back_populates="load_balancer", cascade="all, delete-orphan")
+
+class TargetGroup(Base):
+    __tablename__ = "target_groups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    load_balancer_id = Column(Integer, ForeignKey("load_balancers.id"), nullable=False, index=True)
+
+    name = Column(String, nullable=False)
+    arn = Column(String, nullable=True)
+    protocol = Column(String, nullable=True)
+    port = Column(Integer, nullable=True)
+    target_type = Column(String, nullable=True)
+    health_check = Column(JSON, nullable=True)
+    healthy_count = Column(Integer, nullable=True)
+    unhealthy_count = Column(Integer, nullable=True)
+    targets = Column(JSON, nullable=True)
+
+    load_balancer = relationship("LoadBalancer", back_populates="target_groups")
+
+class LoadBalancerListener(Base):
+    __tablename__ = "load_balancer_listeners"
+
+    id = Column(Integer, primary_key=True, index=True)
+    load_balancer_id = Column(Integer, ForeignKey("load_balancers.id"), nullable=False, index=True)
+
+    arn = Column(String, nullable=True)
+    protocol = Column(String, nullable=True)
+    port = Column(Integer, nullable=True)
+    ssl_policy = Column(String, nullable=True)
+    certificates = Column(JSON, nullable=True)
+    default_actions = Column(JSON, nullable=True)
+
+    load_balancer = relationship("LoadBalancer", back_populates="listeners")
+
+class PublicIP(Base):
+    __tablename__ = "public_ips"
+
+    id = Column(Integer, primary_key=True, index=True)
+    aws_resource_id = Column(Integer, ForeignKey("aws_resources.id"), nullable=False, index=True)
+
+    public_ip = Column(String, nullable=False, index=True)
+    private_ip = Column(String, nullable=True)
+    allocation_id = Column(String, nullable=True)
+    association_id = Column(String, nullable=True)
+    domain = Column(String, nullable=True)
+    instance_id = Column(String, nullable=True)
+    network_interface_id = Column(String, nullable=True)
+    source_type = Column(String, nullable=True)
+    source_id = Column(String, nullable=True)
+    source_name = Column(String, nullable=True)
+    tags = Column(JSON, nullable=True)
+
+    aws_resource = relationship("AWSResource", back_populates="public_ips")
+
+class MetricBlock(Base):
+    """Fixed-interval utilization history for one resource metric.
+
+    Each row covers a block of slots at one resolution; values holds a packed
+    float32 array with NaN for slots without a datapoint.
+    """
+    __tablename__ = "metric_blocks"
+    __table_args__ = (
+        UniqueConstraint("resource_type", "resource_name", "metric", "resolution_seconds", "block_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    resource_type = Column(String, nullable=False)
+    resource_name = Column(String, nullable=False, index=True)
+    metric = Column(String, nullable=False)
+    resolution_seconds = Column(Integer, nullable=False)
+    block_start = Column(DateTime, nullable=False, index=True)
+    values = Column(LargeBinary, nullable=False)
+
+class ResourceLookup(Base):
+    """Reverse index from identifiers (IPs, CIDRs, endpoints, ARNs, VPC/subnet IDs) to their environment.
+
+    Rows are replaced per environment and source ("scan" or "catalogue") whenever
+    that source writes new data. IPv4 values and CIDRs also carry their address
+    range so containment and overlap queries can use the range index.
+    """
+    __tablename__ = "resource_lookup"
+    __table_args__ = (
+        Index("ix_resource_lookup_value_prefix", "value", postgresql_ops={"value": "text_pattern_ops"}),
+        Index("ix_resource_lookup_ip_range", "ip_start", "ip_end"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    env_id = Column(Integer, ForeignKey("environments.id"), nullable=False, index=True)
+    source = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    value = Column(String, nullable=False, index=True)
+    ip_start = Column(BigInteger, nullable=True)
+    ip_end = Column(BigInteger, nullable=True)
+
+    environment = relationship("Environment", back_populates="lookup_entries")
+
+class FleetRollup(Base):
+    """Fleet-wide aggregate for one dimension key, maintained incrementally on every scan and import"""
+    __tablename__ = "fleet_rollups"
+    __table_args__ = (UniqueConstraint("dimension", "key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    dimension = Column(String, nullable=False, index=True)
+    key = Column(String, nullable=False)
+    total = Column(Float, nullable=False, default=0)
+    environments = Column(Integer, nullable=False, default=0)
+
+class FleetRollupContribution(Base):
+    """What one environment currently adds to each rollup, so updates can apply deltas"""
+    __tablename__ = "fleet_rollup_contributions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    env_id = Column(Integer, ForeignKey("environments.id"), nullable=False, index=True)
+    dimension = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+
+    environment = relationship("Environment", back_populates="rollup_contributions")
@@ -1,136 +1,518 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+import threading
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import Optional
-from app import models
-from app.dependencies import get_current_user, get_db
-from app.utils.format_responses import _format_fetch_aws_resources_response
-from app.services.cloud_services import AWSResourceService
+from datetime import datetime, timedelta
+from typing import Dict, Optional, List, Union
+from app import models, crud
+from app.database import SessionLocal
+from app.dependencies import get_current_user, get_db, verify_event_token
+from app.utils.format_responses import _format_fetch_aws_resources_response, _format_sse_event, _split_resource_sections
+from app.services.scan_engine import ScanEngine, section_failed
+from app.services import metric_history, lookup_index, fleet_rollups, providers
+from app.services import event_ingestion
+from app.services.cache import inventory_cache, inventory_key, cluster_env_key, invalidate_cluster
+from app.services.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api", tags=["AWS Resources"])
 
-@router.get("/fetchCloudResources")
-async def fetch_cloud_resources(
-    cluster_name: str = Query(..., description="EKS cluster name"),
-    account_id: str = Query(..., description="AWS account ID"),
-    region: str = Query(..., description="AWS region"),
-    force_refresh: bool = Query(False, description="Force refresh from AWS"),
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Fetch AWS resources for a given cluster (requires authentication)"""
-    
+# Utilization moves minute to minute; versions, ARNs, subnets and sizing rarely do
+METRICS_REFRESH_TTL = timedelta(seconds=int(os.getenv("METRICS_REFRESH_TTL_SECONDS", "300")))
+TOPOLOGY_REFRESH_TTL = timedelta(seconds=int(os.getenv("TOPOLOGY_REFRESH_TTL_SECONDS", "86400")))
+# CloudWatch serves at most 1440 datapoints per call, i.e. 5 days at 5 minute periods
+MAX_HISTORY_BACKFILL = timedelta(days=3)
+
+# Full rescans of one environment run one at a time in this worker; across workers
+# _store_scan's environment row lock keeps their writes apart
+_rescan_locks: Dict[int, threading.Lock] = {}
+_rescan_locks_lock = threading.Lock()
+
+def _rescan_lock(env_id: int) -> threading.Lock:
+    with _rescan_locks_lock:
+        return _rescan_locks.setdefault(env_id, threading.Lock())
+
+def _get_aws_credentials():
     aws_key = os.getenv("AWS_ACCESS_KEY_ID")
     aws_secret = os.getenv("AWS_SECRET_ACCESS_KEY")
     aws_token = os.getenv("AWS_SESSION_TOKEN")
-    
+
     if not all([aws_key, aws_secret, aws_token]):
         raise HTTPException(status_code=500, detail="AWS credentials not configured")
-    
+    return aws_key, aws_secret, aws_token
+
+@traced
+def _get_scanner(env_record: models.Environment, region: str) -> ScanEngine:
+    """AWS or Azure scanner, routed by the environment's cloud_platform"""
+    try:
+        return providers.get_provider(env_record, region)
+    except providers.UnsupportedPlatform as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except providers.ProviderNotConfigured as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@traced
+def _get_env_record(db: Session, cluster_name: str) -> models.Environment:
+    env_id = inventory_cache.get(cluster_env_key(cluster_name))
+    env_record = db.get(models.Environment, env_id) if env_id else None
+    if env_record:
+        return env_record
+
     env_record = db.query(models.Environment).join(
         models.Cluster
     ).filter(
         models.Cluster.cluster_name == cluster_name
     ).first()
-    
+
     if not env_record:
         raise HTTPException(status_code=404, detail="Cluster not found in database")
+    inventory_cache.set(cluster_env_key(cluster_name), env_record.id)
+    return env_record
+
+@traced
+def _get_cached_response(cluster_name: str, account_id: str, region: str) -> Optional[dict]:
+    """Serve a fresh inventory document from the shared cache without touching the DB"""
+    resources = inventory_cache.get(inventory_key(cluster_name))
+    if not resources:
+        return None
+    for synced, ttl in (("topology_last_synced", TOPOLOGY_REFRESH_TTL), ("metrics_last_synced", METRICS_REFRESH_TTL)):
+        if not resources.get(synced) or _is_stale(datetime.fromisoformat(resources[synced]), ttl):
+            return None
+    return {
+        "success": True,
+        "cluster_name": cluster_name,
+        "account_id": account_id,
+        "region": region,
+        "resources": {**resources, "cluster_name": cluster_name, "region": region}
+    }
+
+@traced
+def _cache_response(cluster_name: str, response: dict, invalidate: bool = False) -> dict:
+    # Invalidation is published so other workers drop their local copy of the old scan
+    if invalidate:
+        invalidate_cluster(cluster_name)
+    inventory_cache.set(inventory_key(cluster_name), response["resources"])
+    return response
+
+def _is_stale(last_synced: Optional[datetime], ttl: timedelta) -> bool:
+    if last_synced is None:
+        return True
+    now = models.ist_now().replace(tzinfo=None)
+    return now - last_synced.replace(tzinfo=None) > ttl
+
+def _history_minutes(last_synced: Optional[datetime]) -> int:
+    """CloudWatch window that reaches back to the previous metrics read, so the history has no gaps"""
+    window = MAX_HISTORY_BACKFILL
+    if last_synced:
+        elapsed = models.ist_now().replace(tzinfo=None) - last_synced.replace(tzinfo=None)
+        window = min(elapsed + timedelta(minutes=10), MAX_HISTORY_BACKFILL)
+    return max(int(window.total_seconds() // 60), 10)
+
+@traced
+def _fetch_metric_series(scanner: ScanEngine, rds_identifier: Optional[str], es_domain: Optional[str],
+                         account_id: str, last_synced: Optional[datetime]) -> Dict[tuple, Dict]:
+    """(resource_type, resource_name) -> metric series since the previous read"""
+    minutes = _history_minutes(last_synced)
+    fetched = {}
+    if rds_identifier:
+        fetched[("rds", rds_identifier)] = scanner.get_rds_metric_series(rds_identifier, minutes)
+    if es_domain:
+        fetched[("elasticsearch", es_domain)] = scanner.get_es_metric_series(es_domain, account_id, minutes)
+    return fetched
+
+def _record_metric_history(db: Session, fetched: Dict[tuple, Dict]):
+    for (resource_type, resource_name), series in fetched.items():
+        metric_history.record_series(db, resource_type, resource_name, series)
+    metric_history.evict_expired_if_due(db)
+
+@traced
+def _refresh_metrics(db: Session, scanner: ScanEngine, aws_resource: models.AWSResource, account_id: str):
+    """Fast tier: re-read CloudWatch / Azure Monitor utilization without re-describing the stack"""
+    rds_identifier = aws_resource.rds.identifier if aws_resource.rds else None
+    es_domain = aws_resource.elasticsearch.domain_name if aws_resource.elasticsearch else None
+    fetched = _fetch_metric_series(scanner, rds_identifier, es_domain, account_id, aws_resource.metrics_last_synced)
+
+    performance = scanner.get_rds_metrics(rds_identifier, fetched[("rds", rds_identifier)]) if rds_identifier else {}
+    crud.update_rds_metrics(db, aws_resource, performance)
+    # Lock the scan's rows before the history blocks, the order _store_scan takes them in
+    db.flush()
+    _record_metric_history(db, fetched)
+    db.commit()
+    db.refresh(aws_resource)
+    return aws_resource
+
+def _serve_stored(db: Session, scanner: ScanEngine, aws_resource: Optional[models.AWSResource], cluster_name: str,
+                  account_id: str, region: str) -> Optional[dict]:
+    """The stored scan while its topology is fresh, with the metrics tier re-read first if that is stale.
+
+    None means the topology is stale (or was never scanned) and needs a full rescan.
+    """
+    if not aws_resource or _is_stale(aws_resource.topology_last_synced, TOPOLOGY_REFRESH_TTL):
+        return None
+
+    refreshed = False
+    if _is_stale(aws_resource.metrics_last_synced, METRICS_REFRESH_TTL):
+        try:
+            aws_resource = _refresh_metrics(db, scanner, aws_resource, account_id)
+            refreshed = True
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Metrics refresh failed for {cluster_name}, serving cached values: {str(e)}")
+    response = _format_fetch_aws_resources_response(cluster_name, account_id, region, aws_resource)
+    return _cache_response(cluster_name, response, invalidate=refreshed)
+
+def _store_scan(db: Session, scanner: ScanEngine, env_id: int, resources: dict, account_id: str) -> models.AWSResource:
+    """Replace the environment's stored scan with a new one and record its utilization history; the caller commits.
+
+    Holds the environment row lock, so a rescan committed by another worker in
+    the meantime is replaced instead of colliding on aws_resources.env_id.
+    """
+    def named(section: str, key: str) -> Optional[str]:
+        data = resources.get(section)
+        return data.get(key) if data and not section_failed(data) else None
+
+    # The history window starts at the replaced scan's last metrics read
+    last_synced = db.query(models.AWSResource.metrics_last_synced).filter(models.AWSResource.env_id == env_id).scalar()
+    fetched = _fetch_metric_series(scanner, named("rds", "identifier"), named("elasticsearch", "domain_name"),
+                                   account_id, last_synced)
+
+    db.query(models.Environment).filter(models.Environment.id == env_id).with_for_update().one()
+    # Keep the previous scan until the new one is in hand
+    previous = db.query(models.AWSResource).filter(models.AWSResource.env_id == env_id).first()
+    if previous:
+        db.delete(previous)
+        db.flush()
+    aws_resource = crud.create_aws_resource(db, env_id, resources)
+    _record_metric_history(db, fetched)
+    return aws_resource
+
+def _fetch_resources(db: Session, cluster_name: str, account_id: str, region: str, force_refresh: bool) -> dict:
+    """Everything behind a cache miss: DB reads, provider calls and the write of a new scan.
+
+    All of it blocks, so fetch_cloud_resources runs it in the threadpool.
+    """
+    env_record = _get_env_record(db, cluster_name)
+    scanner = _get_scanner(env_record, region)
+
+    if not force_refresh:
+        stored = _serve_stored(db, scanner, env_record.aws_resources, cluster_name, account_id, region)
+        if stored:
+            return stored
+
+    requested_at = models.ist_now().replace(tzinfo=None)
+    with _rescan_lock(env_record.id):
+        # Another request may have rescanned this cluster while this one waited for the lock
+        db.expire(env_record)
+        aws_resource = env_record.aws_resources
+        if aws_resource and aws_resource.topology_last_synced and aws_resource.topology_last_synced.replace(tzinfo=None) >= requested_at:
+            response = _format_fetch_aws_resources_response(cluster_name, account_id, region, aws_resource)
+            return _cache_response(cluster_name, response)
+
+        rds_endpoint = env_record.data_store.rds_endpoint if env_record.data_store else None
+        es_endpoint = env_record.data_store.es_endpoint if env_record.data_store else None
+        redis_host = env_record.data_store.redis_host if env_record.data_store else None
+
+        try:
+            resources = scanner.get_cluster_resources(
+                cluster_name=cluster_name,
+                rds_endpoint=rds_endpoint,
+                es_endpoint=es_endpoint,
+                redis_host=redis_host
+            )
+
+            aws_resource = _store_scan(db, scanner, env_record.id, resources, account_id)
+            db.commit()
+            db.refresh(aws_resource)
+
+            response = _format_fetch_aws_resources_response(cluster_name, account_id, region, aws_resource)
+            return _cache_response(cluster_name, response, invalidate=True)
+
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=f"Scan failed: {str(e)}")
+
+@router.get("/fetchCloudResources")
+async def fetch_cloud_resources(
+    cluster_name: str = Query(..., description="EKS or AKS cluster name"),
+    account_id: str = Query(..., description="AWS account ID or Azure subscription"),
+    region: str = Query(..., description="AWS or Azure region"),
+    force_refresh: bool = Query(False, description="Force refresh from the cloud provider"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Fetch cloud resources for a given cluster (requires authentication)"""
     
-    if env_record.aws_resources and not force_refresh:
-        return _format_fetch_aws_resources_response(cluster_name, account_id, region, env_record.aws_resources)
-    
-    if force_refresh and env_record.aws_resources:
-        db.delete(env_record.aws_resources)
-        db.commit()
-    
-    rds_endpoint = env_record.data_store.rds_endpoint if env_record.data_store else None
-    es_endpoint = env_record.data_store.es_endpoint if env_record.data_store else None
-    
-    aws_service = AWSResourceService(aws_key, aws_secret, aws_token, region)
-    
+    # Cache hits stay on the event loop; everything else would stall it
+    if not force_refresh:
+        cached = _get_cached_response(cluster_name, account_id, region)
+        if cached:
+            return cached
+
+    return await run_in_threadpool(_fetch_resources, db, cluster_name, account_id, region, force_refresh)
+
+@router.post("/refreshCloudMetrics")
+def refresh_cloud_metrics(
+    cluster_name: str = Query(..., description="EKS or AKS cluster name"),
+    account_id: str = Query(..., description="AWS account ID or Azure subscription"),
+    region: str = Query(..., description="AWS or Azure region"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Refresh only the monitoring-backed utilization columns of a previously scanned cluster.
+
+    A plain def, so FastAPI runs the monitoring calls and DB writes in its threadpool.
+    """
+
+    env_record = _get_env_record(db, cluster_name)
+
+    if not env_record.aws_resources:
+        raise HTTPException(status_code=409, detail="Cluster has not been scanned yet, call fetchCloudResources first")
+
+    scanner = _get_scanner(env_record, region)
     try:
-        resources = aws_service.get_cluster_resources(
+        aws_resource = _refresh_metrics(db, scanner, env_record.aws_resources, account_id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Metrics refresh failed: {str(e)}")
+
+    response = _format_fetch_aws_resources_response(cluster_name, account_id, region, aws_resource)
+    return _cache_response(cluster_name, response, invalidate=True)
+
+@router.get("/metricHistory")
+def get_metric_history(
+    cluster_name: List[str] = Query(..., description="One or more EKS or AKS cluster names"),
+    resource_type: str = Query("rds", description="rds or elasticsearch"),
+    metric: str = Query("cpu_percent", description="cpu_percent, free_storage_gb, connections (rds) or jvm_memory_pressure (elasticsearch)"),
+    start: Optional[datetime] = Query(None, description="Range start (UTC), defaults to 24 hours before end"),
+    end: Optional[datetime] = Query(None, description="Range end (UTC), defaults to now"),
+    resolution: Optional[str] = Query(None, description="5m, 1h or 1d; picked from the range when omitted"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Utilization history for the RDS instance or ES domain of one or many clusters.
+
+    A plain def: the block queries and float32 decoding run in FastAPI's threadpool.
+    """
+
+    resource_models = {
+        "rds": (models.RDSInstance, models.RDSInstance.identifier),
+        "elasticsearch": (models.ElasticSearch, models.ElasticSearch.domain_name),
+    }
+    if resource_type not in resource_models:
+        raise HTTPException(status_code=400, detail="resource_type must be rds or elasticsearch")
+    if resolution and resolution not in metric_history.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail="resolution must be one of 5m, 1h, 1d")
+
+    # History is stored in naive UTC; a client may send either form
+    end = metric_history.to_utc_naive(end) if end else datetime.utcnow()
+    start = metric_history.to_utc_naive(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    resolution = resolution or metric_history.pick_resolution(start, end)
+
+    model, name_column = resource_models[resource_type]
+    rows = db.query(models.Cluster.cluster_name, name_column).join(
+        models.AWSResource, models.AWSResource.env_id == models.Cluster.env_id
+    ).join(
+        model, model.aws_resource_id == models.AWSResource.id
+    ).filter(
+        models.Cluster.cluster_name.in_(cluster_name)
+    ).all()
+    resource_names = {cluster: name for cluster, name in rows}
+
+    history = metric_history.query_history(
+        db, resource_type, list(set(resource_names.values())), metric, start, end, resolution
+    )
+
+    return {
+        "success": True,
+        "resource_type": resource_type,
+        "metric": metric,
+        "resolution": resolution,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": {
+            cluster: {
+                "resource_name": resource_names.get(cluster),
+                "points": [[ts.isoformat(), round(value, 4)] for ts, value in history.get(resource_names.get(cluster), [])]
+            }
+            for cluster in cluster_name
+        }
+    }
+
+@router.get("/lookup")
+def lookup_resource(
+    q: str = Query(..., description="IP, CIDR, endpoint, ARN, VPC ID, subnet ID or any prefix of one"),
+    mode: str = Query("auto", description="auto, exact, prefix or cidr"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Map an identifier seen during an incident to the environment that owns it"""
+
+    if mode not in ("auto", "exact", "prefix", "cidr"):
+        raise HTTPException(status_code=400, detail="mode must be auto, exact, prefix or cidr")
+
+    matches = lookup_index.lookup(db, q, mode, limit)
+    return {"success": True, "query": q, "count": len(matches), "matches": matches}
+
+@router.get("/fleet/aggregates")
+def get_fleet_aggregates(
+    dimension: Optional[List[str]] = Query(None, description="Restrict to these dimensions, all by default"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Fleet-wide aggregates served from the incrementally maintained rollup tables"""
+
+    unknown = [d for d in dimension or [] if d not in fleet_rollups.DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown dimensions: {', '.join(unknown)}")
+
+    return {
+        "success": True,
+        "dimensions": {d: fleet_rollups.DIMENSIONS[d] for d in dimension or fleet_rollups.DIMENSIONS},
+        "aggregates": fleet_rollups.get_aggregates(db, dimension)
+    }
+
+@router.post("/events")
+def ingest_change_events(
+    events: Union[List[dict], dict] = Body(..., description="EventBridge events or CloudTrail records"),
+    mode: str = Query(event_ingestion.RESCAN, description="rescan affected sections, or only invalidate"),
+    flush: bool = Query(False, description="Refresh now instead of waiting for the batch window"),
+    _: None = Depends(verify_event_token),
+    db: Session = Depends(get_db)
+):
+    """Targeted refresh from AWS change events, batched so a burst refreshes each cluster once.
+
+    Resolving environments and a flush's rescans block, so this is a plain def.
+    """
+
+    if mode not in (event_ingestion.RESCAN, event_ingestion.INVALIDATE):
+        raise HTTPException(status_code=400, detail="mode must be rescan or invalidate")
+
+    if isinstance(events, dict):
+        events = events.get("Records") or [events]
+
+    matched = {}
+    ignored = 0
+    for event in events:
+        sections, identifiers = event_ingestion.parse_event(event)
+        env_ids = event_ingestion.resolve_environments(db, identifiers) if sections else set()
+        if not env_ids:
+            ignored += 1
+            continue
+        for env_id in env_ids:
+            matched.setdefault(env_id, set()).update(sections)
+
+    for env_id, sections in matched.items():
+        event_ingestion.event_batcher.add(env_id, sections, mode)
+    if flush:
+        event_ingestion.event_batcher.flush()
+
+    return {
+        "success": True,
+        "received": len(events),
+        "ignored": ignored,
+        "matched": {str(env_id): sorted(sections) for env_id, sections in matched.items()},
+        "pending_refreshes": event_ingestion.event_batcher.pending()
+    }
+
+@router.get("/discoverAccount")
+async def discover_account(
+    account_id: str = Query(..., description="AWS account ID the configured credentials belong to"),
+    regions: Optional[List[str]] = Query(None, description="Regions to scan, all enabled regions by default"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Reconcile the catalogue against every EKS cluster, RDS instance and ES domain in an account"""
+
+    from app.services import discovery
+
+    aws_key, aws_secret, aws_token = _get_aws_credentials()
+    try:
+        return await run_in_threadpool(discovery.discover_account, db, aws_key, aws_secret, aws_token, account_id, regions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Discovery failed: {str(e)}")
+
+@router.get("/fetchCloudResourcesStream")
+async def fetch_cloud_resources_stream(
+    cluster_name: str = Query(..., description="EKS or AKS cluster name"),
+    account_id: str = Query(..., description="AWS account ID or Azure subscription"),
+    region: str = Query(..., description="AWS or Azure region"),
+    force_refresh: bool = Query(False, description="Force refresh from the cloud provider"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream cloud resources as Server-Sent Events, one event per section, then a summary event"""
+
+    if not force_refresh:
+        cached = _get_cached_response(cluster_name, account_id, region)
+        if cached:
+            return StreamingResponse(_stream_cached_resources(cached), media_type="text/event-stream")
+
+    stored, scanner, env_id = await run_in_threadpool(_stored_or_scanner, db, cluster_name, account_id, region, force_refresh)
+    if stored:
+        return StreamingResponse(_stream_cached_resources(stored), media_type="text/event-stream")
+
+    return StreamingResponse(
+        _stream_scan(scanner, env_id, cluster_name, account_id, region),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _stored_or_scanner(db: Session, cluster_name: str, account_id: str, region: str, force_refresh: bool):
+    """The stored response under the same freshness tiers as fetchCloudResources, or None and
+    the scanner when the topology is stale and the stream has to rescan"""
+    env_record = _get_env_record(db, cluster_name)
+    scanner = _get_scanner(env_record, region)
+    stored = None if force_refresh else _serve_stored(db, scanner, env_record.aws_resources, cluster_name, account_id, region)
+    return stored, scanner, env_record.id
+
+def _stream_cached_resources(response: dict):
+    for section, data in _split_resource_sections(response["resources"]).items():
+        yield _format_sse_event(section, data)
+    yield _format_sse_event("summary", response)
+
+def _stream_scan(scanner: ScanEngine, env_id: int, cluster_name: str, account_id: str, region: str):
+    # The request-scoped session may be closed before the body is streamed, so use our own
+    db = SessionLocal()
+    try:
+        env_record = db.get(models.Environment, env_id)
+        rds_endpoint = env_record.data_store.rds_endpoint if env_record.data_store else None
+        es_endpoint = env_record.data_store.es_endpoint if env_record.data_store else None
+        redis_host = env_record.data_store.redis_host if env_record.data_store else None
+
+        sections = {}
+        for section, data in scanner.iter_cluster_resources(
             cluster_name=cluster_name,
             rds_endpoint=rds_endpoint,
             es_endpoint=es_endpoint,
-            redis_host=None
-        )
-        
-        aws_resource = models.AWSResource(env_id=env_record.id)
-        db.add(aws_resource)
-        db.flush()
-        
-        if resources.get("eks") and not resources["eks"].get("error"):
-            eks_data = resources["eks"]
-            eks = models.EKSCluster(
-                aws_resource_id=aws_resource.id,
-                name=eks_data["name"],
-                status=eks_data.get("status"),
-                kubernetes_version=eks_data.get("kubernetes_version"),
-                endpoint=eks_data.get("endpoint"),
-                arn=eks_data.get("arn"),
-                vpc_id=eks_data.get("vpc_id"),
-                subnet_ids=eks_data.get("subnet_ids"),
-                nat_gateway_ips=eks_data.get("nat_gateway_ips"),
-                total_nodes=eks_data.get("total_nodes")
-            )
-            db.add(eks)
-            db.flush()
-            
-            for ng in eks_data.get("node_groups", []):
-                node_group = models.EKSNodeGroup(
-                    eks_cluster_id=eks.id,
-                    name=ng["name"],
-                    instance_types=ng.get("instance_types"),
-                    desired_size=ng.get("desired_size"),
-                    min_size=ng.get("min_size"),
-                    max_size=ng.get("max_size"),
-                    status=ng.get("status")
-                )
-                db.add(node_group)
-        
-        if resources.get("rds") and not resources["rds"].get("error"):
-            rds_data = resources["rds"]
-            perf = rds_data.get("performance", {})
-            rds = models.RDSInstance(
-                aws_resource_id=aws_resource.id,
-                identifier=rds_data["identifier"],
-                endpoint=rds_data.get("endpoint"),
-                status=rds_data.get("status"),
-                engine=rds_data.get("engine"),
-                engine_version=rds_data.get("engine_version"),
-                instance_class=rds_data.get("instance_class"),
-                allocated_storage_gb=rds_data.get("allocated_storage_gb"),
-                multi_az=rds_data.get("multi_az", False),
-                storage_encrypted=rds_data.get("storage_encrypted", False),
-                cpu_percent=perf.get("cpu_percent"),
-                free_storage_gb=perf.get("free_storage_gb"),
-                connections=perf.get("connections")
-            )
-            db.add(rds)
-        
-        if resources.get("elasticsearch") and not resources["elasticsearch"].get("error"):
-            es_data = resources["elasticsearch"]
-            es = models.ElasticSearch(
-                aws_resource_id=aws_resource.id,
-                domain_name=es_data["domain_name"],
-                status=es_data.get("status"),
-                version=es_data.get("version"),
-                endpoint=es_data.get("endpoint"),
-                instance_type=es_data.get("instance_type"),
-                instance_count=es_data.get("instance_count"),
-                volume_size_gb=es_data.get("volume_size_gb")
-            )
-            db.add(es)
-        
-        db.commit()
+            redis_host=redis_host
+        ):
+            sections[section] = data
+            yield _format_sse_event(section, crud.format_scan_section(section, data))
+
+        resources = scanner.assemble_resources(cluster_name, sections)
+
+        with _rescan_lock(env_id):
+            aws_resource = _store_scan(db, scanner, env_id, resources, account_id)
+            db.commit()
         db.refresh(aws_resource)
-        
-        return _format_fetch_aws_resources_response(cluster_name, account_id, region, aws_resource)
-        
+
+        response = _format_fetch_aws_resources_response(cluster_name, account_id, region, aws_resource)
+        # Sections the provider has no lookup for, so the stream carries the same set as a cached one
+        for section, data in _split_resource_sections(response["resources"]).items():
+            if section not in sections:
+                yield _format_sse_event(section, data)
+        yield _format_sse_event("summary", _cache_response(cluster_name, response, invalidate=True))
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Scan failed: {str(e)}")
-
-
+        yield _format_sse_event("error", {"success": False, "detail": f"Scan failed: {str(e)}"})
+    finally:
+        db.close()
@@ -0,0 +1,447 @@
+"""Offline benchmark of the catalogue API hot paths.
+
+Runs the app in-process against a throwaway SQLite database and the fake AWS
+account in fake_aws.py, so nothing needs credentials or network access:
+
+    python app/scripts/benchmark.py --output bench.json
+    python app/scripts/benchmark.py --scenarios fetch,concurrent --latency-scale 0.2 --throttle-rate 0.05
+
+With --replay, AWS is served from a corpus recorded with AWS_RECORD_DIR (see
+app/services/aws_replay.py) instead, and the catalogue is rebuilt from the
+scans in it, so the run has production-shaped payloads and latencies:
+
+    python app/scripts/benchmark.py --replay /data/aws-corpus --scenarios fetch,concurrent --latency-scale 0.5
+
+Scenarios:
+    auth        get_current_user on a locally signed token (JWKS already cached)
+    fetch       /api/fetchCloudResources as a cold scan, a DB hit and a cache hit
+    concurrent  the same requests from N concurrent users on one event loop,
+                which is what a single uvicorn worker sees (cold scans use
+                --cold-users: they run in the worker's threadpool and queue
+                for DB connections past the pool size)
+    populate    populate_database on generated catalogue CSVs of each size; it drops
+                and recreates every table, so with --database-url it also needs
+                --allow-drop
+    startup     fresh interpreters importing the app, running its lifespan startup
+                and serving one authenticated request, with the warmup on and
+                off (STARTUP_WARMUP): time-to-first-request and its breakdown
+
+Every scenario reports p50/p95/p99/mean/max latency in milliseconds and
+throughput per second. The JSON written to --output (stdout by default)
+carries the commit and the configuration, so runs can be diffed across commits.
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+SCENARIOS = ["auth", "fetch", "concurrent", "populate", "startup"]
+BENCH_CLIENT_ID = "benchmark.apps.googleusercontent.com"
+BENCH_KEY_ID = "benchmark"
+
+# Clusters the HTTP scenarios request, and the account they are requested under
+targets: List[Tuple[str, str]] = []
+target_account = None
+
+def summarize(samples: List[float], wall_seconds: float, errors: int = 0) -> Dict:
+    """Latency percentiles in milliseconds and throughput of one scenario"""
+    if not samples:
+        return {"count": 0, "errors": errors}
+    ordered = sorted(samples)
+    cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "throughput_per_s": round(len(ordered) / wall_seconds, 3) if wall_seconds else None
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def signed_token() -> str:
+    """A Google-shaped ID token signed by a local key, with that key installed as the cached JWKS"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jose import jwk, jwt
+    from app import dependencies
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    dependencies._google_certs = {"keys": [{**public_jwk, "kid": BENCH_KEY_ID, "use": "sig"}]}
+
+    now = int(time.time())
+    claims = {"iss": "https://accounts.google.com", "aud": BENCH_CLIENT_ID, "email": "benchmark@saviynt.com",
+              "iat": now, "exp": now + 24 * 3600}
+    return jwt.encode(claims, private_pem.decode(), algorithm="RS256", headers={"kid": BENCH_KEY_ID})
+
+def seed_catalogue(clusters: List[Dict], account_id: str):
+    """One environment per cluster, with the endpoints its scan looks up"""
+    global target_account
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for i, cluster in enumerate(clusters):
+            env = models.Environment(slug=f"bench-{i:04d}-prod", customer_name=f"bench{i:04d}", environment="prod",
+                                     cloud_platform="aws", account_id=account_id, region=cluster["region"])
+            db.add(env)
+            db.flush()
+            db.add(models.Cluster(env_id=env.id, cluster_name=cluster["cluster_name"]))
+            db.add(models.DataStore(env_id=env.id, rds_endpoint=cluster["rds_endpoint"],
+                                    es_endpoint=cluster["es_endpoint"], redis_host=cluster.get("redis_host")))
+            targets.append((cluster["cluster_name"], cluster["region"]))
+        db.commit()
+    finally:
+        db.close()
+    target_account = account_id
+
+def fake_clusters(count: int) -> List[Dict]:
+    from app.scripts.fake_aws import cluster_name, cluster_endpoints
+    return [
+        {"cluster_name": cluster_name(i), "rds_endpoint": cluster_endpoints(i)[0],
+         "es_endpoint": cluster_endpoints(i)[1], "region": "us-east-1"}
+        for i in range(count)
+    ]
+
+def replay_clusters() -> List[Dict]:
+    """Every distinct cluster scan in the replay corpus"""
+    from app.services import aws_replay
+
+    aws_replay._active()
+    clusters = {}
+    for scan in aws_replay._replayer.scans:
+        clusters.setdefault(scan["cluster_name"], scan)
+    return list(clusters.values())
+
+def bench_auth(token: str, iterations: int) -> Dict:
+    from app.dependencies import get_current_user
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        get_current_user(token=token, db=None)
+        samples.append(time.perf_counter() - t)
+    return summarize(samples, time.perf_counter() - started)
+
+def _fetch_url(index: int, force_refresh: bool) -> str:
+    cluster_name, region = targets[index]
+    url = f"/api/fetchCloudResources?cluster_name={cluster_name}&account_id={target_account}&region={region}"
+    return url + "&force_refresh=true" if force_refresh else url
+
+async def _timed_get(client, url: str, samples: List[float], errors: List[str]):
+    t = time.perf_counter()
+    response = await client.get(url)
+    samples.append(time.perf_counter() - t)
+    if response.status_code != 200:
+        errors.append(f"{response.status_code} {response.text[:200]}")
+
+async def _sequential(client, urls: List[str]) -> Dict:
+    samples, errors = [], []
+    started = time.perf_counter()
+    for url in urls:
+        await _timed_get(client, url, samples, errors)
+    result = summarize(samples, time.perf_counter() - started, len(errors))
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+async def bench_fetch(client, clusters: int, iterations: int) -> Dict:
+    from app.services.cache import inventory_cache, inventory_key
+
+    cold = await _sequential(client, [_fetch_url(i % clusters, True) for i in range(iterations)])
+
+    # Fresh rows in the DB but nothing in the cache: load, format and cache the stored scan
+    db_samples, db_errors = [], []
+    started = time.perf_counter()
+    for i in range(iterations):
+        inventory_cache.invalidate(inventory_key(targets[i % clusters][0]))
+        await _timed_get(client, _fetch_url(i % clusters, False), db_samples, db_errors)
+    db_hit = summarize(db_samples, time.perf_counter() - started, len(db_errors))
+
+    cache_hit = await _sequential(client, [_fetch_url(i % clusters, False) for i in range(iterations * 10)])
+    return {"cold_scan": cold, "db_hit": db_hit, "cache_hit": cache_hit}
+
+async def bench_concurrent(client, clusters: int, users: List[int], cold_users: List[int], requests_per_user: int) -> Dict:
+    results = {"cache_hit": {}, "cold_scan": {}}
+    for mode, force_refresh, levels in (("cache_hit", False, users), ("cold_scan", True, cold_users)):
+        for n in levels:
+            samples, errors = [], []
+
+            async def user(u: int):
+                for r in range(requests_per_user):
+                    await _timed_get(client, _fetch_url((u + r) % clusters, force_refresh), samples, errors)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(user(u) for u in range(n)))
+            result = summarize(samples, time.perf_counter() - started, len(errors))
+            if errors:
+                result["first_error"] = errors[0]
+            results[mode][str(n)] = result
+    return results
+
+def _catalogue_csv(path: str, rows: int):
+    import pandas as pd
+    pd.DataFrame([
+        {
+            "CUSTOMER_ENV": f"cust{i:06d}-prod", "customer_name_appinstance": f"cust{i:06d}",
+            "environment_appinstance": "prod", "customer_tier_appinstance": "enterprise", "cloud_platform": "aws",
+            "Account": f"{100000000000 + i % 40}", "Region": "us-east-1", "VPCID_infra-input": f"vpc-{i:08x}",
+            "VPCCIDR_infra-input": f"10.{i % 250}.0.0/16", "InstanceType_infra-input": "m6i.2xlarge",
+            "MultiAZ_infra-input": "TRUE", "cluster_name_cluster": f"cust{i:06d}-eks",
+            "helm_branch_cluster": "release/2024.1", "ingress-nginx-enabled_cluster": "yes",
+            "RDSEndpoint_infra-output": f"cust{i:06d}-db.c0ffee.us-east-1.rds.amazonaws.com",
+            "RDSInstanceClass_infra-input": "db.r6g.xlarge",
+            "Elasticsearch_endpoint_infra-output": f"vpc-cust{i:06d}-es-a1b2c3.us-east-1.es.amazonaws.com",
+            "ESInstanceType_infra-input": "r6g.large.elasticsearch",
+            "ecm-worker-replicas_appinstance": "3", "userms-replicas_appinstance": "2",
+        }
+        for i in range(rows)
+    ]).to_csv(path, index=False)
+
+def bench_populate(sizes: List[int], workdir: str) -> Dict:
+    from app import models
+    from app.database import engine
+
+    # populate_db opens population_job.log in the working directory on import
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from app.scripts.populate_db import populate_database
+    finally:
+        os.chdir(cwd)
+
+    results = {}
+    for rows in sizes:
+        path = os.path.join(workdir, f"catalogue_{rows}.csv")
+        _catalogue_csv(path, rows)
+        models.Base.metadata.drop_all(bind=engine)
+        models.Base.metadata.create_all(bind=engine)
+
+        started = time.perf_counter()
+        populate_database(path)
+        insert_seconds = time.perf_counter() - started
+        # Second pass over the same file: every row updates an existing environment
+        started = time.perf_counter()
+        populate_database(path)
+        update_seconds = time.perf_counter() - started
+
+        results[str(rows)] = {
+            "insert_seconds": round(insert_seconds, 3),
+            "insert_rows_per_s": round(rows / insert_seconds, 3),
+            "update_seconds": round(update_seconds, 3),
+            "update_rows_per_s": round(rows / update_seconds, 3),
+            "mean_ms_per_row": round(insert_seconds / rows * 1000, 3)
+        }
+    return results
+
+def startup_probe():
+    """Child side of the startup scenario: one cold worker, timed up to its first response"""
+    interpreter_seconds = time.time() - float(os.environ["BENCH_SPAWNED_AT"])
+    started = time.perf_counter()
+    from app.main import app
+    from app import dependencies
+    import_seconds = time.perf_counter() - started
+    # The parent's signing key, so auth needs no network
+    dependencies._google_certs = json.loads(os.environ["BENCH_JWKS"])
+
+    async def serve():
+        started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            startup_seconds = time.perf_counter() - started
+            import httpx
+            transport = httpx.ASGITransport(app=app)
+            headers = {"Authorization": f"Bearer {os.environ['BENCH_TOKEN']}"}
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", headers=headers) as client:
+                timings = []
+                for _ in range(2):
+                    started = time.perf_counter()
+                    response = await client.get(os.environ["BENCH_URL"])
+                    timings.append(time.perf_counter() - started)
+                    response.raise_for_status()
+        return startup_seconds, timings
+
+    startup_seconds, (first_seconds, second_seconds) = asyncio.run(serve())
+    print(json.dumps({
+        "interpreter": interpreter_seconds, "import": import_seconds, "startup": startup_seconds,
+        "first_request": first_seconds, "second_request": second_seconds,
+        "time_to_first_request": interpreter_seconds + import_seconds + startup_seconds + first_seconds
+    }))
+
+def bench_startup(runs: int, token: str) -> Dict:
+    """Time-to-first-request of fresh workers, with the lifespan warmup on and off"""
+    from app import dependencies
+
+    results = {}
+    for mode, warmup in (("warmup", "true"), ("lazy", "false")):
+        probes, errors = [], []
+        for _ in range(runs):
+            env = dict(os.environ, STARTUP_WARMUP=warmup, BENCH_SPAWNED_AT=repr(time.time()), BENCH_TOKEN=token,
+                       BENCH_JWKS=json.dumps(dependencies._google_certs), BENCH_URL=_fetch_url(0, False))
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), "--startup-probe"], env=env,
+                                   capture_output=True, text=True)
+            if child.returncode != 0:
+                errors.append(child.stderr.strip().splitlines()[-1] if child.stderr.strip() else str(child.returncode))
+                continue
+            probes.append(json.loads(child.stdout.strip().splitlines()[-1]))
+        result = {"time_to_first_request": summarize([p["time_to_first_request"] for p in probes], 0, len(errors))}
+        result["time_to_first_request"].pop("throughput_per_s", None)
+        if probes:
+            result["mean_ms"] = {
+                phase: round(statistics.fmean(p[phase] for p in probes) * 1000, 3)
+                for phase in ("interpreter", "import", "startup", "first_request", "second_request")
+            }
+        if errors:
+            result["first_error"] = errors[0]
+        results[mode] = result
+    return results
+
+async def run_http_scenarios(args, scenarios: List[str]) -> Dict:
+    import httpx
+    from app.main import app
+
+    token = signed_token()
+    results = {}
+    if "auth" in scenarios:
+        results["get_current_user"] = bench_auth(token, args.iterations * 20)
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", headers=headers, timeout=None) as client:
+        # Every cluster scanned once, so the cache and DB scenarios have something to serve
+        warmup = await _sequential(client, [_fetch_url(i, True) for i in range(len(targets))])
+        results["warmup"] = warmup
+        if "fetch" in scenarios:
+            results["fetch_cloud_resources"] = await bench_fetch(client, len(targets), args.iterations)
+        if "concurrent" in scenarios:
+            results["concurrent_users"] = await bench_concurrent(
+                client, len(targets), args.users, args.cold_users, args.requests_per_user
+            )
+    if "startup" in scenarios:
+        # In fresh processes, after the warmup scans so their first request is a DB hit
+        results["startup"] = await asyncio.to_thread(bench_startup, args.startup_runs, token)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the catalogue API")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma separated, from {','.join(SCENARIOS)}")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--iterations", type=int, default=30, help="Requests per sequential scenario")
+    parser.add_argument("--clusters", type=int, default=20, help="Clusters in the catalogue and the fake account")
+    parser.add_argument("--users", default="1,10,50", help="Concurrent user counts for cache hits")
+    parser.add_argument("--cold-users", default="1,5,10", help="Concurrent user counts for cold scans")
+    parser.add_argument("--requests-per-user", type=int, default=5)
+    parser.add_argument("--populate-rows", default="1000,10000,50000", help="CSV sizes for populate_database")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier on the fake or replayed AWS latencies")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of fake AWS attempts throttled")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Benchmark against this database instead of a throwaway SQLite file")
+    parser.add_argument("--allow-drop", action="store_true",
+                        help="Let the populate scenario drop every table of --database-url")
+    parser.add_argument("--replay", help="Serve AWS from the corpus recorded in this directory instead of the fake account")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Fresh processes per startup mode")
+    parser.add_argument("--startup-probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.startup_probe:
+        startup_probe()
+        return
+    args.users = [int(n) for n in args.users.split(",") if n]
+    args.cold_users = [int(n) for n in args.cold_users.split(",") if n]
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    if "populate" in scenarios and args.database_url and not args.allow_drop:
+        parser.error("The populate scenario drops every table; pass --allow-drop to run it against --database-url")
+
+    workdir = tempfile.mkdtemp(prefix="catalogue-bench-")
+    # Everything below reads its configuration at import time
+    # Concurrent cold scans commit in parallel and SQLite takes one writer at a time,
+    # so writers wait for the lock instead of failing after pysqlite's 5 second default
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'benchmark.db')}?timeout=60"
+    os.environ.update(AWS_ACCESS_KEY_ID="benchmark", AWS_SECRET_ACCESS_KEY="benchmark", AWS_SESSION_TOKEN="benchmark",
+                      GOOGLE_CLIENT_ID=BENCH_CLIENT_ID)
+    if args.replay:
+        os.environ.update(AWS_REPLAY_DIR=args.replay, AWS_REPLAY_LATENCY_SCALE=str(args.latency_scale))
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    from app.database import engine
+    from app.migrations import migrate
+    from app.services import aws_replay
+    from app.scripts.fake_aws import ACCOUNT_ID, AccountShape, FakeAWS
+
+    migrate(engine)
+    fake = None
+    if args.replay:
+        clusters = replay_clusters()
+        if not clusters:
+            parser.error(f"No cluster scans recorded in {args.replay}")
+        # Account IDs in the corpus are scrubbed, so any account replays it
+        seed_catalogue(clusters, ACCOUNT_ID)
+    else:
+        fake = FakeAWS(AccountShape(clusters=args.clusters), latency_scale=args.latency_scale,
+                       throttle_rate=args.throttle_rate, seed=args.seed)
+        fake.install()
+        seed_catalogue(fake_clusters(args.clusters), ACCOUNT_ID)
+
+    started = time.perf_counter()
+    results = {}
+    if set(scenarios) & {"auth", "fetch", "concurrent", "startup"}:
+        results.update(asyncio.run(run_http_scenarios(args, scenarios)))
+    if "populate" in scenarios:
+        results["populate_database"] = bench_populate([int(n) for n in args.populate_rows.split(",") if n], workdir)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "config": {
+            "scenarios": scenarios, "iterations": args.iterations, "clusters": len(targets), "users": args.users,
+            "cold_users": args.cold_users,
+            "requests_per_user": args.requests_per_user, "startup_runs": args.startup_runs,
+            "latency_scale": args.latency_scale,
+            "throttle_rate": args.throttle_rate, "seed": args.seed,
+            "database": "sqlite" if not args.database_url else args.database_url.split(":", 1)[0],
+            "aws": f"replay:{args.replay}" if args.replay else "fake"
+        },
+        "aws_calls": fake.stats() if fake else aws_replay.replay_stats(),
+        "results": results
+    }
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
+
+if __name__ == "__main__":
+    main()
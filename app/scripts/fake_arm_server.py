@@ -0,0 +1,182 @@
+"""Local stand-in for Azure Resource Manager and the Entra ID token endpoint.
+
+Serves the ARM resources listed in a JSON fixture file (a list of objects with
+at least "id", "name" and "type"), so AzureResourceService can be exercised
+without a subscription:
+
+    python app/scripts/fake_arm_server.py --fixtures arm_fixtures.json --port 8765
+    AZURE_ARM_ENDPOINT=http://127.0.0.1:8765 AZURE_AUTHORITY_HOST=http://127.0.0.1:8765 uvicorn app.main:app
+
+Without --fixtures a small sample subscription is served.
+"""
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+SAMPLE_SUBSCRIPTION = "00000000-0000-0000-0000-000000000001"
+PAGE_SIZE = 2
+
+def sample_fixtures(subscription_id: str = SAMPLE_SUBSCRIPTION) -> list:
+    rg = f"/subscriptions/{subscription_id}/resourceGroups/rg-sample"
+    subnet = f"{rg}/providers/Microsoft.Network/virtualNetworks/vnet-sample/subnets/snet-aks"
+    cluster = f"{rg}/providers/Microsoft.ContainerService/managedClusters/aks-sample"
+    return [
+        {
+            "id": cluster, "name": "aks-sample", "type": "Microsoft.ContainerService/managedClusters", "location": "eastus",
+            "properties": {
+                "provisioningState": "Succeeded", "powerState": {"code": "Running"},
+                "kubernetesVersion": "1.29", "currentKubernetesVersion": "1.29.4",
+                "fqdn": "aks-sample-dns.hcp.eastus.azmk8s.io",
+                "agentPoolProfiles": [{"name": "system", "vnetSubnetID": subnet}, {"name": "user", "vnetSubnetID": subnet}]
+            }
+        },
+        {
+            "id": f"{cluster}/agentPools/system", "name": "system", "type": "Microsoft.ContainerService/managedClusters/agentPools",
+            "properties": {"count": 3, "vmSize": "Standard_D4s_v5", "enableAutoScaling": False,
+                           "provisioningState": "Succeeded", "powerState": {"code": "Running"}}
+        },
+        {
+            "id": f"{cluster}/agentPools/user", "name": "user", "type": "Microsoft.ContainerService/managedClusters/agentPools",
+            "properties": {"count": 4, "vmSize": "Standard_E8s_v5", "enableAutoScaling": True, "minCount": 2, "maxCount": 10,
+                           "provisioningState": "Succeeded", "powerState": {"code": "Running"}}
+        },
+        {
+            "id": f"{rg}/providers/Microsoft.DBforPostgreSQL/flexibleServers/pg-sample", "name": "pg-sample",
+            "type": "Microsoft.DBforPostgreSQL/flexibleServers", "location": "eastus",
+            "sku": {"name": "Standard_D4ds_v5", "tier": "GeneralPurpose"},
+            "properties": {"state": "Ready", "version": "15", "fullyQualifiedDomainName": "pg-sample.postgres.database.azure.com",
+                           "storage": {"storageSizeGB": 256}, "highAvailability": {"mode": "ZoneRedundant"}}
+        },
+        {
+            "id": f"{rg}/providers/Microsoft.Cache/redis/redis-sample", "name": "redis-sample",
+            "type": "Microsoft.Cache/Redis", "location": "eastus",
+            "properties": {"provisioningState": "Succeeded", "hostName": "redis-sample.redis.cache.windows.net",
+                           "sslPort": 6380, "redisVersion": "6.0", "shardCount": 2,
+                           "sku": {"name": "Premium", "family": "P", "capacity": 1}}
+        },
+    ]
+
+def _metrics(names: list, timespan: str) -> dict:
+    start, end = [datetime.fromisoformat(part.replace("Z", "")) for part in timespan.split("/")]
+    samples = {"cpu_percent": 37.5, "storage_used": 96 * 1024**3, "storage_limit": 256 * 1024**3, "active_connections": 42}
+    points = []
+    ts = start
+    while ts < end:
+        points.append(ts)
+        ts += timedelta(minutes=5)
+    return {"value": [
+        {
+            "name": {"value": name},
+            "timeseries": [{"data": [{"timeStamp": f"{p:%Y-%m-%dT%H:%M:%SZ}", "average": samples.get(name, 0)} for p in points]}]
+        }
+        for name in names
+    ]}
+
+class FakeArmHandler(BaseHTTPRequestHandler):
+    resources = []
+    latency_seconds = 0.0
+    throttle_rate = 0.0
+    # GETs still to answer with 429 before any is served, for deterministic retry tests
+    throttle_next = 0
+    retry_after = "0"
+    _throttle_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _throttled(self) -> bool:
+        with self._throttle_lock:
+            if FakeArmHandler.throttle_next > 0:
+                FakeArmHandler.throttle_next -= 1
+                return True
+        return random.random() < self.throttle_rate
+
+    def do_POST(self):
+        if self.path.endswith("/oauth2/v2.0/token"):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            return self._send(200, {"token_type": "Bearer", "access_token": "fake-arm-token", "expires_in": 3600})
+        self._send(404, {"error": {"code": "NotFound"}})
+
+    def do_GET(self):
+        time.sleep(self.latency_seconds)
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._send(401, {"error": {"code": "AuthenticationFailed"}})
+        if self._throttled():
+            return self._send(429, {"error": {"code": "TooManyRequests"}}, {"Retry-After": self.retry_after})
+
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        query = parse_qs(url.query)
+        lower = path.lower()
+
+        if lower.endswith("/providers/microsoft.insights/metrics"):
+            return self._send(200, _metrics(query["metricnames"][0].split(","), query["timespan"][0]))
+
+        for resource in self.resources:
+            if resource["id"].lower() == lower:
+                return self._send(200, resource)
+
+        parts = path.split("/")
+        if len(parts) == 6 and parts[3] == "providers":
+            # /subscriptions/{id}/providers/{namespace}/{type}: every resource of a type in the subscription
+            prefix = f"/subscriptions/{parts[2]}/".lower()
+            resource_type = f"{parts[4]}/{parts[5]}".lower()
+            matches = [r for r in self.resources if r["id"].lower().startswith(prefix) and r["type"].lower() == resource_type]
+        else:
+            # A collection under a parent resource, e.g. a cluster's agentPools
+            matches = [r for r in self.resources if r["id"].lower().rsplit("/", 1)[0] == lower]
+            if not matches and not any(r["id"].lower().startswith(lower + "/") for r in self.resources):
+                return self._send(404, {"error": {"code": "ResourceNotFound", "message": f"{path} not found"}})
+
+        skip = int(query.get("$skiptoken", ["0"])[0])
+        body = {"value": matches[skip:skip + PAGE_SIZE]}
+        if skip + PAGE_SIZE < len(matches):
+            next_query = {"api-version": query.get("api-version", [""])[0], "$skiptoken": skip + PAGE_SIZE}
+            body["nextLink"] = f"http://{self.headers['Host']}{path}?{urlencode(next_query)}"
+        self._send(200, body)
+
+def serve(port: int, fixtures: list, latency_ms: float = 0, throttle_rate: float = 0.0) -> ThreadingHTTPServer:
+    FakeArmHandler.resources = fixtures
+    FakeArmHandler.latency_seconds = latency_ms / 1000
+    FakeArmHandler.throttle_rate = throttle_rate
+    return ThreadingHTTPServer(("127.0.0.1", port), FakeArmHandler)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake ARM resources for AzureResourceService")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="JSON file with a list of ARM resources")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every ARM GET")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of GETs answered with 429")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        with open(args.fixtures) as f:
+            fixtures = json.load(f)
+    else:
+        fixtures = sample_fixtures()
+
+    server = serve(args.port, fixtures, args.latency_ms, args.throttle_rate)
+    print(f"Fake ARM listening on http://127.0.0.1:{args.port} with {len(fixtures)} resources")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
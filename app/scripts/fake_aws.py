@@ -0,0 +1,352 @@
+"""In-process stand-in for the AWS APIs AWSResourceService calls.
+
+Answers boto3 calls from a synthetic account through botocore's before-call
+event, so real clients, paginators, response handling and the metrics and
+tracing hooks all run, but nothing leaves the process. Every call sleeps a
+per-service latency (log-normal jitter around a median) and can be throttled;
+throttled attempts back off like botocore's retry modes before trying again.
+
+    from app.scripts.fake_aws import AccountShape, FakeAWS
+    fake = FakeAWS(AccountShape(clusters=20), latency_scale=1.0, throttle_rate=0.02)
+    fake.install()   # every AWSResourceService client now talks to the fake
+
+Cluster i is named bench-0000.., with its RDS endpoint and ES endpoint given
+by cluster_endpoints(i).
+"""
+import time
+import random
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from botocore.awsrequest import AWSResponse
+
+ACCOUNT_ID = "123456789012"
+REGIONS = ["ap-south-1", "eu-west-1", "us-east-1", "us-west-2"]
+
+# Median latency per service, roughly what a scan sees from inside the region
+DEFAULT_LATENCY_MS = {
+    "eks": 120, "rds": 90, "es": 110, "ec2": 150, "elasticloadbalancing": 80,
+    "monitoring": 60, "sts": 40,
+}
+LATENCY_SIGMA = 0.35
+# (low, high) of the datapoints served per CloudWatch metric, in the metric's own unit
+METRIC_RANGES = {
+    "CPUUtilization": (5, 80), "DatabaseConnections": (10, 300), "JVMMemoryPressure": (30, 75),
+    "FreeStorageSpace": (50 * 1024**3, 400 * 1024**3),
+}
+MAX_BACKOFF_SECONDS = 20
+
+@dataclass
+class AccountShape:
+    """Size of the synthetic account; every cluster gets its own VPC of this shape"""
+    clusters: int = 20
+    node_groups: int = 4
+    load_balancers: int = 3
+    classic_load_balancers: int = 1
+    target_groups_per_lb: int = 2
+    targets_per_group: int = 3
+    listeners_per_lb: int = 2
+    network_interfaces: int = 12
+    nat_gateways: int = 2
+
+def cluster_name(index: int) -> str:
+    return f"bench-{index:04d}"
+
+def cluster_endpoints(index: int) -> Tuple[str, str]:
+    """(RDS endpoint, ES endpoint) the catalogue stores for cluster i"""
+    return (f"bench-db-{index:04d}.c0ffee.us-east-1.rds.amazonaws.com",
+            f"vpc-bench-es-{index:04d}-a1b2c3.us-east-1.es.amazonaws.com")
+
+def _vpc(index: int) -> str:
+    return f"vpc-{index:08x}"
+
+def _ip(index: int, n: int) -> str:
+    return f"52.{index % 250}.{n // 250}.{n % 250 + 1}"
+
+def _filter(params: Dict, name: str) -> Optional[str]:
+    for f in params.get("Filters", params.get("Filter", [])):
+        if f.get("Name") == name and f.get("Values"):
+            return f["Values"][0]
+    return None
+
+class FakeAWS:
+    def __init__(self, shape: AccountShape = None, region: str = "us-east-1", latency_scale: float = 1.0,
+                 throttle_rate: float = 0.0, max_attempts: int = 10, seed: Optional[int] = None):
+        self.shape = shape or AccountShape()
+        self.region = region
+        self.latency_scale = latency_scale
+        self.throttle_rate = throttle_rate
+        self.max_attempts = max_attempts
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self._build()
+
+    # --- synthetic account ---
+
+    def _build(self):
+        shape = self.shape
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.clusters = {}
+        self.node_groups = {}
+        self.db_instances = {}
+        self.domains = {}
+        self.nat_gateways = {}
+        self.interfaces = {}
+        self.load_balancers = []
+        self.classic_load_balancers = []
+        self.target_groups = []
+        self.listeners = {}
+        self.addresses = []
+
+        for i in range(shape.clusters):
+            name, vpc = cluster_name(i), _vpc(i)
+            rds_endpoint, _ = cluster_endpoints(i)
+            self.clusters[name] = {
+                "name": name, "arn": f"arn:aws:eks:{self.region}:{ACCOUNT_ID}:cluster/{name}",
+                "version": "1.29", "status": "ACTIVE", "endpoint": f"https://{i:032x}.gr7.{self.region}.eks.amazonaws.com",
+                "resourcesVpcConfig": {"vpcId": vpc, "subnetIds": [f"subnet-{i:05x}{az}" for az in range(3)]},
+            }
+            self.node_groups[name] = {
+                f"{name}-ng-{n}": {
+                    "nodegroupName": f"{name}-ng-{n}", "status": "ACTIVE", "instanceTypes": ["m6i.2xlarge"],
+                    "scalingConfig": {"minSize": 1, "maxSize": 10, "desiredSize": 3},
+                }
+                for n in range(shape.node_groups)
+            }
+            db_id = rds_endpoint.split(".")[0]
+            self.db_instances[db_id] = {
+                "DBInstanceIdentifier": db_id, "DBInstanceClass": "db.r6g.xlarge", "Engine": "mysql",
+                "EngineVersion": "8.0.35", "DBInstanceStatus": "available", "AllocatedStorage": 500,
+                "MultiAZ": True, "StorageEncrypted": True, "Endpoint": {"Address": rds_endpoint, "Port": 3306},
+            }
+            domain = f"bench-es-{i:04d}"
+            self.domains[domain] = {
+                "DomainName": domain, "ElasticsearchVersion": "7.10", "Processing": False,
+                "Endpoints": {"vpc": cluster_endpoints(i)[1]},
+                "ElasticsearchClusterConfig": {"InstanceType": "r6g.large.elasticsearch", "InstanceCount": 3},
+                "EBSOptions": {"VolumeSize": 200},
+            }
+
+            ip = 0
+            nats = []
+            for n in range(shape.nat_gateways):
+                nats.append({"NatGatewayId": f"nat-{i:05x}{n:04x}", "VpcId": vpc, "State": "available",
+                             "NatGatewayAddresses": [{"PublicIp": _ip(i, ip)}]})
+                ip += 1
+            self.nat_gateways[vpc] = nats
+
+            enis = []
+            for n in range(shape.network_interfaces):
+                public = _ip(i, ip)
+                ip += 1
+                eni = {
+                    "NetworkInterfaceId": f"eni-{i:05x}{n:06x}", "InterfaceType": "interface",
+                    "Description": "", "Attachment": {"InstanceId": f"i-{i:05x}{n:06x}"},
+                    "PrivateIpAddresses": [{"PrivateIpAddress": f"10.{i % 250}.{n // 250}.{n % 250 + 4}",
+                                            "Association": {"PublicIp": public}}],
+                    "TagSet": [{"Key": "Name", "Value": f"{name}-node-{n}"}],
+                }
+                if n < len(nats):
+                    eni.update(InterfaceType="nat_gateway", Description=f"Interface for NAT Gateway {nats[n]['NatGatewayId']}",
+                               Attachment={})
+                    eni["PrivateIpAddresses"][0]["Association"]["PublicIp"] = nats[n]["NatGatewayAddresses"][0]["PublicIp"]
+                elif n % 5 == 0:
+                    self.addresses.append({"PublicIp": public, "AllocationId": f"eipalloc-{i:05x}{n:06x}",
+                                           "AssociationId": f"eipassoc-{i:05x}{n:06x}", "Domain": "vpc",
+                                           "Tags": [{"Key": "Name", "Value": f"{name}-eip-{n}"}]})
+                enis.append(eni)
+            self.interfaces[vpc] = enis
+
+            for n in range(shape.load_balancers):
+                lb_name = f"{name}-alb-{n}"
+                arn = f"arn:aws:elasticloadbalancing:{self.region}:{ACCOUNT_ID}:loadbalancer/app/{lb_name}/{i:08x}{n:08x}"
+                self.load_balancers.append({
+                    "LoadBalancerArn": arn, "LoadBalancerName": lb_name, "DNSName": f"{lb_name}.{self.region}.elb.amazonaws.com",
+                    "Type": "application", "Scheme": "internet-facing", "State": {"Code": "active"}, "VpcId": vpc,
+                    "AvailabilityZones": [{"ZoneName": f"{self.region}{az}"} for az in "abc"],
+                    "SecurityGroups": [f"sg-{i:05x}{n:04x}"], "IpAddressType": "ipv4",
+                    "CanonicalHostedZoneId": "Z35SXDOTRQ7X7K", "CreatedTime": created,
+                })
+                tg_arns = []
+                for t in range(shape.target_groups_per_lb):
+                    tg_arn = f"arn:aws:elasticloadbalancing:{self.region}:{ACCOUNT_ID}:targetgroup/{lb_name}-tg{t}/{i:08x}{n:04x}{t:04x}"
+                    tg_arns.append(tg_arn)
+                    self.target_groups.append({
+                        "TargetGroupArn": tg_arn, "TargetGroupName": f"{lb_name}-tg{t}", "Protocol": "HTTP", "Port": 8080,
+                        "TargetType": "instance", "LoadBalancerArns": [arn], "HealthCheckProtocol": "HTTP",
+                        "HealthCheckPort": "traffic-port", "HealthCheckPath": "/healthz", "HealthCheckIntervalSeconds": 30,
+                        "HealthCheckTimeoutSeconds": 5, "HealthyThresholdCount": 3, "UnhealthyThresholdCount": 2,
+                    })
+                self.listeners[arn] = [
+                    {"ListenerArn": f"{arn.replace(':loadbalancer/', ':listener/')}/{l:08x}", "Protocol": "HTTPS" if l else "HTTP",
+                     "Port": 443 if l else 80, "SslPolicy": "ELBSecurityPolicy-2016-08" if l else None,
+                     "Certificates": [{"CertificateArn": f"arn:aws:acm:{self.region}:{ACCOUNT_ID}:certificate/{i:08x}"}] if l else [],
+                     "DefaultActions": [{"Type": "forward", "TargetGroupArn": tg_arns[l % len(tg_arns)]}] if tg_arns else []}
+                    for l in range(shape.listeners_per_lb)
+                ]
+            for n in range(shape.classic_load_balancers):
+                lb_name = f"{name}-clb-{n}"
+                self.classic_load_balancers.append({
+                    "LoadBalancerName": lb_name, "DNSName": f"{lb_name}.{self.region}.elb.amazonaws.com",
+                    "Scheme": "internal", "VPCId": vpc, "AvailabilityZones": [f"{self.region}a"],
+                    "SecurityGroups": [f"sg-{i:05x}c{n:03x}"], "CanonicalHostedZoneNameID": "Z35SXDOTRQ7X7K",
+                    "CreatedTime": created,
+                    "ListenerDescriptions": [{"Listener": {"Protocol": "TCP", "LoadBalancerPort": 443, "InstancePort": 30443}}],
+                })
+
+    def _respond(self, service: str, operation: str, params: Dict) -> Dict:
+        handler = getattr(self, f"_{service}_{operation}", None)
+        return handler(params) if handler else {}
+
+    def _sts_GetCallerIdentity(self, params):
+        return {"Account": ACCOUNT_ID, "Arn": f"arn:aws:iam::{ACCOUNT_ID}:user/bench", "UserId": "AIDABENCH"}
+
+    def _ec2_DescribeRegions(self, params):
+        return {"Regions": [{"RegionName": region} for region in REGIONS]}
+
+    def _eks_ListClusters(self, params):
+        return {"clusters": list(self.clusters)}
+
+    def _eks_DescribeCluster(self, params):
+        return {"cluster": self.clusters[params["name"]]}
+
+    def _eks_ListNodegroups(self, params):
+        return {"nodegroups": list(self.node_groups.get(params["clusterName"], {}))}
+
+    def _eks_DescribeNodegroup(self, params):
+        return {"nodegroup": self.node_groups[params["clusterName"]][params["nodegroupName"]]}
+
+    def _rds_DescribeDBInstances(self, params):
+        wanted = params.get("DBInstanceIdentifier")
+        if wanted:
+            return {"DBInstances": [self.db_instances[wanted]]}
+        return {"DBInstances": list(self.db_instances.values())}
+
+    def _es_ListDomainNames(self, params):
+        return {"DomainNames": [{"DomainName": name} for name in self.domains]}
+
+    def _es_DescribeElasticsearchDomain(self, params):
+        return {"DomainStatus": self.domains[params["DomainName"]]}
+
+    def _es_DescribeElasticsearchDomains(self, params):
+        return {"DomainStatusList": [self.domains[name] for name in params["DomainNames"] if name in self.domains]}
+
+    def _ec2_DescribeNatGateways(self, params):
+        return {"NatGateways": self.nat_gateways.get(_filter(params, "vpc-id"), [])}
+
+    def _ec2_DescribeNetworkInterfaces(self, params):
+        return {"NetworkInterfaces": self.interfaces.get(_filter(params, "vpc-id"), [])}
+
+    def _ec2_DescribeAddresses(self, params):
+        return {"Addresses": self.addresses}
+
+    def _elbv2_DescribeLoadBalancers(self, params):
+        return {"LoadBalancers": self.load_balancers}
+
+    def _elbv2_DescribeTargetGroups(self, params):
+        return {"TargetGroups": self.target_groups}
+
+    def _elbv2_DescribeTags(self, params):
+        return {"TagDescriptions": [
+            {"ResourceArn": arn, "Tags": [{"Key": "Name", "Value": arn.split("/")[-2]}, {"Key": "env", "Value": "bench"}]}
+            for arn in params["ResourceArns"]
+        ]}
+
+    def _elbv2_DescribeLoadBalancerAttributes(self, params):
+        return {"Attributes": [{"Key": "idle_timeout.timeout_seconds", "Value": "60"},
+                               {"Key": "deletion_protection.enabled", "Value": "true"}]}
+
+    def _elbv2_DescribeListeners(self, params):
+        return {"Listeners": self.listeners.get(params.get("LoadBalancerArn"), [])}
+
+    def _elbv2_DescribeTargetHealth(self, params):
+        return {"TargetHealthDescriptions": [
+            {"Target": {"Id": f"i-{params['TargetGroupArn'][-12:]}{t}", "Port": 30080},
+             "TargetHealth": {"State": "healthy" if t else "unhealthy", "Reason": None if t else "Target.FailedHealthChecks"}}
+            for t in range(self.shape.targets_per_group)
+        ]}
+
+    def _elb_DescribeLoadBalancers(self, params):
+        return {"LoadBalancerDescriptions": self.classic_load_balancers}
+
+    def _elb_DescribeTags(self, params):
+        return {"TagDescriptions": [{"LoadBalancerName": name, "Tags": [{"Key": "env", "Value": "bench"}]}
+                                    for name in params["LoadBalancerNames"]]}
+
+    def _elb_DescribeLoadBalancerAttributes(self, params):
+        return {"LoadBalancerAttributes": {"CrossZoneLoadBalancing": {"Enabled": True},
+                                           "ConnectionDraining": {"Enabled": True, "Timeout": 300}}}
+
+    def _cloudwatch_GetMetricStatistics(self, params):
+        period = timedelta(seconds=params.get("Period", 300))
+        ts, end = params["StartTime"], params["EndTime"]
+        low, high = METRIC_RANGES.get(params["MetricName"], (0, 100))
+        datapoints = []
+        while ts < end:
+            datapoints.append({"Timestamp": ts.replace(tzinfo=timezone.utc), "Average": self._random.uniform(low, high)})
+            ts += period
+        return {"Datapoints": datapoints, "Label": params["MetricName"]}
+
+    # --- latency and throttling ---
+
+    def _latency(self, endpoint_prefix: str) -> float:
+        median = DEFAULT_LATENCY_MS.get(endpoint_prefix, 100) * self.latency_scale / 1000
+        with self._lock:
+            return median * self._random.lognormvariate(0, LATENCY_SIGMA)
+
+    def _throttle(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.throttle_rate
+
+    def _backoff(self, attempt: int) -> float:
+        with self._lock:
+            return min(MAX_BACKOFF_SECONDS, self._random.random() * 2 ** attempt) * self.latency_scale
+
+    def _capture_params(self, params, context, **kwargs):
+        # before-call only sees the serialized request, so keep the call's own parameters
+        context["fake_aws_params"] = dict(params)
+
+    def _before_call(self, model, context, **kwargs):
+        params = context.get("fake_aws_params", {})
+        service_model = model.service_model
+        service = service_model.service_name
+        endpoint_prefix = service_model.endpoint_prefix
+        with self._lock:
+            self.calls += 1
+
+        for attempt in range(self.max_attempts):
+            time.sleep(self._latency(endpoint_prefix))
+            if not self._throttle():
+                return AWSResponse(f"https://{endpoint_prefix}.fake", 200, {}, None), self._respond(service, model.name, params)
+            with self._lock:
+                self.throttled += 1
+            if attempt + 1 < self.max_attempts:
+                time.sleep(self._backoff(attempt))
+        error = {"Error": {"Code": "Throttling", "Message": "Rate exceeded"},
+                 "ResponseMetadata": {"HTTPStatusCode": 400, "MaxAttemptsReached": True}}
+        return AWSResponse(f"https://{endpoint_prefix}.fake", 400, {}, None), error
+
+    def attach(self, client):
+        """Answer every call of a boto3 client from the fake account"""
+        if getattr(client, "_fake_aws", None) is not self:
+            client.meta.events.register("before-parameter-build", self._capture_params)
+            client.meta.events.register("before-call", self._before_call)
+            client._fake_aws = self
+        return client
+
+    def install(self):
+        """Route every AWSResourceService client through the fake, for the rest of the process"""
+        from app.services.cloud_services import AWSResourceService
+
+        original = AWSResourceService._client
+
+        def _client(service, service_name: str):
+            return self.attach(original(service, service_name))
+
+        AWSResourceService._client = _client
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "throttled_attempts": self.throttled}
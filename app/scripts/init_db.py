@@ -1,12 +1,17 @@
 import sys
 import os
+import logging
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import engine
-from app.models import Base
+from app.migrations import migrate
 
 if __name__ == "__main__":
-    print("Creating all tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Tables created successfully!")
+    logging.basicConfig(level=logging.INFO)
+    print("Migrating the schema...")
+    applied = migrate(engine)
+    if any(applied.values()):
+        print(f"Schema migrated: {applied}")
+    else:
+        print("Schema is up to date")
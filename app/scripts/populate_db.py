@@ -9,6 +9,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import SessionLocal, engine
 from app import models
+from app.services import lookup_index, fleet_rollups
+from app.services.cache import invalidate_cluster
 
 logging.basicConfig(
     level=logging.INFO,
@@ -104,8 +106,11 @@ def populate_database(csv_path: str):
                 db.refresh(env_record)
 
             
+                # The old one-to-one rows are flushed out before their replacements are added,
+                # since a flush inserts before it deletes and env_id is unique
                 if env_record.infrastructure:
                     db.delete(env_record.infrastructure)
+                    db.flush()
                 
                 infra_data = models.Infrastructure(
                     env_id=env_record.id,
@@ -123,8 +128,11 @@ def populate_database(csv_path: str):
                 )
                 db.add(infra_data)
 
+                previous_cluster_name = None
                 if env_record.cluster:
+                    previous_cluster_name = env_record.cluster.cluster_name
                     db.delete(env_record.cluster)
+                    db.flush()
                 
                 raw_cluster_name = (
                     clean_value(row.get('cluster_name_cluster')) or 
@@ -155,6 +163,7 @@ def populate_database(csv_path: str):
 
                 if env_record.data_store:
                     db.delete(env_record.data_store)
+                    db.flush()
 
                 data_store_data = models.DataStore(
                     env_id=env_record.id,
@@ -171,6 +180,7 @@ def populate_database(csv_path: str):
 
                 if env_record.application:
                     db.delete(env_record.application)
+                    db.flush()
 
                 app_data = models.Application(
                     env_id=env_record.id,
@@ -188,7 +198,15 @@ def populate_database(csv_path: str):
                 )
                 db.add(app_data)
 
+                lookup_index.reindex(
+                    db, env_record.id, lookup_index.CATALOGUE,
+                    lookup_index.catalogue_entries(env_record, infra_data, cluster_data, data_store_data)
+                )
+                fleet_rollups.refresh_environment(db, env_record.id)
+
                 db.commit()
+                for name in {previous_cluster_name, raw_cluster_name} - {None}:
+                    invalidate_cluster(name)
                 success_count += 1
                 
             except Exception as e:
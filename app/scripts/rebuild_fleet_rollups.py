@@ -0,0 +1,25 @@
+import sys
+import os
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.database import SessionLocal
+from app.services import fleet_rollups
+
+def rebuild_fleet_rollups():
+    db: Session = SessionLocal()
+
+    try:
+        fleet_rollups.rebuild(db)
+        db.commit()
+        print("Fleet rollups rebuilt successfully!")
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_fleet_rollups()
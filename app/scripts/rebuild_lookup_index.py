@@ -0,0 +1,39 @@
+import sys
+import os
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.database import SessionLocal
+from app import models
+from app.services import lookup_index
+from app.utils.format_responses import _format_fetch_aws_resources_response
+
+def rebuild_lookup_index():
+    """Rebuild every environment's lookup rows from the catalogue and the last stored scan"""
+    db: Session = SessionLocal()
+
+    try:
+        environments = db.query(models.Environment).all()
+        for env in environments:
+            lookup_index.reindex(
+                db, env.id, lookup_index.CATALOGUE,
+                lookup_index.catalogue_entries(env, env.infrastructure, env.cluster, env.data_store)
+            )
+            if env.aws_resources:
+                resources = _format_fetch_aws_resources_response(None, None, None, env.aws_resources)["resources"]
+                lookup_index.reindex(db, env.id, lookup_index.SCAN, lookup_index.scan_entries(resources))
+            else:
+                lookup_index.reindex(db, env.id, lookup_index.SCAN, [])
+
+        db.commit()
+        print(f"Lookup index rebuilt for {len(environments)} environments!")
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_lookup_index()
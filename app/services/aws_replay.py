@@ -0,0 +1,279 @@
+"""Record and replay of the boto3 responses AWSResourceService receives.
+
+AWS_RECORD_DIR=/path  Every response (and every cluster scan's inputs) is
+    appended to a gzip JSON-lines corpus in that directory, one file per
+    process. Identical bodies are stored once, and 12-digit account IDs are
+    replaced by stable placeholders before anything reaches disk.
+
+AWS_REPLAY_DIR=/path  Calls are answered from the corpus instead of AWS, after
+    sleeping the recorded latency times AWS_REPLAY_LATENCY_SCALE (0 for none).
+    Timestamps in the bodies are shifted so they look as recent as when they
+    were recorded. Calls with no recorded match get another response of the
+    same operation, unless AWS_REPLAY_STRICT=true makes them fail.
+
+Matching ignores datetimes and account IDs in the call parameters, so a scan
+replays whichever account and time window it was recorded in.
+"""
+import os
+import re
+import json
+import gzip
+import zlib
+import glob
+import time
+import base64
+import socket
+import atexit
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+RECORD_DIR = os.getenv("AWS_RECORD_DIR")
+REPLAY_DIR = os.getenv("AWS_REPLAY_DIR")
+REPLAY_LATENCY_SCALE = float(os.getenv("AWS_REPLAY_LATENCY_SCALE", "1.0"))
+REPLAY_STRICT = os.getenv("AWS_REPLAY_STRICT", "false").lower() == "true"
+# Records are written in gzip members of this many lines
+RECORD_BATCH_SIZE = 50
+
+ACCOUNT_ID_PATTERN = re.compile(r"(?<!\d)\d{12}(?!\d)")
+
+def _call_key(params: Dict) -> str:
+    """Parameters as a match key, with the parts that change between runs blanked out"""
+    def canonical(value):
+        if isinstance(value, dict):
+            return {k: canonical(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [canonical(v) for v in value]
+        if isinstance(value, datetime):
+            return "<time>"
+        if isinstance(value, str):
+            return ACCOUNT_ID_PATTERN.sub("<account>", value)
+        return value
+    return json.dumps(canonical(params), sort_keys=True, default=str)
+
+def _encode(value, scrub):
+    if isinstance(value, dict):
+        return {k: _encode(v, scrub) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v, scrub) for v in value]
+    if isinstance(value, datetime):
+        return {"__dt__": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"__b64__": base64.b64encode(value).decode()}
+    if isinstance(value, str):
+        return scrub(value)
+    return value
+
+def _decode(value, shift):
+    if isinstance(value, dict):
+        if "__dt__" in value:
+            return datetime.fromisoformat(value["__dt__"]) + shift
+        if "__b64__" in value:
+            return base64.b64decode(value["__b64__"])
+        return {k: _decode(v, shift) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v, shift) for v in value]
+    return value
+
+class Recorder:
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        self.path = os.path.join(directory, f"aws-{socket.gethostname()}-{os.getpid()}-{stamp}.jsonl.gz")
+        self._accounts: Dict[str, str] = {}
+        self._bodies = set()
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _scrub(self, text: str) -> str:
+        def placeholder(match):
+            return self._accounts.setdefault(match.group(0), f"{len(self._accounts) + 1:012d}")
+        return ACCOUNT_ID_PATTERN.sub(placeholder, text)
+
+    def _write(self, *records: Dict):
+        with self._lock:
+            self._pending.extend(json.dumps(record, separators=(",", ":")) for record in records)
+            if len(self._pending) >= RECORD_BATCH_SIZE:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        # Each batch is its own gzip member; concatenated members read back as one stream
+        with gzip.open(self.path, "at") as f:
+            f.write("\n".join(self._pending) + "\n")
+        self._pending = []
+
+    def record_call(self, service: str, operation: str, region: str, params: Dict, status: int,
+                    parsed: Dict, elapsed: float):
+        with self._lock:
+            body = json.dumps(_encode(parsed, self._scrub), separators=(",", ":"), sort_keys=True)
+        digest = hashlib.sha1(body.encode()).hexdigest()[:16]
+        records = []
+        with self._lock:
+            if digest not in self._bodies:
+                self._bodies.add(digest)
+                records.append({"t": "body", "h": digest, "b": json.loads(body)})
+        records.append({
+            "t": "call", "s": service, "o": operation, "r": region, "k": _call_key(params), "h": digest,
+            "st": status, "ms": round(elapsed * 1000, 3), "at": datetime.now(timezone.utc).isoformat()
+        })
+        self._write(*records)
+
+    def record_scan(self, cluster_name: str, rds_endpoint: Optional[str], es_endpoint: Optional[str],
+                    redis_host: Optional[str], region: str):
+        with self._lock:
+            scan = {"t": "scan", "cluster_name": cluster_name, "rds_endpoint": rds_endpoint,
+                    "es_endpoint": es_endpoint, "redis_host": redis_host, "region": region}
+            scan = {k: self._scrub(v) if isinstance(v, str) else v for k, v in scan.items()}
+        self._write(scan)
+
+    def attach(self, client, region: str):
+        service = client.meta.service_model.service_name
+
+        def capture(params, context, **kwargs):
+            context["record_params"] = dict(params)
+
+        def before_call(context, **kwargs):
+            context["record_started"] = time.perf_counter()
+
+        def after_call(http_response, parsed, model, context, **kwargs):
+            started = context.pop("record_started", None)
+            if started is None or any(hasattr(v, "read") for v in parsed.values()):
+                return
+            self.record_call(service, model.name, region, context.get("record_params", {}),
+                             http_response.status_code, parsed, time.perf_counter() - started)
+
+        client.meta.events.register("before-parameter-build", capture)
+        client.meta.events.register("before-call", before_call)
+        client.meta.events.register("after-call", after_call)
+        return client
+
+class _Call:
+    __slots__ = ("body", "status", "seconds", "recorded_at")
+
+    def __init__(self, body: str, status: int, seconds: float, recorded_at: datetime):
+        self.body = body
+        self.status = status
+        self.seconds = seconds
+        self.recorded_at = recorded_at
+
+class Replayer:
+    def __init__(self, directory: str, latency_scale: float = 1.0, strict: bool = False):
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.scans: List[Dict] = []
+        self.stats = {"hits": 0, "misses": 0}
+        self._calls: Dict[tuple, List[_Call]] = {}
+        self._by_operation: Dict[tuple, List[_Call]] = {}
+        self._next: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self._load(directory)
+
+    def _load(self, directory: str):
+        files = sorted(glob.glob(os.path.join(directory, "*.jsonl.gz")))
+        if not files:
+            raise FileNotFoundError(f"No AWS corpus (*.jsonl.gz) in {directory}")
+        for path in files:
+            bodies = {}
+            with gzip.open(path, "rt") as f:
+                try:
+                    for line in f:
+                        record = json.loads(line)
+                        if record["t"] == "body":
+                            # Kept serialized and decoded per replay, so callers can never mutate the corpus
+                            bodies[record["h"]] = json.dumps(record["b"])
+                        elif record["t"] == "call":
+                            call = _Call(bodies[record["h"]], record["st"], record["ms"] / 1000,
+                                         datetime.fromisoformat(record["at"]))
+                            self._calls.setdefault((record["s"], record["o"], record["k"]), []).append(call)
+                            self._by_operation.setdefault((record["s"], record["o"]), []).append(call)
+                        elif record["t"] == "scan":
+                            self.scans.append({k: v for k, v in record.items() if k != "t"})
+                except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError, UnicodeDecodeError) as e:
+                    # A recorder that was killed mid-write leaves a truncated last member or a cut line
+                    logger.warning(f"{path} is damaged ({type(e).__name__}: {str(e)}), replaying the records before it")
+        logger.info(f"Loaded {sum(len(c) for c in self._calls.values())} AWS responses from {len(files)} corpus files")
+
+    def _pick(self, key: tuple) -> Optional[_Call]:
+        with self._lock:
+            calls = self._calls.get(key)
+            if calls:
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                if self.strict:
+                    return None
+                key = key[:2]
+                calls = self._by_operation.get(key)
+                if not calls:
+                    return None
+            # Repeated calls walk through everything recorded for them
+            index = self._next.get(key, 0)
+            self._next[key] = index + 1
+            return calls[index % len(calls)]
+
+    def attach(self, client):
+        service = client.meta.service_model.service_name
+
+        def capture(params, context, **kwargs):
+            context["replay_params"] = dict(params)
+
+        def before_call(model, context, **kwargs):
+            call = self._pick((service, model.name, _call_key(context.get("replay_params", {}))))
+            if call is None:
+                raise ClientError({"Error": {"Code": "ReplayMiss", "Message": f"No recorded {service}.{model.name}"}},
+                                  model.name)
+            if self.latency_scale:
+                time.sleep(call.seconds * self.latency_scale)
+            shift = datetime.now(timezone.utc) - call.recorded_at
+            return AWSResponse(f"https://{service}.replay", call.status, {}, None), _decode(json.loads(call.body), shift)
+
+        client.meta.events.register("before-parameter-build", capture)
+        client.meta.events.register("before-call", before_call)
+        return client
+
+_recorder: Optional[Recorder] = None
+_replayer: Optional[Replayer] = None
+_setup_lock = threading.Lock()
+
+def _active():
+    global _recorder, _replayer
+    if not (REPLAY_DIR or RECORD_DIR) or _recorder or _replayer:
+        return _recorder, _replayer
+    with _setup_lock:
+        if REPLAY_DIR and _replayer is None:
+            _replayer = Replayer(REPLAY_DIR, REPLAY_LATENCY_SCALE, REPLAY_STRICT)
+        elif RECORD_DIR and not REPLAY_DIR and _recorder is None:
+            _recorder = Recorder(RECORD_DIR)
+    return _recorder, _replayer
+
+def attach(client, region: str):
+    """Record or replay a boto3 client's calls when AWS_RECORD_DIR or AWS_REPLAY_DIR is set"""
+    recorder, replayer = _active()
+    if replayer:
+        return replayer.attach(client)
+    if recorder:
+        return recorder.attach(client, region)
+    return client
+
+def note_scan(cluster_name: str, rds_endpoint: Optional[str], es_endpoint: Optional[str],
+              redis_host: Optional[str], region: str):
+    """Keep a scan's catalogue inputs in the corpus, so a replay can rebuild the catalogue it ran against"""
+    recorder, _ = _active()
+    if recorder:
+        recorder.record_scan(cluster_name, rds_endpoint, es_endpoint, redis_host, region)
+
+def replay_stats() -> Dict[str, int]:
+    return dict(_replayer.stats) if _replayer else {}
@@ -0,0 +1,356 @@
+import os
+import time
+import random
+import logging
+import threading
+import requests
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from app.services.scan_engine import ScanEngine, SharedListCache
+from app.services.instrumentation import arm_labels, observe_arm_call, register_cache_stats
+from app.services.tracing import start_span, traced
+
+logger = logging.getLogger(__name__)
+
+# Both can point at a local fake ARM server (app/scripts/fake_arm_server.py)
+ARM_ENDPOINT = os.getenv("AZURE_ARM_ENDPOINT", "https://management.azure.com")
+AUTHORITY_HOST = os.getenv("AZURE_AUTHORITY_HOST", "https://login.microsoftonline.com")
+# ARM throttles reads per subscription, so every scan of a subscription shares one budget of in-flight calls
+ARM_CONCURRENCY = int(os.getenv("AZURE_ARM_CONCURRENCY", "8"))
+ARM_MAX_RETRIES = int(os.getenv("AZURE_ARM_MAX_RETRIES", "5"))
+ARM_TIMEOUT_SECONDS = 30
+
+AKS_TYPE = "Microsoft.ContainerService/managedClusters"
+AKS_API_VERSION = "2024-05-01"
+REDIS_TYPE = "Microsoft.Cache/redis"
+REDIS_API_VERSION = "2023-08-01"
+METRICS_API_VERSION = "2018-01-01"
+# Flexible server type and API version per engine, as named in the server FQDN (<name>.<engine>.database.azure.com)
+DATABASE_TYPES = {
+    "postgres": ("Microsoft.DBforPostgreSQL/flexibleServers", "2022-12-01"),
+    "mysql": ("Microsoft.DBforMySQL/flexibleServers", "2023-06-30"),
+}
+
+_subscription_cache = SharedListCache(int(os.getenv("AZURE_LIST_CACHE_TTL_SECONDS", "60")))
+_subscription_slots: Dict[str, threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+def _slots(subscription_id: str) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        return _subscription_slots.setdefault(subscription_id, threading.BoundedSemaphore(ARM_CONCURRENCY))
+
+def database_engine(endpoint: str) -> Optional[str]:
+    parts = endpoint.split('.')
+    return parts[1] if len(parts) > 1 and parts[1] in DATABASE_TYPES else None
+
+def vnet_id(subnet_id: str) -> str:
+    return subnet_id.split('/subnets/')[0]
+
+class ClientSecretCredential:
+    """Service principal token for ARM, refreshed shortly before it expires"""
+
+    def __init__(self, tenant_id: str, client_id: str, client_secret: str, authority_host: Optional[str] = None,
+                 arm_endpoint: Optional[str] = None):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self._client_secret = client_secret
+        self.authority_host = (authority_host or AUTHORITY_HOST).rstrip('/')
+        self.scope = f"{(arm_endpoint or ARM_ENDPOINT).rstrip('/')}/.default"
+        self._token = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get_token(self) -> str:
+        with self._lock:
+            if self._token and self._expires - 300 > time.monotonic():
+                self.stats["hits"] += 1
+                return self._token
+            self.stats["misses"] += 1
+            response = requests.post(
+                f"{self.authority_host}/{self.tenant_id}/oauth2/v2.0/token",
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": self.client_id,
+                    "client_secret": self._client_secret,
+                    "scope": self.scope
+                },
+                timeout=ARM_TIMEOUT_SECONDS
+            )
+            response.raise_for_status()
+            payload = response.json()
+            self._token = payload["access_token"]
+            self._expires = time.monotonic() + int(payload.get("expires_in", 3600))
+            return self._token
+
+_credentials: Dict[Tuple[str, str], ClientSecretCredential] = {}
+_credentials_lock = threading.Lock()
+
+def token_cache_stats() -> Dict[str, int]:
+    stats = {"hits": 0, "misses": 0}
+    with _credentials_lock:
+        for credential in _credentials.values():
+            stats["hits"] += credential.stats["hits"]
+            stats["misses"] += credential.stats["misses"]
+    return stats
+
+# Registered here rather than in main, so the app does not import the Azure scanner before it scans Azure
+register_cache_stats("azure_token", token_cache_stats)
+
+def get_credential(tenant_id: str, client_id: str, client_secret: str) -> ClientSecretCredential:
+    """One credential per service principal, so every scan reuses the same token"""
+    with _credentials_lock:
+        key = (tenant_id, client_id)
+        if key not in _credentials:
+            _credentials[key] = ClientSecretCredential(tenant_id, client_id, client_secret)
+        return _credentials[key]
+
+class AzureResourceService(ScanEngine):
+    """AKS, Azure Database flexible servers and Azure Cache for Redis over ARM.
+
+    Results are returned in the same sections as AWSResourceService: the AKS
+    cluster fills eks, its node pools node_groups and the flexible server rds.
+    """
+
+    platform = "azure"
+
+    def __init__(self, credential: ClientSecretCredential, subscription_id: str, region: str,
+                 resource_group: Optional[str] = None, arm_endpoint: Optional[str] = None):
+        super().__init__(region)
+        self.credential = credential
+        self.subscription_id = subscription_id
+        self.resource_group = resource_group
+        self.arm_endpoint = (arm_endpoint or ARM_ENDPOINT).rstrip('/')
+        self._http = requests.Session()
+        # Sections of one scan looking up the same resource share a single ARM call
+        self._resources = SharedListCache(ttl_seconds=60)
+
+    def cluster_lookups(self, cluster_name: str, rds_endpoint: Optional[str], es_endpoint: Optional[str],
+                        redis_host: Optional[str]) -> Dict:
+        return {
+            "eks": lambda: self._describe_aks_cluster(cluster_name),
+            "node_groups": lambda: self._get_node_pools(cluster_name),
+            "rds": (lambda: self._get_database_info(rds_endpoint)) if rds_endpoint else None,
+            # There is no managed Elasticsearch on the Azure side of the fleet
+            "elasticsearch": None,
+            "redis": (lambda: self._get_redis_info(redis_host)) if redis_host else None,
+        }
+
+    def _arm_get(self, path: str, api_version: Optional[str] = None, params: Optional[Dict] = None) -> Dict:
+        """GET an ARM path (or a nextLink), backing off on throttling and transient errors"""
+        url = path if path.startswith("http") else f"{self.arm_endpoint}{path}"
+        params = dict(params or {})
+        if api_version:
+            params["api-version"] = api_version
+
+        service, operation = arm_labels(url)
+        call_span = start_span(f"azure {service}/{operation}", region=self.region)
+        started = time.perf_counter()
+        throttled = 0
+        response = None
+        attempt = 0
+        try:
+            for attempt in range(ARM_MAX_RETRIES + 1):
+                with _slots(self.subscription_id):
+                    response = self._http.get(
+                        url, params=params, timeout=ARM_TIMEOUT_SECONDS,
+                        headers={"Authorization": f"Bearer {self.credential.get_token()}"}
+                    )
+                throttled += response.status_code == 429
+                if response.status_code not in (429, 500, 502, 503, 504) or attempt == ARM_MAX_RETRIES:
+                    break
+                try:
+                    delay = float(response.headers.get("Retry-After", ""))
+                except ValueError:
+                    delay = min(2 ** attempt, 30) * random.uniform(0.5, 1.0)
+                logger.warning(f"ARM returned {response.status_code} for {path}, retrying in {delay:.1f}s")
+                time.sleep(min(delay, 60))
+        except Exception as e:
+            # Token and connection failures still close the span, or the trace shows the call as never ending
+            if call_span is not None:
+                call_span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            if call_span is not None:
+                call_span.finish(status=response.status_code if response is not None else None, retries=attempt)
+
+        observe_arm_call(url, self.region, response.status_code, time.perf_counter() - started, throttled)
+        response.raise_for_status()
+        return response.json()
+
+    def _arm_list(self, path: str, api_version: str) -> List[Dict]:
+        page = self._arm_get(path, api_version)
+        items = list(page.get("value", []))
+        while page.get("nextLink"):
+            # nextLink already carries the api-version and skip token
+            page = self._arm_get(page["nextLink"])
+            items.extend(page.get("value", []))
+        return items
+
+    def _find_resource(self, resource_type: str, name: str, api_version: str) -> Dict:
+        """An ARM resource by name: a direct GET in the catalogue resource group, else one subscription-wide list"""
+        return self._resources.get_or_load(
+            (resource_type, name.lower()),
+            lambda: self._load_resource(resource_type, name, api_version)
+        )
+
+    def _load_resource(self, resource_type: str, name: str, api_version: str) -> Dict:
+        if self.resource_group:
+            try:
+                return self._arm_get(
+                    f"/subscriptions/{self.subscription_id}/resourceGroups/{self.resource_group}"
+                    f"/providers/{resource_type}/{name}",
+                    api_version
+                )
+            except requests.HTTPError as e:
+                # The catalogue resource group may be out of date; fall back to the subscription listing
+                if e.response is None or e.response.status_code != 404:
+                    raise
+
+        resources = _subscription_cache.get_or_load(
+            (self.subscription_id, resource_type),
+            lambda: self._arm_list(f"/subscriptions/{self.subscription_id}/providers/{resource_type}", api_version)
+        )
+        for resource in resources:
+            if resource.get("name", "").lower() == name.lower():
+                return resource
+        raise LookupError(f"{resource_type} {name} not found in subscription {self.subscription_id}")
+
+    def _describe_aks_cluster(self, cluster_name: str) -> Dict:
+        try:
+            cluster = self._find_resource(AKS_TYPE, cluster_name, AKS_API_VERSION)
+            props = cluster.get("properties", {})
+            subnet_ids = sorted({
+                pool["vnetSubnetID"] for pool in props.get("agentPoolProfiles", []) if pool.get("vnetSubnetID")
+            })
+
+            return {
+                "name": cluster_name,
+                "status": props.get("powerState", {}).get("code") or props.get("provisioningState"),
+                "kubernetes_version": props.get("currentKubernetesVersion") or props.get("kubernetesVersion"),
+                "endpoint": props.get("fqdn") or props.get("privateFQDN"),
+                "arn": cluster.get("id"),
+                "vpc_id": vnet_id(subnet_ids[0]) if subnet_ids else None,
+                "subnet_ids": subnet_ids
+            }
+        except Exception as e:
+            logger.error(f"AKS error: {str(e)}")
+            return {"error": str(e)}
+
+    def _get_node_pools(self, cluster_name: str) -> Dict:
+        node_groups = []
+        total_nodes = 0
+        try:
+            cluster = self._find_resource(AKS_TYPE, cluster_name, AKS_API_VERSION)
+            for pool in self._arm_list(f"{cluster['id']}/agentPools", AKS_API_VERSION):
+                props = pool.get("properties", {})
+                count = props.get("count") or 0
+                autoscaling = props.get("enableAutoScaling", False)
+                total_nodes += count
+                node_groups.append({
+                    "name": pool.get("name"),
+                    "instance_types": [props["vmSize"]] if props.get("vmSize") else [],
+                    "desired_size": count,
+                    "min_size": props.get("minCount", count) if autoscaling else count,
+                    "max_size": props.get("maxCount", count) if autoscaling else count,
+                    "status": props.get("powerState", {}).get("code") or props.get("provisioningState")
+                })
+        except Exception as e:
+            logger.warning(f"Node pools error: {str(e)}")
+            return {"error": str(e)}
+
+        return {"node_groups": node_groups, "total_nodes": total_nodes}
+
+    def _find_database(self, name: str) -> Dict:
+        for resource_type, api_version in DATABASE_TYPES.values():
+            try:
+                return self._find_resource(resource_type, name, api_version)
+            except LookupError:
+                continue
+        raise LookupError(f"Azure Database {name} not found in subscription {self.subscription_id}")
+
+    def _get_database_info(self, endpoint: str) -> Optional[Dict]:
+        try:
+            engine = database_engine(endpoint)
+            name = endpoint.split('.')[0]
+            if engine:
+                resource_type, api_version = DATABASE_TYPES[engine]
+                server = self._find_resource(resource_type, name, api_version)
+            else:
+                server = self._find_database(name)
+                engine = next(e for e, (t, _) in DATABASE_TYPES.items() if t.lower() == server.get("type", "").lower())
+
+            props = server.get("properties", {})
+            sku = server.get("sku", {})
+            storage = props.get("storage", {})
+
+            return {
+                "identifier": server.get("name"),
+                "endpoint": props.get("fullyQualifiedDomainName"),
+                "status": props.get("state"),
+                "engine": engine,
+                "engine_version": props.get("version"),
+                "instance_class": sku.get("name"),
+                "allocated_storage_gb": storage.get("storageSizeGB"),
+                "multi_az": props.get("highAvailability", {}).get("mode", "Disabled") != "Disabled",
+                # Flexible servers always encrypt storage at rest
+                "storage_encrypted": True,
+                "performance": self.get_rds_metrics(name, self._database_metric_series(server["id"]))
+            }
+        except Exception as e:
+            logger.error(f"Azure Database error: {str(e)}")
+            return {"error": str(e)}
+
+    @traced
+    def get_rds_metric_series(self, db_id: str, minutes: int = 10) -> Dict[str, List[Tuple[datetime, float]]]:
+        return self._database_metric_series(self._find_database(db_id)["id"], minutes)
+
+    def _database_metric_series(self, server_id: str, minutes: int = 10) -> Dict[str, List[Tuple[datetime, float]]]:
+        """Azure Monitor utilization in the same series layout as the CloudWatch-backed RDS metrics"""
+        end = datetime.utcnow()
+        start = end - timedelta(minutes=minutes)
+        series = {}
+        try:
+            response = self._arm_get(f"{server_id}/providers/Microsoft.Insights/metrics", METRICS_API_VERSION, {
+                "metricnames": "cpu_percent,storage_used,storage_limit,active_connections",
+                "timespan": f"{start:%Y-%m-%dT%H:%M:%SZ}/{end:%Y-%m-%dT%H:%M:%SZ}",
+                "interval": "PT5M",
+                "aggregation": "Average"
+            })
+            for metric in response.get("value", []):
+                points = [
+                    (datetime.fromisoformat(point["timeStamp"].replace("Z", "+00:00")), point["average"])
+                    for timeseries in metric.get("timeseries", [])
+                    for point in timeseries.get("data", [])
+                    if point.get("average") is not None
+                ]
+                series[metric["name"]["value"]] = sorted(points)
+        except Exception as e:
+            logger.warning(f"Azure Monitor error for {server_id}: {str(e)}")
+
+        limits = dict(series.get("storage_limit", []))
+        return {
+            "cpu_percent": series.get("cpu_percent", []),
+            "free_storage_gb": [(ts, (limits[ts] - used) / (1024**3)) for ts, used in series.get("storage_used", []) if ts in limits],
+            "connections": series.get("active_connections", [])
+        }
+
+    def _get_redis_info(self, host: str) -> Optional[Dict]:
+        try:
+            cache = self._find_resource(REDIS_TYPE, host.split('.')[0], REDIS_API_VERSION)
+            props = cache.get("properties", {})
+            sku = props.get("sku") or {}
+
+            return {
+                "name": cache.get("name"),
+                "resource_id": cache.get("id"),
+                "host": props.get("hostName"),
+                "port": props.get("sslPort"),
+                "status": props.get("provisioningState"),
+                "engine_version": props.get("redisVersion"),
+                "node_type": f"{sku.get('name')} {sku.get('family')}{sku.get('capacity')}" if sku else None,
+                "shard_count": props.get("shardCount")
+            }
+        except Exception as e:
+            logger.error(f"Redis error: {str(e)}")
+            return {"error": str(e)}
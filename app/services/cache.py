@@ -0,0 +1,180 @@
+import json
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "inventory-cache-invalidations"
+
+class LocalBackend:
+    """In-memory stand-in for the shared backend, for tests and single-process runs"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[int] = None):
+        expires = time.monotonic() + ttl_seconds if ttl_seconds else None
+        with self._lock:
+            self._data[key] = (expires, value)
+
+    def claim(self, key: str, value: str, ttl_seconds: int) -> bool:
+        """Set key only if it is absent; True when this caller set it"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                return False
+            self._data[key] = (time.monotonic() + ttl_seconds, value)
+            return True
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def publish(self, message: str):
+        for callback in list(self._subscribers):
+            callback(message)
+
+    def subscribe(self, callback: Callable[[str], None]):
+        self._subscribers.append(callback)
+
+class RedisBackend:
+    """Shared backend on any Redis-protocol server; invalidations go over pub/sub"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._redis.get(key)
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[int] = None):
+        self._redis.set(key, value, ex=ttl_seconds)
+
+    def claim(self, key: str, value: str, ttl_seconds: int) -> bool:
+        return bool(self._redis.set(key, value, ex=ttl_seconds, nx=True))
+
+    def delete(self, *keys: str):
+        if keys:
+            self._redis.delete(*keys)
+
+    def publish(self, message: str):
+        self._redis.publish(INVALIDATION_CHANNEL, message)
+
+    def subscribe(self, callback: Callable[[str], None]):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{INVALIDATION_CHANNEL: lambda message: callback(message["data"])})
+        pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+class TwoLevelCache:
+    """Per-process LRU in front of a backend shared by every worker and pod.
+
+    Invalidations are published so every process drops its local copy; the
+    short local TTL bounds staleness if a message is ever missed.
+    """
+
+    def __init__(self, backend, l1_max_entries: int = 1024, l1_ttl_seconds: int = 30, ttl_seconds: int = 300):
+        self.backend = backend
+        self.l1_max_entries = l1_max_entries
+        self.l1_ttl_seconds = l1_ttl_seconds
+        self.ttl_seconds = ttl_seconds
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+        backend.subscribe(self._on_invalidation)
+
+    def _l1_get(self, key: str):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return entry[1]
+
+    def _l1_set(self, key: str, value):
+        with self._lock:
+            self._l1[key] = (time.monotonic() + self.l1_ttl_seconds, value)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _on_invalidation(self, message: str):
+        with self._lock:
+            for key in json.loads(message):
+                self._l1.pop(key, None)
+
+    def get(self, key: str):
+        value = self._l1_get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+        try:
+            raw = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Cache backend get failed for {key}: {str(e)}")
+            raw = None
+        if raw is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["l2_hits"] += 1
+        value = json.loads(raw)
+        self._l1_set(key, value)
+        return value
+
+    def set(self, key: str, value, ttl_seconds: Optional[int] = None):
+        self._l1_set(key, value)
+        try:
+            self.backend.set(key, json.dumps(value, default=str), ttl_seconds or self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Cache backend set failed for {key}: {str(e)}")
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+        try:
+            self.backend.delete(*keys)
+            self.backend.publish(json.dumps(list(keys)))
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for {keys}: {str(e)}")
+
+def inventory_key(cluster_name: str) -> str:
+    return f"inventory:{cluster_name}"
+
+def cluster_env_key(cluster_name: str) -> str:
+    return f"cluster-env:{cluster_name}"
+
+def invalidate_cluster(cluster_name: str):
+    inventory_cache.invalidate(inventory_key(cluster_name), cluster_env_key(cluster_name))
+
+def build_cache() -> TwoLevelCache:
+    redis_url = os.getenv("CACHE_REDIS_URL")
+    backend = RedisBackend(redis_url) if redis_url else LocalBackend()
+    return TwoLevelCache(
+        backend,
+        l1_max_entries=int(os.getenv("CACHE_L1_MAX_ENTRIES", "1024")),
+        l1_ttl_seconds=int(os.getenv("CACHE_L1_TTL_SECONDS", "30")),
+        ttl_seconds=int(os.getenv("CACHE_TTL_SECONDS", "900"))
+    )
+
+inventory_cache = build_cache()
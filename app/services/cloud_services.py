@@ -1,60 +1,176 @@
 import boto3
+import os
 import logging
-from typing import Optional, Dict, List
+import threading
+from typing import Optional, Dict, List, Tuple, Union
 from datetime import datetime, timedelta
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from app.services import aws_replay
+from app.services.scan_engine import ScanEngine, SharedListCache
+from app.services.instrumentation import instrument_boto_client
+from app.services.tracing import ContextThreadPoolExecutor, span, trace_boto_client, traced
 
 logger = logging.getLogger(__name__)
 
-class AWSResourceService:
+# Adaptive retries back off client-side when a large scan starts getting throttled
+BOTO_CONFIG = Config(retries={'max_attempts': 10, 'mode': 'adaptive'})
+SCAN_WORKERS = int(os.getenv("AWS_SCAN_WORKERS", "10"))
+# DescribeTags accepts at most 20 load balancers per call, for both ELB APIs
+ELB_TAGS_BATCH_SIZE = 20
+
+_region_cache = SharedListCache(int(os.getenv("REGION_LIST_CACHE_TTL_SECONDS", "60")))
+
+# Every service a scan or discovery talks to, whose models warm_clients() preloads
+SCAN_SERVICES = ("eks", "rds", "es", "ec2", "elbv2", "elb", "cloudwatch", "sts")
+
+# One boto3 session for the process: it caches the service models, so clients after the
+# first cost a few milliseconds instead of a JSON model load each. Credentials are per client.
+_session: Optional[boto3.Session] = None
+# boto3 sessions are not thread-safe, but the clients they create are
+_session_lock = threading.Lock()
+
+def _shared_session() -> boto3.Session:
+    global _session
+    if _session is None:
+        _session = boto3.Session()
+    return _session
+
+def warm_clients(region: str = "us-east-1"):
+    """Load the scan services' models into the shared session, so the first scan does not pay for it"""
+    with _session_lock:
+        session = _shared_session()
+        for service_name in SCAN_SERVICES:
+            session.client(service_name, region_name=region, aws_access_key_id="warmup", aws_secret_access_key="warmup")
+
+def rds_identifier(endpoint: str) -> str:
+    return endpoint.split('.')[0]
+
+def es_domain_name(endpoint: str) -> str:
+    """Domain name from an ES endpoint such as vpc-<domain>-<hash>.<region>.es.amazonaws.com"""
+    domain_parts = endpoint.split('.')[0]
+    if domain_parts.startswith('vpc-'):
+        domain_parts = domain_parts[4:]
+    parts = domain_parts.rsplit('-', 1)
+    return parts[0] if len(parts) > 1 else domain_parts
+
+class AWSResourceService(ScanEngine):
+    platform = "aws"
+
     def __init__(self, aws_access_key: str, aws_secret_key: str, aws_session_token: str, region: str):
-        self.session = boto3.Session(
-            aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key,
-            aws_session_token=aws_session_token,
-            region_name=region
-        )
-        self.region = region
-
-    def get_cluster_resources(self, cluster_name: str, rds_endpoint: Optional[str] = None, 
-                            es_endpoint: Optional[str] = None, redis_host: Optional[str] = None) -> Dict:
-        resources = {
-            "cluster_name": cluster_name,
-            "region": self.region,
-            "timestamp": datetime.utcnow().isoformat(),
-            "eks": self._get_eks_cluster_info(cluster_name),
-            "rds": self._get_rds_info(rds_endpoint) if rds_endpoint else None,
-            "elasticsearch": self._get_elasticsearch_info(es_endpoint) if es_endpoint else None,
+        super().__init__(region)
+        self._credentials = {
+            "aws_access_key_id": aws_access_key,
+            "aws_secret_access_key": aws_secret_key,
+            "aws_session_token": aws_session_token
         }
-        return resources
+        self._account_key = aws_access_key
+        self._clients = {}
+        self._clients_lock = threading.Lock()
 
-    def _get_eks_cluster_info(self, cluster_name: str) -> Optional[Dict]:
-        try:
-            eks = self.session.client('eks')
-            response = eks.describe_cluster(name=cluster_name)
-            cluster = response['cluster']
+    def _client(self, service_name: str):
+        with self._clients_lock:
+            if service_name not in self._clients:
+                with span("boto3.client", service=service_name), _session_lock:
+                    client = _shared_session().client(
+                        service_name, region_name=self.region, config=BOTO_CONFIG, **self._credentials
+                    )
+                client = trace_boto_client(instrument_boto_client(client, self.region), self.region)
+                self._clients[service_name] = aws_replay.attach(client, self.region)
+            return self._clients[service_name]
 
-            node_groups = []
-            total_nodes = 0
-            try:
-                ng_response = eks.list_nodegroups(clusterName=cluster_name)
-                for ng_name in ng_response.get('nodegroups', []):
-                    ng_detail = eks.describe_nodegroup(clusterName=cluster_name, nodegroupName=ng_name)
-                    desired = ng_detail['nodegroup']['scalingConfig'].get('desiredSize', 0)
-                    total_nodes += desired
-                    node_groups.append({
-                        "name": ng_name,
-                        "instance_types": ng_detail['nodegroup'].get('instanceTypes', []),
-                        "desired_size": desired,
-                        "min_size": ng_detail['nodegroup']['scalingConfig'].get('minSize', 0),
-                        "max_size": ng_detail['nodegroup']['scalingConfig'].get('maxSize', 0),
-                        "status": ng_detail['nodegroup'].get('status')
+    def cluster_lookups(self, cluster_name: str, rds_endpoint: Optional[str], es_endpoint: Optional[str],
+                        redis_host: Optional[str]) -> Dict:
+        aws_replay.note_scan(cluster_name, rds_endpoint, es_endpoint, redis_host, self.region)
+        return {
+            "eks": lambda: self._describe_eks_cluster(cluster_name),
+            "node_groups": lambda: self._get_node_groups(cluster_name),
+            "rds": (lambda: self._get_rds_info(rds_endpoint)) if rds_endpoint else None,
+            "elasticsearch": (lambda: self._get_elasticsearch_info(es_endpoint)) if es_endpoint else None,
+            # ElastiCache is not inventoried yet
+            "redis": None,
+        }
+
+    def network_lookups(self) -> Dict:
+        """NAT gateways, load balancers and public IPs are scoped to the cluster VPC"""
+        return {
+            "nat_gateway_ips": self._get_nat_ips,
+            "load_balancers": self._get_load_balancers,
+            "public_ips": self._get_public_ips,
+        }
+
+    def before_targeted_scan(self, sections: List[str]):
+        # A change event means the shared region-wide lists may already be out of date
+        if "load_balancers" in sections:
+            for service_name, operation in (('elbv2', 'describe_load_balancers'), ('elb', 'describe_load_balancers'),
+                                            ('elbv2', 'describe_target_groups')):
+                _region_cache.invalidate((self._account_key, self.region, service_name, operation))
+        if "public_ips" in sections:
+            _region_cache.invalidate((self._account_key, self.region, 'ec2', 'describe_addresses'))
+
+    @traced
+    def list_region_inventory(self) -> Dict:
+        """Every EKS cluster, RDS instance and ES domain in this region, one list call per service"""
+        # DescribeElasticsearchDomains accepts at most 5 domain names per call
+        es_batch_size = 5
+
+        def eks_clusters():
+            return self._paginate('eks', 'list_clusters', 'clusters')
+
+        def rds_instances():
+            return [
+                {
+                    "identifier": db.get('DBInstanceIdentifier'),
+                    "endpoint": db.get('Endpoint', {}).get('Address'),
+                    "engine": db.get('Engine'),
+                    "instance_class": db.get('DBInstanceClass'),
+                    "status": db.get('DBInstanceStatus')
+                }
+                for db in self._paginate('rds', 'describe_db_instances', 'DBInstances')
+            ]
+
+        def es_domains():
+            names = [d['DomainName'] for d in self._paginate('es', 'list_domain_names', 'DomainNames')]
+            domains = []
+            for i in range(0, len(names), es_batch_size):
+                response = self._client('es').describe_elasticsearch_domains(DomainNames=names[i:i + es_batch_size])
+                for domain in response.get('DomainStatusList', []):
+                    domains.append({
+                        "domain_name": domain.get('DomainName'),
+                        "endpoint": domain.get('Endpoint') or domain.get('Endpoints', {}).get('vpc'),
+                        "version": domain.get('ElasticsearchVersion')
                     })
-            except Exception as e:
-                logger.warning(f"Node groups error: {str(e)}")
+            return domains
+
+        lookups = {"eks_clusters": eks_clusters, "rds_instances": rds_instances, "es_domains": es_domains}
+        inventory = {"region": self.region, "errors": {}}
+        with ContextThreadPoolExecutor(max_workers=len(lookups)) as pool:
+            futures = {name: pool.submit(lookup) for name, lookup in lookups.items()}
+            for name, future in futures.items():
+                try:
+                    inventory[name] = future.result()
+                except Exception as e:
+                    logger.warning(f"{name} listing failed in {self.region}: {str(e)}")
+                    inventory[name] = []
+                    inventory["errors"][name] = str(e)
+        return inventory
+
+    @traced
+    def get_account_id(self) -> str:
+        return self._client('sts').get_caller_identity()['Account']
 
-            vpc_id = cluster.get('resourcesVpcConfig', {}).get('vpcId')
-            nat_ips = self._get_nat_ips(vpc_id) if vpc_id else []
+    @traced
+    def list_enabled_regions(self) -> List[str]:
+        response = self._client('ec2').describe_regions(
+            Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+        )
+        return sorted(region['RegionName'] for region in response.get('Regions', []))
+
+    def _describe_eks_cluster(self, cluster_name: str) -> Dict:
+        try:
+            eks = self._client('eks')
+            response = eks.describe_cluster(name=cluster_name)
+            cluster = response['cluster']
 
             return {
                 "name": cluster_name,
@@ -62,30 +178,45 @@ class AWSResourceService:
                 "kubernetes_version": cluster.get('version'),
                 "endpoint": cluster.get('endpoint'),
                 "arn": cluster.get('arn'),
-                "vpc_id": vpc_id,
-                "subnet_ids": cluster.get('resourcesVpcConfig', {}).get('subnetIds', []),
-                "nat_gateway_ips": nat_ips,
-                "node_groups": node_groups,
-                "total_nodes": total_nodes
+                "vpc_id": cluster.get('resourcesVpcConfig', {}).get('vpcId'),
+                "subnet_ids": cluster.get('resourcesVpcConfig', {}).get('subnetIds', [])
             }
         except Exception as e:
             logger.error(f"EKS error: {str(e)}")
             return {"error": str(e)}
 
+    def _get_node_groups(self, cluster_name: str) -> Dict:
+        node_groups = []
+        total_nodes = 0
+        try:
+            eks = self._client('eks')
+            ng_response = eks.list_nodegroups(clusterName=cluster_name)
+            for ng_name in ng_response.get('nodegroups', []):
+                ng_detail = eks.describe_nodegroup(clusterName=cluster_name, nodegroupName=ng_name)
+                desired = ng_detail['nodegroup']['scalingConfig'].get('desiredSize', 0)
+                total_nodes += desired
+                node_groups.append({
+                    "name": ng_name,
+                    "instance_types": ng_detail['nodegroup'].get('instanceTypes', []),
+                    "desired_size": desired,
+                    "min_size": ng_detail['nodegroup']['scalingConfig'].get('minSize', 0),
+                    "max_size": ng_detail['nodegroup']['scalingConfig'].get('maxSize', 0),
+                    "status": ng_detail['nodegroup'].get('status')
+                })
+        except Exception as e:
+            logger.warning(f"Node groups error: {str(e)}")
+            return {"error": str(e)}
+
+        return {"node_groups": node_groups, "total_nodes": total_nodes}
+
     def _get_rds_info(self, endpoint: str) -> Optional[Dict]:
         try:
-            db_id = endpoint.split('.')[0]
-            rds = self.session.client('rds')
+            db_id = rds_identifier(endpoint)
+            rds = self._client('rds')
             response = rds.describe_db_instances(DBInstanceIdentifier=db_id)
             db = response['DBInstances'][0]
 
-            cw = self.session.client('cloudwatch')
-            cpu = self._get_metric(cw, 'AWS/RDS', 'CPUUtilization', [{'Name': 'DBInstanceIdentifier', 'Value': db_id}])
-            free_storage = self._get_metric(cw, 'AWS/RDS', 'FreeStorageSpace', [{'Name': 'DBInstanceIdentifier', 'Value': db_id}])
-            connections = self._get_metric(cw, 'AWS/RDS', 'DatabaseConnections', [{'Name': 'DBInstanceIdentifier', 'Value': db_id}])
-
             allocated = db.get('AllocatedStorage', 0)
-            free_gb = (free_storage / (1024**3)) if free_storage else 0
 
             return {
                 "identifier": db_id,
@@ -97,25 +228,40 @@ class AWSResourceService:
                 "allocated_storage_gb": allocated,
                 "multi_az": db.get('MultiAZ'),
                 "storage_encrypted": db.get('StorageEncrypted'),
-                "performance": {
-                    "cpu_percent": round(cpu, 2) if cpu else None,
-                    "free_storage_gb": round(free_gb, 2),
-                    "connections": int(connections) if connections else 0
-                }
+                "performance": self.get_rds_metrics(db_id)
             }
         except Exception as e:
             logger.error(f"RDS error: {str(e)}")
             return {"error": str(e)}
 
+    @traced
+    def get_rds_metric_series(self, db_id: str, minutes: int = 10) -> Dict[str, List[Tuple[datetime, float]]]:
+        cw = self._client('cloudwatch')
+        dims = [{'Name': 'DBInstanceIdentifier', 'Value': db_id}]
+        free_storage = self._get_metric_series(cw, 'AWS/RDS', 'FreeStorageSpace', dims, minutes)
+        return {
+            "cpu_percent": self._get_metric_series(cw, 'AWS/RDS', 'CPUUtilization', dims, minutes),
+            "free_storage_gb": [(ts, value / (1024**3)) for ts, value in free_storage],
+            "connections": self._get_metric_series(cw, 'AWS/RDS', 'DatabaseConnections', dims, minutes)
+        }
+
+    @traced
+    def get_es_metric_series(self, domain_name: str, account_id: str, minutes: int = 10) -> Dict[str, List[Tuple[datetime, float]]]:
+        cw = self._client('cloudwatch')
+        dims = [{'Name': 'DomainName', 'Value': domain_name}, {'Name': 'ClientId', 'Value': account_id}]
+        free_storage = self._get_metric_series(cw, 'AWS/ES', 'FreeStorageSpace', dims, minutes)
+        return {
+            "cpu_percent": self._get_metric_series(cw, 'AWS/ES', 'CPUUtilization', dims, minutes),
+            # AWS/ES reports FreeStorageSpace in megabytes
+            "free_storage_gb": [(ts, value / 1024) for ts, value in free_storage],
+            "jvm_memory_pressure": self._get_metric_series(cw, 'AWS/ES', 'JVMMemoryPressure', dims, minutes)
+        }
+
     def _get_elasticsearch_info(self, endpoint: str) -> Optional[Dict]:
         try:
-            domain_parts = endpoint.split('.')[0]
-            if domain_parts.startswith('vpc-'):
-                domain_parts = domain_parts[4:]
-            parts = domain_parts.rsplit('-', 1)
-            domain_name = parts[0] if len(parts) > 1 else domain_parts
+            domain_name = es_domain_name(endpoint)
             
-            es = self.session.client('es')
+            es = self._client('es')
             response = es.describe_elasticsearch_domain(DomainName=domain_name)
             domain = response['DomainStatus']
 
@@ -139,11 +285,12 @@ class AWSResourceService:
             return {"error": str(e)}
 
 
-    def _get_nat_ips(self, vpc_id: str) -> List[str]:
+    def _get_nat_ips(self, vpc_id: str) -> Union[List[str], Dict]:
         try:
-            ec2 = self.session.client('ec2')
+            ec2 = self._client('ec2')
+            # DescribeNatGateways names its filter list Filter, unlike the other EC2 describe calls
             response = ec2.describe_nat_gateways(
-                Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}, {'Name': 'state', 'Values': ['available']}]
+                Filter=[{'Name': 'vpc-id', 'Values': [vpc_id]}, {'Name': 'state', 'Values': ['available']}]
             )
             ips = []
             for nat in response.get('NatGateways', []):
@@ -151,18 +298,265 @@ class AWSResourceService:
                     if addr.get('PublicIp'):
                         ips.append(addr['PublicIp'])
             return ips
-        except:
+        except Exception as e:
+            logger.warning(f"NAT gateway error: {str(e)}")
+            return {"error": str(e)}
+
+    def _paginate(self, service_name: str, operation: str, result_key: str, **kwargs) -> List[Dict]:
+        client = self._client(service_name)
+        if not client.can_paginate(operation):
+            return getattr(client, operation)(**kwargs).get(result_key, [])
+        items = []
+        for page in client.get_paginator(operation).paginate(**kwargs):
+            items.extend(page.get(result_key, []))
+        return items
+
+    def _region_wide(self, service_name: str, operation: str, result_key: str) -> List[Dict]:
+        """One unfiltered list call per account and region, shared across cluster scans"""
+        return _region_cache.get_or_load(
+            (self._account_key, self.region, service_name, operation),
+            lambda: self._paginate(service_name, operation, result_key)
+        )
+
+    def _get_load_balancers(self, vpc_id: str) -> Union[List[Dict], Dict]:
+        try:
+            elbv2_lbs = [lb for lb in self._region_wide('elbv2', 'describe_load_balancers', 'LoadBalancers')
+                         if lb.get('VpcId') == vpc_id]
+            classic_lbs = [lb for lb in self._region_wide('elb', 'describe_load_balancers', 'LoadBalancerDescriptions')
+                           if lb.get('VPCId') == vpc_id]
+        except Exception as e:
+            logger.error(f"Error fetching load balancers: {str(e)}")
+            return {"error": str(e)}
+
+        lb_arns = [lb['LoadBalancerArn'] for lb in elbv2_lbs]
+        classic_names = [lb['LoadBalancerName'] for lb in classic_lbs]
+        target_groups = []
+        if lb_arns:
+            try:
+                vpc_lb_arns = set(lb_arns)
+                target_groups = [tg for tg in self._region_wide('elbv2', 'describe_target_groups', 'TargetGroups')
+                                 if vpc_lb_arns.intersection(tg.get('LoadBalancerArns', []))]
+            except Exception as e:
+                logger.warning(f"Failed to get target groups: {str(e)}")
+        tg_arns = [tg['TargetGroupArn'] for tg in target_groups]
+
+        with ContextThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+            tags_future = pool.submit(self._get_elb_tags, 'elbv2', 'ResourceArns', lb_arns)
+            classic_tags_future = pool.submit(self._get_elb_tags, 'elb', 'LoadBalancerNames', classic_names)
+            attributes = dict(zip(lb_arns, pool.map(self._get_lb_attributes, lb_arns)))
+            listeners = dict(zip(lb_arns, pool.map(self._get_lb_listeners, lb_arns)))
+            health = dict(zip(tg_arns, pool.map(self._get_target_health, tg_arns)))
+            classic_attributes = dict(zip(classic_names, pool.map(self._get_classic_lb_attributes, classic_names)))
+            tags = tags_future.result()
+            classic_tags = classic_tags_future.result()
+
+        load_balancers = []
+        for lb in elbv2_lbs:
+            arn = lb['LoadBalancerArn']
+            load_balancers.append({
+                "name": lb.get('LoadBalancerName'),
+                "arn": arn,
+                "dns_name": lb.get('DNSName'),
+                "type": lb.get('Type'),
+                "scheme": lb.get('Scheme'),
+                "state": lb.get('State', {}).get('Code'),
+                "vpc_id": lb.get('VpcId'),
+                "availability_zones": [az.get('ZoneName') for az in lb.get('AvailabilityZones', [])],
+                "security_groups": lb.get('SecurityGroups', []),
+                "ip_address_type": lb.get('IpAddressType'),
+                "hosted_zone_id": lb.get('CanonicalHostedZoneId'),
+                "created_time": lb.get('CreatedTime'),
+                "attributes": attributes.get(arn),
+                "tags": tags.get(arn, {}),
+                "target_groups": [
+                    self._format_target_group(tg, health.get(tg['TargetGroupArn'], []))
+                    for tg in target_groups if arn in tg.get('LoadBalancerArns', [])
+                ],
+                "listeners": listeners.get(arn, [])
+            })
+
+        for lb in classic_lbs:
+            name = lb['LoadBalancerName']
+            load_balancers.append({
+                "name": name,
+                "arn": None,
+                "dns_name": lb.get('DNSName'),
+                "type": "classic",
+                "scheme": lb.get('Scheme'),
+                "state": None,
+                "vpc_id": lb.get('VPCId'),
+                "availability_zones": lb.get('AvailabilityZones', []),
+                "security_groups": lb.get('SecurityGroups', []),
+                "ip_address_type": None,
+                "hosted_zone_id": lb.get('CanonicalHostedZoneNameID'),
+                "created_time": lb.get('CreatedTime'),
+                "attributes": classic_attributes.get(name),
+                "tags": classic_tags.get(name, {}),
+                "target_groups": [],
+                "listeners": [
+                    {
+                        "arn": None,
+                        "protocol": desc.get('Listener', {}).get('Protocol'),
+                        "port": desc.get('Listener', {}).get('LoadBalancerPort'),
+                        "ssl_policy": None,
+                        "certificates": [desc['Listener']['SSLCertificateId']] if desc.get('Listener', {}).get('SSLCertificateId') else [],
+                        "default_actions": []
+                    }
+                    for desc in lb.get('ListenerDescriptions', [])
+                ]
+            })
+
+        logger.info(f"Found {len(load_balancers)} load balancers in {vpc_id}")
+        return load_balancers
+
+    def _get_elb_tags(self, service_name: str, id_param: str, ids: List[str]) -> Dict[str, Dict]:
+        tags = {}
+        client = self._client(service_name)
+        for i in range(0, len(ids), ELB_TAGS_BATCH_SIZE):
+            batch = ids[i:i + ELB_TAGS_BATCH_SIZE]
+            try:
+                response = client.describe_tags(**{id_param: batch})
+                for desc in response.get('TagDescriptions', []):
+                    key = desc.get('ResourceArn') or desc.get('LoadBalancerName')
+                    tags[key] = {tag['Key']: tag.get('Value') for tag in desc.get('Tags', [])}
+            except Exception as e:
+                logger.warning(f"Failed to get LB tags: {str(e)}")
+        return tags
+
+    def _get_lb_attributes(self, arn: str) -> Optional[Dict]:
+        try:
+            response = self._client('elbv2').describe_load_balancer_attributes(LoadBalancerArn=arn)
+            return {attr['Key']: attr.get('Value') for attr in response.get('Attributes', [])}
+        except Exception as e:
+            logger.warning(f"Failed to get LB attributes for {arn}: {str(e)}")
+            return None
+
+    def _get_classic_lb_attributes(self, name: str) -> Optional[Dict]:
+        try:
+            response = self._client('elb').describe_load_balancer_attributes(LoadBalancerName=name)
+            return response.get('LoadBalancerAttributes')
+        except Exception as e:
+            logger.warning(f"Failed to get LB attributes for {name}: {str(e)}")
+            return None
+
+    def _get_lb_listeners(self, arn: str) -> List[Dict]:
+        try:
+            listeners = self._paginate('elbv2', 'describe_listeners', 'Listeners', LoadBalancerArn=arn)
+        except Exception as e:
+            logger.warning(f"Failed to get listeners for {arn}: {str(e)}")
             return []
+        return [
+            {
+                "arn": listener.get('ListenerArn'),
+                "protocol": listener.get('Protocol'),
+                "port": listener.get('Port'),
+                "ssl_policy": listener.get('SslPolicy'),
+                "certificates": [cert.get('CertificateArn') for cert in listener.get('Certificates', [])],
+                "default_actions": [
+                    {"type": action.get('Type'), "target_group_arn": action.get('TargetGroupArn')}
+                    for action in listener.get('DefaultActions', [])
+                ]
+            }
+            for listener in listeners
+        ]
+
+    def _get_target_health(self, tg_arn: str) -> List[Dict]:
+        try:
+            response = self._client('elbv2').describe_target_health(TargetGroupArn=tg_arn)
+        except Exception as e:
+            logger.warning(f"Failed to get target health for {tg_arn}: {str(e)}")
+            return []
+        return [
+            {
+                "id": desc.get('Target', {}).get('Id'),
+                "port": desc.get('Target', {}).get('Port'),
+                "state": desc.get('TargetHealth', {}).get('State'),
+                "reason": desc.get('TargetHealth', {}).get('Reason')
+            }
+            for desc in response.get('TargetHealthDescriptions', [])
+        ]
 
-    def _get_metric(self, cw, namespace: str, metric: str, dims: List[Dict]) -> Optional[float]:
+    def _format_target_group(self, tg: Dict, targets: List[Dict]) -> Dict:
+        return {
+            "name": tg.get('TargetGroupName'),
+            "arn": tg.get('TargetGroupArn'),
+            "protocol": tg.get('Protocol'),
+            "port": tg.get('Port'),
+            "target_type": tg.get('TargetType'),
+            "health_check": {
+                "protocol": tg.get('HealthCheckProtocol'),
+                "port": tg.get('HealthCheckPort'),
+                "path": tg.get('HealthCheckPath'),
+                "interval_seconds": tg.get('HealthCheckIntervalSeconds'),
+                "timeout_seconds": tg.get('HealthCheckTimeoutSeconds'),
+                "healthy_threshold": tg.get('HealthyThresholdCount'),
+                "unhealthy_threshold": tg.get('UnhealthyThresholdCount')
+            },
+            "healthy_count": sum(1 for t in targets if t["state"] == "healthy"),
+            "unhealthy_count": sum(1 for t in targets if t["state"] == "unhealthy"),
+            "targets": targets
+        }
+
+    def _get_public_ips(self, vpc_id: str) -> Union[List[Dict], Dict]:
+        """Public IPs attached anywhere in the VPC: EIPs, NAT gateways, load balancers and EC2 instances"""
+        try:
+            interfaces = self._paginate('ec2', 'describe_network_interfaces', 'NetworkInterfaces',
+                                        Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
+            addresses = {addr['PublicIp']: addr for addr in self._region_wide('ec2', 'describe_addresses', 'Addresses')}
+        except Exception as e:
+            logger.error(f"Error fetching public IPs: {str(e)}")
+            return {"error": str(e)}
+
+        public_ips = []
+        for eni in interfaces:
+            description = eni.get('Description') or ''
+            instance_id = eni.get('Attachment', {}).get('InstanceId')
+            if eni.get('InterfaceType') == 'nat_gateway':
+                source_type, source_id = "nat_gateway", description.rsplit(' ', 1)[-1]
+            elif description.startswith('ELB '):
+                # e.g. "ELB app/my-alb/50dc6c495c0c9188"
+                source_type, source_id = "load_balancer", description[4:]
+            elif instance_id:
+                source_type, source_id = "ec2_instance", instance_id
+            else:
+                source_type, source_id = "network_interface", eni.get('NetworkInterfaceId')
+
+            for private_ip in eni.get('PrivateIpAddresses', []):
+                public_ip = private_ip.get('Association', {}).get('PublicIp')
+                if not public_ip:
+                    continue
+                eip = addresses.get(public_ip, {})
+                tags = {tag['Key']: tag.get('Value') for tag in eip.get('Tags', eni.get('TagSet', []))}
+                source_name = tags.get('Name')
+                if source_type == "load_balancer" and not source_name:
+                    source_name = source_id.split('/')[1] if '/' in source_id else source_id
+                public_ips.append({
+                    "public_ip": public_ip,
+                    "private_ip": private_ip.get('PrivateIpAddress'),
+                    "allocation_id": eip.get('AllocationId'),
+                    "association_id": eip.get('AssociationId'),
+                    "domain": eip.get('Domain'),
+                    "instance_id": instance_id,
+                    "network_interface_id": eni.get('NetworkInterfaceId'),
+                    "source_type": "eip" if eip and source_type == "ec2_instance" else source_type,
+                    "source_id": source_id,
+                    "source_name": source_name,
+                    "tags": tags
+                })
+
+        logger.info(f"Found {len(public_ips)} public IPs in {vpc_id}")
+        return public_ips
+
+    def _get_metric_series(self, cw, namespace: str, metric: str, dims: List[Dict], minutes: int = 10) -> List[Tuple[datetime, float]]:
         try:
             end = datetime.utcnow()
-            start = end - timedelta(minutes=10)
+            start = end - timedelta(minutes=minutes)
             response = cw.get_metric_statistics(
                 Namespace=namespace, MetricName=metric, Dimensions=dims,
                 StartTime=start, EndTime=end, Period=300, Statistics=['Average']
             )
-            datapoints = response.get('Datapoints', [])
-            return sorted(datapoints, key=lambda x: x['Timestamp'])[-1]['Average'] if datapoints else None
-        except:
-            return None
+            datapoints = sorted(response.get('Datapoints', []), key=lambda x: x['Timestamp'])
+            return [(dp['Timestamp'], dp['Average']) for dp in datapoints]
+        except (ClientError, BotoCoreError) as e:
+            logger.warning(f"Failed to get {namespace} {metric}: {str(e)}")
+            return []
@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session, joinedload
+from app import models
+from app.services.cloud_services import AWSResourceService, rds_identifier, es_domain_name
+from app.services.instrumentation import track_scan
+from app.services.tracing import ContextThreadPoolExecutor, traced
+
+logger = logging.getLogger(__name__)
+
+REGION_WORKERS = int(os.getenv("DISCOVERY_REGION_WORKERS", "16"))
+HOME_REGION = os.getenv("DISCOVERY_HOME_REGION", "us-east-1")
+
+@traced
+def discover_account(db: Session, aws_key: str, aws_secret: str, aws_token: str, account_id: str,
+                     regions: Optional[List[str]] = None) -> Dict:
+    """List every EKS cluster, RDS instance and ES domain in the account and reconcile them with the catalogue"""
+    started = time.monotonic()
+    home = AWSResourceService(aws_key, aws_secret, aws_token, HOME_REGION)
+    actual_account = home.get_account_id()
+    if actual_account != account_id:
+        raise ValueError(f"Configured credentials belong to account {actual_account}, not {account_id}")
+
+    regions = regions or home.list_enabled_regions()
+    with track_scan("aws", "discovery"), ContextThreadPoolExecutor(max_workers=min(len(regions), REGION_WORKERS) or 1) as pool:
+        inventories = list(pool.map(
+            lambda region: AWSResourceService(aws_key, aws_secret, aws_token, region).list_region_inventory(),
+            regions
+        ))
+
+    report = reconcile(db, account_id, inventories)
+    report["regions_scanned"] = regions
+    report["duration_seconds"] = round(time.monotonic() - started, 2)
+    return report
+
+@traced
+def reconcile(db: Session, account_id: str, inventories: List[Dict]) -> Dict:
+    """Match discovered resources to catalogue environments of the account.
+
+    Resources with no environment are reported as not_in_catalogue, catalogue
+    entries that were not found in any scanned region as orphaned, or as
+    unverified when their catalogue region was not (successfully) scanned.
+    """
+    environments = db.query(models.Environment).options(
+        joinedload(models.Environment.cluster), joinedload(models.Environment.data_store)
+    ).filter(models.Environment.account_id == account_id).all()
+
+    expected = {"eks_clusters": {}, "rds_instances": {}, "es_domains": {}}
+    for env in environments:
+        if env.cluster and env.cluster.cluster_name not in (None, "Unknown"):
+            expected["eks_clusters"][env.cluster.cluster_name] = env
+        if env.data_store and env.data_store.rds_endpoint:
+            expected["rds_instances"][rds_identifier(env.data_store.rds_endpoint)] = env
+        if env.data_store and env.data_store.es_endpoint:
+            expected["es_domains"][es_domain_name(env.data_store.es_endpoint)] = env
+
+    discovered = {
+        "eks_clusters": [(name, inv["region"]) for inv in inventories for name in inv.get("eks_clusters", [])],
+        "rds_instances": [(instance["identifier"], inv["region"]) for inv in inventories for instance in inv.get("rds_instances", [])],
+        "es_domains": [(d["domain_name"], inv["region"]) for inv in inventories for d in inv.get("es_domains", [])],
+    }
+
+    report = {"success": True, "account_id": account_id, "summary": {}, "errors": {}}
+    for kind, found in discovered.items():
+        matched, not_in_catalogue = [], []
+        seen = set()
+        for name, region in found:
+            env = expected[kind].get(name)
+            if env is None:
+                not_in_catalogue.append({"name": name, "region": region})
+                continue
+            seen.add(name)
+            matched.append({
+                "name": name,
+                "region": region,
+                "slug": env.slug,
+                "catalogue_region": env.region,
+                "region_mismatch": env.region != region
+            })
+        # Only call something orphaned if its catalogue region was listed without errors
+        verified_regions = {inv["region"] for inv in inventories if kind not in inv.get("errors", {})}
+        orphaned, unverified = [], []
+        for name, env in expected[kind].items():
+            if name in seen:
+                continue
+            entry = {"name": name, "slug": env.slug, "catalogue_region": env.region}
+            (orphaned if env.region in verified_regions else unverified).append(entry)
+        report[kind] = {"matched": matched, "not_in_catalogue": not_in_catalogue,
+                        "orphaned": orphaned, "unverified": unverified}
+        report["summary"][kind] = {
+            "discovered": len(found),
+            "matched": len(matched),
+            "not_in_catalogue": len(not_in_catalogue),
+            "orphaned": len(orphaned),
+            "unverified": len(unverified)
+        }
+
+    for inv in inventories:
+        if inv.get("errors"):
+            report["errors"][inv["region"]] = inv["errors"]
+    return report
@@ -0,0 +1,225 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app import models, crud
+from app.database import SessionLocal
+from app.services import providers
+from app.services.cache import inventory_cache, invalidate_cluster
+from app.services.lookup_index import normalize
+
+logger = logging.getLogger(__name__)
+
+RESCAN = "rescan"
+INVALIDATE = "invalidate"
+
+BATCH_WINDOW_SECONDS = float(os.getenv("EVENT_BATCH_WINDOW_SECONDS", "30"))
+REFRESH_WORKERS = int(os.getenv("EVENT_REFRESH_WORKERS", "4"))
+
+# Request/response fields whose values can identify the affected resource
+IDENTIFIER_FIELDS = {
+    "name", "clustername", "dbinstanceidentifier", "sourceidentifier", "domainname",
+    "subnetid", "vpcid", "loadbalancerarn", "targetgrouparn", "loadbalancername",
+}
+
+# Lookup kinds too broad to pin an event to one environment
+IGNORED_LOOKUP_KINDS = {"account_id", "slug"}
+
+def _event_sections(source: str, event_name: str) -> Set[str]:
+    """Inventory sections an AWS change event can affect"""
+    if source in ("eks.amazonaws.com", "aws.eks"):
+        return {"node_groups"} if "nodegroup" in event_name.lower() else {"eks"}
+    if source in ("rds.amazonaws.com", "aws.rds"):
+        return {"rds"}
+    if source in ("es.amazonaws.com", "aws.es", "opensearch.amazonaws.com"):
+        return {"elasticsearch"}
+    if source in ("ec2.amazonaws.com", "aws.ec2"):
+        if "natgateway" in event_name.lower():
+            return {"nat_gateway_ips", "public_ips"}
+        if "address" in event_name.lower():
+            return {"public_ips"}
+        return set()
+    if source in ("elasticloadbalancing.amazonaws.com", "aws.elasticloadbalancing"):
+        return {"load_balancers", "public_ips"}
+    return set()
+
+def _collect_identifiers(value, found: Set[str]):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, str) and key.lower() in IDENTIFIER_FIELDS:
+                found.add(item)
+            else:
+                _collect_identifiers(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_identifiers(item, found)
+
+def _arn_identifiers(arn: str) -> List[str]:
+    """The ARN itself plus the resource name it carries, e.g. the cluster of a nodegroup ARN"""
+    identifiers = [arn]
+    resource = arn.split(":", 5)[-1]
+    if resource.startswith("db:"):
+        identifiers.append(resource[3:])
+    elif resource.startswith(("cluster/", "domain/", "nodegroup/")):
+        identifiers.append(resource.split("/")[1])
+    return identifiers
+
+def parse_event(event: Dict) -> Tuple[Set[str], Set[str]]:
+    """(sections, identifiers) for an EventBridge event or a raw CloudTrail record"""
+    detail = event.get("detail") if isinstance(event.get("detail"), dict) else event
+    event_name = detail.get("eventName") or event.get("detail-type") or ""
+    if event_name.startswith(("Describe", "List", "Get")):
+        return set(), set()
+
+    source = detail.get("eventSource") or event.get("source") or ""
+    sections = _event_sections(source, event_name)
+    if not sections:
+        return set(), set()
+
+    identifiers = set()
+    _collect_identifiers(detail.get("requestParameters") or {}, identifiers)
+    _collect_identifiers(detail.get("responseElements") or {}, identifiers)
+    if detail.get("SourceIdentifier"):
+        identifiers.add(detail["SourceIdentifier"])
+    for arn in list(event.get("resources") or []) + [r.get("ARN") for r in detail.get("resources") or [] if isinstance(r, dict)]:
+        if isinstance(arn, str) and arn.startswith("arn:"):
+            identifiers.update(_arn_identifiers(arn))
+    return sections, identifiers
+
+def resolve_environments(db: Session, identifiers: Iterable[str]) -> Set[int]:
+    values = {normalize(value) for value in identifiers} - {None}
+    if not values:
+        return set()
+    rows = db.query(models.ResourceLookup.env_id).filter(
+        models.ResourceLookup.value.in_(values),
+        models.ResourceLookup.kind.notin_(IGNORED_LOOKUP_KINDS)
+    ).distinct().all()
+    return {env_id for (env_id,) in rows}
+
+def _claim_rescan(env_id: int, section: str, last_event_at: float, ttl_seconds: int) -> bool:
+    """Whether this worker should rescan a section, given what other workers have already rescanned.
+
+    Claims live in the shared cache backend and hold the time the rescan started, so a
+    burst spread over several workers is rescanned once, while an event that arrived
+    after another worker's rescan began still gets its own.
+    """
+    key = f"event-refresh:{env_id}:{section}"
+    now = repr(time.time())
+    backend = inventory_cache.backend
+    try:
+        if backend.claim(key, now, ttl_seconds):
+            return True
+        claimed_at = backend.get(key)
+        if claimed_at is not None and float(claimed_at) >= last_event_at:
+            return False
+        backend.set(key, now, ttl_seconds)
+    except Exception as e:
+        logger.warning(f"Could not coordinate the rescan of {section} for environment {env_id}: {str(e)}")
+    return True
+
+class EventBatcher:
+    """Collects affected sections per environment and refreshes each once per window.
+
+    Batches are per process, but rescans are claimed per section through the shared
+    cache backend (CACHE_REDIS_URL), so a burst landing on several workers refreshes
+    each section once. Without Redis every worker refreshes what it received.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._pending: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def add(self, env_id: int, sections: Set[str], mode: str):
+        with self._lock:
+            entry = self._pending.setdefault(env_id, {"sections": set(), "mode": INVALIDATE})
+            entry["sections"].update(sections)
+            entry["last_event_at"] = time.time()
+            if mode == RESCAN:
+                entry["mode"] = RESCAN
+            if self._timer is None:
+                self._timer = threading.Timer(self.window_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            timer, self._timer = self._timer, None
+        if timer:
+            timer.cancel()
+        if not batch:
+            return
+        claim_ttl = max(1, int(self.window_seconds))
+        for env_id, entry in list(batch.items()):
+            if entry["mode"] == RESCAN:
+                entry["sections"] = {
+                    section for section in entry["sections"]
+                    if _claim_rescan(env_id, section, entry["last_event_at"], claim_ttl)
+                }
+                if not entry["sections"]:
+                    del batch[env_id]
+        if not batch:
+            return
+        logger.info(f"Refreshing {len(batch)} environments from change events")
+        with ThreadPoolExecutor(max_workers=REFRESH_WORKERS) as pool:
+            for env_id, entry in batch.items():
+                pool.submit(self._refresh_safely, env_id, entry["sections"], entry["mode"])
+
+    def _refresh_safely(self, env_id: int, sections: Set[str], mode: str):
+        try:
+            refresh_environment_sections(env_id, sections, mode)
+        except Exception as e:
+            logger.error(f"Event refresh failed for environment {env_id}: {str(e)}")
+
+def refresh_environment_sections(env_id: int, sections: Set[str], mode: str):
+    """Rescan only the affected sections of one environment, or just mark its scan stale"""
+    db = SessionLocal()
+    try:
+        env_record = db.get(models.Environment, env_id)
+        aws_resource = env_record.aws_resources if env_record else None
+        cluster_name = env_record.cluster.cluster_name if env_record and env_record.cluster else None
+        if not aws_resource or not cluster_name:
+            return
+
+        scanner = None
+        if mode == RESCAN:
+            try:
+                scanner = providers.get_provider(env_record)
+            except (providers.ProviderNotConfigured, providers.UnsupportedPlatform) as e:
+                logger.warning(f"{str(e)}, falling back to invalidation")
+                mode = INVALIDATE
+
+        if mode == INVALIDATE:
+            # The next read sees a stale topology and rescans
+            aws_resource.topology_last_synced = None
+        else:
+            data_store = env_record.data_store
+            scanned = scanner.scan_sections(
+                cluster_name,
+                sorted(sections),
+                rds_endpoint=data_store.rds_endpoint if data_store else None,
+                es_endpoint=data_store.es_endpoint if data_store else None,
+                vpc_id=aws_resource.eks.vpc_id if aws_resource.eks else None,
+                redis_host=data_store.redis_host if data_store else None
+            )
+            crud.replace_sections(db, aws_resource, scanned)
+
+        db.commit()
+        invalidate_cluster(cluster_name)
+        logger.info(f"Event {mode} of {cluster_name}: {', '.join(sorted(sections))}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+event_batcher = EventBatcher(BATCH_WINDOW_SECONDS)
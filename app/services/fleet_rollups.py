@@ -0,0 +1,168 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# dimension -> description, returned by the aggregates endpoint
+DIMENSIONS = {
+    "environments_by_platform": "Environments per cloud platform",
+    "environments_by_tier": "Environments per customer tier",
+    "infra_multi_az": "Environments by catalogue multi-AZ flag",
+    "eks_clusters_by_region": "Scanned EKS clusters per region",
+    "eks_nodes_by_region": "Desired EKS nodes per region",
+    "kubernetes_version": "EKS clusters per Kubernetes version",
+    "rds_instance_class": "RDS instances per instance class",
+    "rds_multi_az": "RDS instances by multi-AZ deployment",
+    "es_volume_gb_by_tier": "ElasticSearch EBS volume (GB, all data nodes) per customer tier",
+    "redis_node_type": "Redis caches per node type / SKU",
+    "load_balancers_by_type": "Load balancers per type",
+}
+
+def _key(value) -> str:
+    if value is None or value == "":
+        return "unknown"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+def environment_contributions(db: Session, env: models.Environment) -> Dict[Tuple[str, str], float]:
+    """Everything one environment adds to the rollups, read from the current (flushed) rows"""
+    contributions = {}
+
+    def add(dimension: str, key, amount: float = 1):
+        dim_key = (dimension, _key(key))
+        contributions[dim_key] = contributions.get(dim_key, 0) + (amount or 0)
+
+    add("environments_by_platform", env.cloud_platform)
+    add("environments_by_tier", env.type)
+    infra = db.query(models.Infrastructure).filter(models.Infrastructure.env_id == env.id).first()
+    if infra:
+        add("infra_multi_az", infra.is_multi_az)
+
+    aws_resource = db.query(models.AWSResource).filter(models.AWSResource.env_id == env.id).first()
+    if not aws_resource:
+        return contributions
+
+    eks = db.query(models.EKSCluster).filter(models.EKSCluster.aws_resource_id == aws_resource.id).first()
+    if eks:
+        add("eks_clusters_by_region", env.region)
+        add("eks_nodes_by_region", env.region, eks.total_nodes)
+        add("kubernetes_version", eks.kubernetes_version)
+
+    rds = db.query(models.RDSInstance).filter(models.RDSInstance.aws_resource_id == aws_resource.id).first()
+    if rds:
+        add("rds_instance_class", rds.instance_class)
+        add("rds_multi_az", bool(rds.multi_az))
+
+    es = db.query(models.ElasticSearch).filter(models.ElasticSearch.aws_resource_id == aws_resource.id).first()
+    if es:
+        add("es_volume_gb_by_tier", env.type, (es.volume_size_gb or 0) * (es.instance_count or 1))
+
+    redis = db.query(models.RedisCache).filter(models.RedisCache.aws_resource_id == aws_resource.id).first()
+    if redis:
+        add("redis_node_type", redis.node_type)
+
+    lb_types = db.query(models.LoadBalancer.type).filter(models.LoadBalancer.aws_resource_id == aws_resource.id).all()
+    for (lb_type,) in lb_types:
+        add("load_balancers_by_type", lb_type)
+
+    return contributions
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def _apply_delta(db: Session, dimension: str, key: str, total_delta: float, env_delta: int):
+    """Add a delta to one rollup row, creating it if needed.
+
+    Concurrent scans may create the same row, so this is a single upsert where the
+    dialect has one, and otherwise an insert in a savepoint that falls back to the update.
+    """
+    rollups = models.FleetRollup.__table__
+    upsert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if upsert:
+        stmt = upsert(rollups).values(dimension=dimension, key=key, total=total_delta, environments=env_delta)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[rollups.c.dimension, rollups.c.key],
+            set_={
+                "total": rollups.c.total + stmt.excluded.total,
+                "environments": rollups.c.environments + stmt.excluded.environments
+            }
+        ))
+        return
+
+    def update() -> int:
+        return db.query(models.FleetRollup).filter(
+            models.FleetRollup.dimension == dimension,
+            models.FleetRollup.key == key
+        ).update({
+            models.FleetRollup.total: models.FleetRollup.total + total_delta,
+            models.FleetRollup.environments: models.FleetRollup.environments + env_delta
+        }, synchronize_session=False)
+
+    if update():
+        return
+    try:
+        with db.begin_nested():
+            db.add(models.FleetRollup(dimension=dimension, key=key, total=total_delta, environments=env_delta))
+    except IntegrityError:
+        # Another scan created the row first
+        update()
+
+def refresh_environment(db: Session, env_id: int):
+    """Recompute one environment's contributions and apply only the difference to the rollups.
+
+    Called after a scan or import has added its rows; the caller commits.
+
+    Two refreshes of one environment (an event rescan and a user fetch) would both
+    subtract the same old contributions, so the environment row stays locked until
+    the caller commits and the second refresh reads the first one's rows. SQLite
+    has no row locks; there the database write lock taken by the flush does it.
+    """
+    db.flush()
+    env = db.query(models.Environment).filter(
+        models.Environment.id == env_id
+    ).with_for_update().populate_existing().one_or_none()
+    new = environment_contributions(db, env) if env else {}
+
+    old_rows = db.query(models.FleetRollupContribution).filter(
+        models.FleetRollupContribution.env_id == env_id
+    ).all()
+    old = {(row.dimension, row.key): row.amount for row in old_rows}
+
+    for dim_key in set(old) | set(new):
+        total_delta = new.get(dim_key, 0) - old.get(dim_key, 0)
+        env_delta = (dim_key in new) - (dim_key in old)
+        if total_delta or env_delta:
+            _apply_delta(db, dim_key[0], dim_key[1], total_delta, env_delta)
+
+    if old != new:
+        for row in old_rows:
+            db.delete(row)
+        for (dimension, key), amount in new.items():
+            db.add(models.FleetRollupContribution(env_id=env_id, dimension=dimension, key=key, amount=amount))
+
+    db.query(models.FleetRollup).filter(models.FleetRollup.environments <= 0).delete(synchronize_session=False)
+
+def get_aggregates(db: Session, dimensions: Optional[List[str]] = None) -> Dict[str, Dict]:
+    q = db.query(models.FleetRollup)
+    if dimensions:
+        q = q.filter(models.FleetRollup.dimension.in_(dimensions))
+
+    aggregates = {dimension: {} for dimension in (dimensions or DIMENSIONS)}
+    for row in q.order_by(models.FleetRollup.dimension, models.FleetRollup.key).all():
+        aggregates.setdefault(row.dimension, {})[row.key] = {
+            "total": round(row.total, 2),
+            "environments": row.environments
+        }
+    return aggregates
+
+def rebuild(db: Session):
+    """Recompute every rollup from scratch; the caller commits"""
+    db.query(models.FleetRollupContribution).delete(synchronize_session=False)
+    db.query(models.FleetRollup).delete(synchronize_session=False)
+    for (env_id,) in db.query(models.Environment.id).all():
+        refresh_environment(db, env_id)
@@ -0,0 +1,247 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SCAN_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+# Error codes AWS uses when it throttles a caller, across services
+AWS_THROTTLE_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottledException",
+    "TooManyRequestsException", "RequestLimitExceeded", "RequestThrottled", "SlowDown",
+    "ProvisionedThroughputExceededException", "BandwidthLimitExceeded", "EC2ThrottledException",
+}
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements executed per request",
+    ["route"], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Time spent executing SQL per request",
+    ["route"], buckets=LATENCY_BUCKETS
+)
+CLOUD_API_LATENCY = Histogram(
+    "cloud_api_call_duration_seconds", "Cloud provider API call latency, retries included",
+    ["provider", "service", "operation", "region"], buckets=LATENCY_BUCKETS
+)
+CLOUD_API_ERRORS = Counter(
+    "cloud_api_errors_total", "Cloud provider API calls that failed after retries",
+    ["provider", "service", "operation", "region", "code"]
+)
+CLOUD_API_THROTTLES = Counter(
+    "cloud_api_throttles_total", "Cloud provider API attempts that were throttled",
+    ["provider", "service", "operation", "region"]
+)
+SCANS_IN_FLIGHT = Gauge(
+    "cloud_scans_in_flight", "Scans currently running",
+    ["provider", "kind"], multiprocess_mode="livesum"
+)
+SCAN_DURATION = Histogram(
+    "cloud_scan_duration_seconds", "Wall time of whole scans",
+    ["provider", "kind"], buckets=SCAN_BUCKETS
+)
+
+class _RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+# Shared with the threadpool through the copied context, so sync work is attributed to its request
+_request_stats: ContextVar[Optional[_RequestStats]] = ContextVar("request_stats", default=None)
+
+def _route_label(scope: dict) -> str:
+    # The route template keeps label cardinality bounded; unmatched paths share one label
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every request, streamed bodies included"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = _RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = _route_label(scope)
+            REQUEST_LATENCY.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+            REQUEST_DB_QUERIES.labels(route).observe(stats.queries)
+            REQUEST_DB_DURATION.labels(route).observe(stats.db_seconds)
+            _request_stats.reset(token)
+
+def instrument_engine(engine):
+    """Count and time every SQL statement against the request that issued it"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _finish_query(conn)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        if exception_context.connection is not None:
+            _finish_query(exception_context.connection)
+
+def _finish_query(conn):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+def instrument_boto_client(client, region: str):
+    """Time every call of a boto3 client and count its errors and throttled attempts"""
+    service = client.meta.service_model.service_name
+    events = client.meta.events
+
+    def before_call(model, context, **kwargs):
+        context["metrics_started"] = time.perf_counter()
+        context["metrics_operation"] = model.name
+
+    def after_call(http_response, parsed, model, context, **kwargs):
+        _observe_aws(context, model.name)
+        if http_response.status_code >= 300:
+            code = parsed.get("Error", {}).get("Code") or str(http_response.status_code)
+            CLOUD_API_ERRORS.labels("aws", service, model.name, region, code).inc()
+
+    def after_call_error(exception, context, **kwargs):
+        operation = context.get("metrics_operation", "unknown")
+        _observe_aws(context, operation)
+        CLOUD_API_ERRORS.labels("aws", service, operation, region, type(exception).__name__).inc()
+
+    def needs_retry(response, operation, **kwargs):
+        if response and response[1].get("Error", {}).get("Code") in AWS_THROTTLE_CODES:
+            CLOUD_API_THROTTLES.labels("aws", service, operation.name, region).inc()
+
+    def _observe_aws(context, operation):
+        started = context.pop("metrics_started", None)
+        if started is not None:
+            CLOUD_API_LATENCY.labels("aws", service, operation, region).observe(time.perf_counter() - started)
+
+    events.register("before-call", before_call)
+    events.register("after-call", after_call)
+    events.register("after-call-error", after_call_error)
+    events.register("needs-retry", needs_retry)
+    return client
+
+def arm_labels(url: str):
+    """(resource provider, resource type path) of an ARM URL, e.g. Microsoft.ContainerService, managedClusters/agentPools"""
+    path = urlsplit(url).path
+    if "/providers/" not in path:
+        return "Microsoft.Resources", "resources"
+    namespace, _, rest = path.rsplit("/providers/", 1)[1].partition("/")
+    return namespace, "/".join(rest.split("/")[0::2])
+
+def observe_arm_call(url: str, region: str, status: int, elapsed: float, attempts_throttled: int):
+    service, operation = arm_labels(url)
+    CLOUD_API_LATENCY.labels("azure", service, operation, region).observe(elapsed)
+    if attempts_throttled:
+        CLOUD_API_THROTTLES.labels("azure", service, operation, region).inc(attempts_throttled)
+    if status >= 400:
+        CLOUD_API_ERRORS.labels("azure", service, operation, region, str(status)).inc()
+
+@contextmanager
+def track_scan(provider: str, kind: str):
+    """In-flight gauge and duration of one scan; kind is full, targeted or discovery"""
+    gauge = SCANS_IN_FLIGHT.labels(provider, kind)
+    gauge.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        gauge.dec()
+        SCAN_DURATION.labels(provider, kind).observe(time.perf_counter() - started)
+
+_cache_sources: Dict[str, Callable[[], Dict[str, int]]] = {}
+_queue_sources: Dict[str, Callable[[], int]] = {}
+
+def register_cache_stats(name: str, source: Callable[[], Dict[str, int]]):
+    """source returns counters such as {"hits": .., "misses": ..}; keys ending in hits count as hits"""
+    _cache_sources[name] = source
+
+def register_queue_depth(name: str, source: Callable[[], int]):
+    _queue_sources[name] = source
+
+class _RuntimeCollector:
+    """Reads cache counters and queue depths at scrape time, so the hot paths pay nothing extra"""
+
+    def collect(self):
+        requests = CounterMetricFamily("cache_requests", "Cache lookups by cache and result", labels=["cache", "result"])
+        ratios = GaugeMetricFamily("cache_hit_ratio", "Hits over lookups since process start", labels=["cache"])
+        for name, source in _cache_sources.items():
+            try:
+                stats = dict(source())
+            except Exception as e:
+                logger.warning(f"Cache stats for {name} unavailable: {str(e)}")
+                continue
+            for result, count in stats.items():
+                requests.add_metric([name, result], count)
+            total = sum(stats.values())
+            hits = sum(count for result, count in stats.items() if result.endswith("hits"))
+            ratios.add_metric([name], hits / total if total else 0.0)
+        yield requests
+        yield ratios
+
+        depth = GaugeMetricFamily("scan_queue_depth", "Environments waiting for a refresh", labels=["queue"])
+        for name, source in _queue_sources.items():
+            try:
+                depth.add_metric([name], source())
+            except Exception as e:
+                logger.warning(f"Queue depth for {name} unavailable: {str(e)}")
+        yield depth
+
+_runtime_collector = _RuntimeCollector()
+REGISTRY.register(_runtime_collector)
+
+def render_metrics():
+    """(body, content type) of the Prometheus text exposition.
+
+    With PROMETHEUS_MULTIPROC_DIR set (several workers), histograms and
+    counters are merged across workers; cache and queue figures stay per worker.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_runtime_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
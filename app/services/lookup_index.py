@@ -0,0 +1,145 @@
+import ipaddress
+import logging
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import or_, func
+from sqlalchemy.orm import Session
+from app import models
+
+logger = logging.getLogger(__name__)
+
+SCAN = "scan"
+CATALOGUE = "catalogue"
+
+def normalize(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    for scheme in ("https://", "http://"):
+        if value.startswith(scheme):
+            value = value[len(scheme):]
+    return value.rstrip("/") or None
+
+def _ip_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """Address range for an IPv4 address or CIDR, (None, None) for anything else"""
+    try:
+        network = ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return None, None
+    if network.version != 4:
+        return None, None
+    return int(network.network_address), int(network.broadcast_address)
+
+def scan_entries(resources: Dict) -> List[Tuple[str, str]]:
+    """(kind, value) pairs for a scan result as produced by a ScanEngine provider"""
+    entries = []
+    eks = resources.get("eks")
+    if eks and not eks.get("error"):
+        entries += [("eks_name", eks.get("name")), ("eks_arn", eks.get("arn")),
+                    ("eks_endpoint", eks.get("endpoint")), ("vpc_id", eks.get("vpc_id"))]
+        entries += [("subnet_id", subnet) for subnet in eks.get("subnet_ids") or []]
+        entries += [("nat_gateway_ip", ip) for ip in eks.get("nat_gateway_ips") or []]
+
+    rds = resources.get("rds")
+    if rds and not rds.get("error"):
+        entries += [("rds_identifier", rds.get("identifier")), ("rds_endpoint", rds.get("endpoint"))]
+
+    es = resources.get("elasticsearch")
+    if es and not es.get("error"):
+        entries += [("es_domain", es.get("domain_name")), ("es_endpoint", es.get("endpoint"))]
+
+    redis = resources.get("redis")
+    if redis and not redis.get("error"):
+        entries += [("redis_host", redis.get("host")), ("redis_resource_id", redis.get("resource_id"))]
+
+    for lb in resources.get("load_balancers") or []:
+        entries += [("load_balancer_arn", lb.get("arn")), ("load_balancer_dns", lb.get("dns_name"))]
+        entries += [("target_group_arn", tg.get("arn")) for tg in lb.get("target_groups", [])]
+
+    entries += [("public_ip", ip.get("public_ip")) for ip in resources.get("public_ips") or []]
+    return entries
+
+def catalogue_entries(env: models.Environment, infrastructure: Optional[models.Infrastructure] = None,
+                      cluster: Optional[models.Cluster] = None,
+                      data_store: Optional[models.DataStore] = None) -> List[Tuple[str, str]]:
+    """(kind, value) pairs for an environment as imported from the catalogue"""
+    entries = [("slug", env.slug), ("account_id", env.account_id)]
+    if infrastructure:
+        entries += [("vpc_id", infrastructure.vpc_id), ("vpc_cidr", infrastructure.vpc_cidr),
+                    ("subnet_cidr", infrastructure.subnet_app_1), ("subnet_cidr", infrastructure.subnet_app_2),
+                    ("subnet_cidr", infrastructure.subnet_app_3)]
+    if cluster and cluster.cluster_name != "Unknown":
+        entries.append(("cluster_name", cluster.cluster_name))
+    if data_store:
+        entries += [("rds_endpoint", data_store.rds_endpoint), ("es_endpoint", data_store.es_endpoint),
+                    ("redis_host", data_store.redis_host), ("redis_cluster_id", data_store.redis_cluster_id)]
+    return entries
+
+def reindex(db: Session, env_id: int, source: str, entries: List[Tuple[str, str]]):
+    """Replace the index rows one source contributed for an environment; the caller commits"""
+    db.query(models.ResourceLookup).filter(
+        models.ResourceLookup.env_id == env_id,
+        models.ResourceLookup.source == source
+    ).delete(synchronize_session=False)
+
+    rows = []
+    seen = set()
+    for kind, value in entries:
+        value = normalize(value)
+        if not value or (kind, value) in seen:
+            continue
+        seen.add((kind, value))
+        ip_start, ip_end = _ip_range(value)
+        rows.append({"env_id": env_id, "source": source, "kind": kind, "value": value,
+                     "ip_start": ip_start, "ip_end": ip_end})
+    if rows:
+        db.execute(models.ResourceLookup.__table__.insert(), rows)
+
+def lookup(db: Session, query: str, mode: str = "auto", limit: int = 50) -> List[Dict]:
+    """Find index rows for a value.
+
+    mode "exact" matches the whole value, "prefix" matches values starting with
+    the query, "cidr" matches IPs and CIDRs overlapping an address or network.
+    "auto" uses cidr for anything that parses as IPv4 and exact + prefix otherwise.
+    """
+    value = normalize(query)
+    if not value:
+        return []
+
+    ip_start, ip_end = _ip_range(value)
+    if mode == "auto":
+        mode = "cidr" if ip_start is not None else "prefix"
+
+    q = db.query(models.ResourceLookup, models.Environment).join(
+        models.Environment, models.Environment.id == models.ResourceLookup.env_id
+    )
+    if mode == "cidr":
+        if ip_start is None:
+            return []
+        q = q.filter(
+            models.ResourceLookup.ip_start <= ip_end, models.ResourceLookup.ip_end >= ip_start
+        ).order_by(models.ResourceLookup.ip_end - models.ResourceLookup.ip_start)
+    elif mode == "exact":
+        q = q.filter(models.ResourceLookup.value == value)
+    else:
+        escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        q = q.filter(or_(models.ResourceLookup.value == value,
+                         models.ResourceLookup.value.like(f"{escaped}%", escape="\\"))
+        ).order_by(func.length(models.ResourceLookup.value))
+
+    results = []
+    for entry, env in q.limit(limit).all():
+        results.append({
+            "value": entry.value,
+            "kind": entry.kind,
+            "source": entry.source,
+            "exact": entry.value == value,
+            "env_id": env.id,
+            "slug": env.slug,
+            "customer_name": env.customer_name,
+            "environment": env.environment,
+            "type": env.type,
+            "cloud_platform": env.cloud_platform,
+            "account_id": env.account_id,
+            "region": env.region
+        })
+    return results
@@ -0,0 +1,234 @@
+import math
+import os
+import logging
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+# resolution -> (seconds per slot, slots per block); block spans stay epoch aligned
+# so every 5m block covers whole hours and every 1h block covers whole days
+RESOLUTIONS = {
+    "5m": (300, 288),      # 1 day per block
+    "1h": (3600, 720),     # 30 days per block
+    "1d": (86400, 365),    # 365 days per block
+}
+
+RETENTION = {
+    "5m": timedelta(days=int(os.getenv("METRIC_HISTORY_5M_RETENTION_DAYS", "14"))),
+    "1h": timedelta(days=int(os.getenv("METRIC_HISTORY_1H_RETENTION_DAYS", "180"))),
+    "1d": timedelta(days=int(os.getenv("METRIC_HISTORY_1D_RETENTION_DAYS", "1825"))),
+}
+
+def to_utc_naive(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def _block_start(ts: datetime, resolution: str) -> datetime:
+    step, slots = RESOLUTIONS[resolution]
+    span = step * slots
+    seconds = int((ts - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % span)
+
+def _slot(ts: datetime, block_start: datetime, resolution: str) -> int:
+    step, _ = RESOLUTIONS[resolution]
+    return int((ts - block_start).total_seconds()) // step
+
+def _empty_block(resolution: str) -> array:
+    _, slots = RESOLUTIONS[resolution]
+    return array('f', [math.nan]) * slots
+
+def _decode(values: bytes) -> array:
+    block = array('f')
+    block.frombytes(values)
+    return block
+
+def _mean(values: Iterable[float]) -> Optional[float]:
+    present = [v for v in values if not math.isnan(v)]
+    return sum(present) / len(present) if present else None
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+class _BlockWriter:
+    """Loads each touched block once, locked for the rest of the transaction, and writes it back on flush.
+
+    Two refreshes of the same resource may touch the same blocks, so a block row is
+    created with an empty block if missing and then read with SELECT ... FOR UPDATE;
+    the second writer waits for the first to commit instead of losing its update or
+    failing on the unique constraint. On SQLite the creating insert takes the
+    database write lock, which serializes the writers the same way.
+    """
+
+    def __init__(self, db: Session, resource_type: str, resource_name: str, metric: str):
+        self.db = db
+        self.key = (resource_type, resource_name, metric)
+        self.blocks: Dict[Tuple[str, datetime], Tuple[models.MetricBlock, array]] = {}
+
+    def _ensure_row(self, resolution: str, block_start: datetime):
+        resource_type, resource_name, metric = self.key
+        row = dict(resource_type=resource_type, resource_name=resource_name, metric=metric,
+                   resolution_seconds=RESOLUTIONS[resolution][0], block_start=block_start,
+                   values=_empty_block(resolution).tobytes())
+        upsert = _UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+        if upsert:
+            self.db.execute(upsert(models.MetricBlock.__table__).values(**row).on_conflict_do_nothing())
+            return
+        try:
+            with self.db.begin_nested():
+                self.db.add(models.MetricBlock(**row))
+        except IntegrityError:
+            # Another refresh created the block first
+            pass
+
+    def load(self, keys: Iterable[Tuple[str, datetime]]):
+        """Create and lock the given (resolution, block_start) blocks, in one order for every writer"""
+        resource_type, resource_name, metric = self.key
+        order = list(RESOLUTIONS)
+        for resolution, block_start in sorted(set(keys), key=lambda k: (order.index(k[0]), k[1])):
+            if (resolution, block_start) in self.blocks:
+                continue
+            self._ensure_row(resolution, block_start)
+            row = self.db.query(models.MetricBlock).filter(
+                models.MetricBlock.resource_type == resource_type,
+                models.MetricBlock.resource_name == resource_name,
+                models.MetricBlock.metric == metric,
+                models.MetricBlock.resolution_seconds == RESOLUTIONS[resolution][0],
+                models.MetricBlock.block_start == block_start
+            ).with_for_update().populate_existing().one()
+            self.blocks[(resolution, block_start)] = (row, _decode(row.values))
+
+    def get(self, resolution: str, block_start: datetime) -> array:
+        if (resolution, block_start) not in self.blocks:
+            self.load([(resolution, block_start)])
+        return self.blocks[(resolution, block_start)][1]
+
+    def set(self, resolution: str, ts: datetime, value: Optional[float]):
+        block_start = _block_start(ts, resolution)
+        block = self.get(resolution, block_start)
+        block[_slot(ts, block_start, resolution)] = math.nan if value is None else value
+
+    def flush(self):
+        # Flushed now: a later writer in this transaction reloads blocks with populate_existing
+        for row, block in self.blocks.values():
+            row.values = block.tobytes()
+        self.db.flush()
+
+def record_samples(db: Session, resource_type: str, resource_name: str, metric: str,
+                   samples: List[Tuple[datetime, float]]):
+    """Write 5m samples and incrementally recompute the 1h and 1d rollups they touch.
+
+    The caller commits, which releases the block locks.
+    """
+    if not samples:
+        return
+
+    samples = [(to_utc_naive(ts), value) for ts, value in samples]
+    hours = {ts.replace(minute=0, second=0, microsecond=0) for ts, _ in samples}
+    days = {hour.replace(hour=0) for hour in hours}
+
+    writer = _BlockWriter(db, resource_type, resource_name, metric)
+    writer.load(
+        [("5m", _block_start(ts, "5m")) for ts, _ in samples]
+        + [("1h", _block_start(hour, "1h")) for hour in hours]
+        + [("1d", _block_start(day, "1d")) for day in days]
+    )
+    for ts, value in samples:
+        writer.set("5m", ts, value)
+
+    for hour in hours:
+        block_start = _block_start(hour, "5m")
+        block = writer.get("5m", block_start)
+        first = _slot(hour, block_start, "5m")
+        writer.set("1h", hour, _mean(block[first:first + 12]))
+
+    for day in days:
+        block_start = _block_start(day, "1h")
+        block = writer.get("1h", block_start)
+        first = _slot(day, block_start, "1h")
+        writer.set("1d", day, _mean(block[first:first + 24]))
+
+    writer.flush()
+
+def record_series(db: Session, resource_type: str, resource_name: str,
+                  series: Dict[str, List[Tuple[datetime, float]]]):
+    for metric, samples in series.items():
+        record_samples(db, resource_type, resource_name, metric, samples)
+
+def pick_resolution(start: datetime, end: datetime) -> str:
+    span = end - start
+    if span <= timedelta(days=2):
+        return "5m"
+    if span <= timedelta(days=62):
+        return "1h"
+    return "1d"
+
+def query_history(db: Session, resource_type: str, resource_names: List[str], metric: str,
+                  start: datetime, end: datetime, resolution: str) -> Dict[str, List[Tuple[datetime, float]]]:
+    """Return {resource_name: [(timestamp, value), ...]} for [start, end) at one resolution"""
+    start, end = to_utc_naive(start), to_utc_naive(end)
+    step, _ = RESOLUTIONS[resolution]
+    history = {name: [] for name in resource_names}
+    if not resource_names:
+        return history
+
+    rows = db.query(
+        models.MetricBlock.resource_name, models.MetricBlock.block_start, models.MetricBlock.values
+    ).filter(
+        models.MetricBlock.resource_type == resource_type,
+        models.MetricBlock.resource_name.in_(resource_names),
+        models.MetricBlock.metric == metric,
+        models.MetricBlock.resolution_seconds == step,
+        models.MetricBlock.block_start >= _block_start(start, resolution),
+        models.MetricBlock.block_start < end
+    ).order_by(
+        models.MetricBlock.resource_name, models.MetricBlock.block_start
+    ).yield_per(200)
+
+    for resource_name, block_start, values in rows:
+        points = history[resource_name]
+        first = max(_slot(start, block_start, resolution), 0)
+        block = _decode(values)
+        for index in range(first, len(block)):
+            ts = block_start + timedelta(seconds=index * step)
+            if ts >= end:
+                break
+            value = block[index]
+            if not math.isnan(value):
+                points.append((ts, value))
+
+    return history
+
+def evict_expired(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete blocks that lie entirely outside their resolution's retention window"""
+    now = to_utc_naive(now or datetime.utcnow())
+    deleted = 0
+    for resolution, (step, slots) in RESOLUTIONS.items():
+        cutoff = now - RETENTION[resolution] - timedelta(seconds=step * slots)
+        deleted += db.query(models.MetricBlock).filter(
+            models.MetricBlock.resolution_seconds == step,
+            models.MetricBlock.block_start < cutoff
+        ).delete(synchronize_session=False)
+    if deleted:
+        logger.info(f"Evicted {deleted} expired metric blocks")
+    return deleted
+
+EVICTION_INTERVAL = timedelta(hours=1)
+_last_eviction: Optional[datetime] = None
+
+def evict_expired_if_due(db: Session) -> int:
+    """Run evict_expired at most once per EVICTION_INTERVAL in this process"""
+    global _last_eviction
+    now = datetime.utcnow()
+    if _last_eviction and now - _last_eviction < EVICTION_INTERVAL:
+        return 0
+    _last_eviction = now
+    return evict_expired(db, now)
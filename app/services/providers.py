@@ -0,0 +1,66 @@
+import os
+import logging
+from typing import Optional
+from sqlalchemy.orm import object_session
+from app import models
+from app.services.scan_engine import ScanEngine
+
+logger = logging.getLogger(__name__)
+
+class ProviderNotConfigured(Exception):
+    """Credentials or registration needed to scan an environment's cloud are missing"""
+
+class UnsupportedPlatform(Exception):
+    """The environment's cloud_platform has no scanner"""
+
+def _aws_provider(env: models.Environment, region: str) -> ScanEngine:
+    aws_key = os.getenv("AWS_ACCESS_KEY_ID")
+    aws_secret = os.getenv("AWS_SECRET_ACCESS_KEY")
+    aws_token = os.getenv("AWS_SESSION_TOKEN")
+    if not all([aws_key, aws_secret, aws_token]):
+        raise ProviderNotConfigured("AWS credentials not configured")
+    # Scanner modules pull in boto3 and requests, so they load on first use rather than at app import
+    from app.services.cloud_services import AWSResourceService
+    return AWSResourceService(aws_key, aws_secret, aws_token, region)
+
+def _azure_subscription(env: models.Environment) -> models.AzureSubscription:
+    """The registered subscription an Azure environment lives in; the catalogue may hold its ID or its name"""
+    db = object_session(env)
+    subscription = db.get(models.AzureSubscription, env.account_id)
+    if subscription is None:
+        subscription = db.query(models.AzureSubscription).filter(
+            models.AzureSubscription.subscription_name == env.account_id
+        ).first()
+    if subscription is None:
+        raise ProviderNotConfigured(f"Azure subscription {env.account_id} is not registered, run populate_azure_subs.py")
+    return subscription
+
+def _azure_provider(env: models.Environment, region: str) -> ScanEngine:
+    tenant_id = os.getenv("AZURE_TENANT_ID")
+    client_id = os.getenv("AZURE_CLIENT_ID")
+    client_secret = os.getenv("AZURE_CLIENT_SECRET")
+    if not all([tenant_id, client_id, client_secret]):
+        raise ProviderNotConfigured("Azure credentials not configured")
+    from app.services.azure_services import AzureResourceService, get_credential
+    subscription = _azure_subscription(env)
+    resource_group = env.infrastructure.resource_group if env.infrastructure else None
+    return AzureResourceService(
+        get_credential(tenant_id, client_id, client_secret), subscription.id, region, resource_group=resource_group
+    )
+
+# cloud_platform -> scanner factory
+PROVIDERS = {
+    "aws": _aws_provider,
+    "azure": _azure_provider,
+}
+
+def platform_of(env: models.Environment) -> str:
+    return (env.cloud_platform or "aws").strip().lower()
+
+def get_provider(env: models.Environment, region: Optional[str] = None) -> ScanEngine:
+    """Scanner for an environment's cloud, in the given region (the catalogue region by default)"""
+    platform = platform_of(env)
+    factory = PROVIDERS.get(platform)
+    if factory is None:
+        raise UnsupportedPlatform(f"Unsupported cloud platform: {platform}")
+    return factory(env, region or env.region)
@@ -0,0 +1,177 @@
+import time
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import as_completed
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from app.services.instrumentation import track_scan
+from app.services.tracing import ContextThreadPoolExecutor, span, traced
+
+# Section the network-scoped sections wait for; Azure scans fill it with the AKS cluster
+CLUSTER_SECTION = "eks"
+
+class SharedListCache:
+    """List results shared by every cluster scanned in the same account/subscription and region.
+
+    Concurrent scans asking for the same key wait for a single provider call.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            value = loader()
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+def section_failed(data) -> bool:
+    """Lookups return {"error": ...} instead of raising, so a failure is never mistaken for an empty section"""
+    return isinstance(data, dict) and "error" in data
+
+def _run_section(section: str, lookup: Callable, *args):
+    with span(f"section {section}"):
+        return lookup(*args)
+
+class ScanEngine(ABC):
+    """Concurrent section scan shared by every cloud provider.
+
+    A provider describes its scan as sections. cluster_lookups() start right
+    away; network_lookups() are scoped to the cluster network and start once
+    the cluster section returns its network id. Every provider fills the same
+    sections, so persistence, caching and formatting do not care which cloud
+    a scan came from.
+    """
+
+    platform: Optional[str] = None
+
+    def __init__(self, region: str):
+        self.region = region
+
+    @abstractmethod
+    def cluster_lookups(self, cluster_name: str, rds_endpoint: Optional[str], es_endpoint: Optional[str],
+                        redis_host: Optional[str]) -> Dict[str, Optional[Callable[[], object]]]:
+        """section -> zero-argument lookup, or None when the section does not apply"""
+
+    def network_lookups(self) -> Dict[str, Callable[[str], object]]:
+        """section -> lookup taking the cluster network id"""
+        return {}
+
+    def network_id(self, cluster: Optional[Dict]) -> Optional[str]:
+        return cluster.get("vpc_id") if cluster and not cluster.get("error") else None
+
+    def before_targeted_scan(self, sections: List[str]):
+        """Hook to drop shared list results a change event may have made stale"""
+
+    @abstractmethod
+    def get_rds_metric_series(self, db_id: str, minutes: int = 10) -> Dict[str, List[Tuple[datetime, float]]]:
+        """cpu_percent, free_storage_gb and connections datapoints of the scanned database"""
+
+    def get_rds_metrics(self, db_id: str, series: Optional[Dict] = None) -> Dict:
+        """Latest database utilization, cheap enough for the fast refresh tier"""
+        series = series if series is not None else self.get_rds_metric_series(db_id)
+        cpu = series["cpu_percent"][-1][1] if series["cpu_percent"] else None
+        free_gb = series["free_storage_gb"][-1][1] if series["free_storage_gb"] else 0
+        connections = series["connections"][-1][1] if series["connections"] else None
+
+        return {
+            "cpu_percent": round(cpu, 2) if cpu else None,
+            "free_storage_gb": round(free_gb, 2),
+            "connections": int(connections) if connections else 0
+        }
+
+    @traced(name="ScanEngine.get_cluster_resources")
+    def get_cluster_resources(self, cluster_name: str, rds_endpoint: Optional[str] = None,
+                              es_endpoint: Optional[str] = None, redis_host: Optional[str] = None) -> Dict:
+        sections = dict(self.iter_cluster_resources(cluster_name, rds_endpoint, es_endpoint, redis_host))
+        return self.assemble_resources(cluster_name, sections)
+
+    def assemble_resources(self, cluster_name: str, sections: Dict) -> Dict:
+        """Combine the sections yielded by iter_cluster_resources into a single scan result"""
+        def listed(section: str) -> List:
+            data = sections.get(section)
+            return [] if not data or section_failed(data) else data
+
+        eks = sections.get(CLUSTER_SECTION)
+        if eks and not eks.get("error"):
+            node_groups = sections.get("node_groups") or {}
+            eks = {
+                **eks,
+                "nat_gateway_ips": listed("nat_gateway_ips"),
+                "node_groups": node_groups.get("node_groups", []),
+                "total_nodes": node_groups.get("total_nodes")
+            }
+        return {
+            "cluster_name": cluster_name,
+            "region": self.region,
+            "timestamp": datetime.utcnow().isoformat(),
+            "eks": eks,
+            "rds": sections.get("rds"),
+            "elasticsearch": sections.get("elasticsearch"),
+            "redis": sections.get("redis"),
+            "load_balancers": listed("load_balancers"),
+            "public_ips": listed("public_ips")
+        }
+
+    def iter_cluster_resources(self, cluster_name: str, rds_endpoint: Optional[str] = None,
+                               es_endpoint: Optional[str] = None, redis_host: Optional[str] = None) -> Iterator[Tuple[str, Optional[Dict]]]:
+        """Yield (section, data) pairs as each part of the scan completes"""
+        lookups = self.cluster_lookups(cluster_name, rds_endpoint, es_endpoint, redis_host)
+        network_lookups = self.network_lookups()
+        with track_scan(self.platform, "full"), ContextThreadPoolExecutor(max_workers=len(lookups) + len(network_lookups)) as pool:
+            futures = {}
+            for section, lookup in lookups.items():
+                if lookup is None:
+                    yield section, None
+                else:
+                    futures[pool.submit(_run_section, section, lookup)] = section
+
+            pending = set(futures)
+            while pending:
+                for future in as_completed(pending):
+                    pending.discard(future)
+                    section = futures[future]
+                    data = future.result()
+                    yield section, data
+
+                    if section == CLUSTER_SECTION and network_lookups:
+                        network_id = self.network_id(data)
+                        if network_id:
+                            for network_section, lookup in network_lookups.items():
+                                network_future = pool.submit(_run_section, network_section, lookup, network_id)
+                                futures[network_future] = network_section
+                                pending.add(network_future)
+                            break
+                        for network_section in network_lookups:
+                            yield network_section, []
+
+    @traced(name="ScanEngine.scan_sections")
+    def scan_sections(self, cluster_name: str, sections: List[str], rds_endpoint: Optional[str] = None,
+                      es_endpoint: Optional[str] = None, vpc_id: Optional[str] = None,
+                      redis_host: Optional[str] = None) -> Dict:
+        """Scan only the named sections concurrently, for targeted refreshes.
+
+        Network-scoped sections use the given vpc_id (normally the stored one).
+        """
+        lookups = self.cluster_lookups(cluster_name, rds_endpoint, es_endpoint, redis_host)
+        for section, lookup in self.network_lookups().items():
+            lookups[section] = (lambda lookup=lookup: lookup(vpc_id)) if vpc_id else None
+        wanted = [section for section in sections if section in lookups]
+        if not wanted:
+            return {}
+        self.before_targeted_scan(wanted)
+        with track_scan(self.platform, "targeted"), ContextThreadPoolExecutor(max_workers=len(wanted)) as pool:
+            futures = {section: pool.submit(_run_section, section, lookups[section]) for section in wanted if lookups[section]}
+            return {section: futures[section].result() if section in futures else None for section in wanted}
@@ -0,0 +1,344 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import inspect
+import logging
+import threading
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# A request is traced when it sends TRACE_HEADER: 1 or falls in the sample
+TRACE_HEADER = os.getenv("TRACE_HEADER", "x-trace").lower().encode()
+PROFILE_HEADER = b"x-trace-profile"
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# Traced requests slower than this are logged; forced ones always are
+SLOW_THRESHOLD_MS = float(os.getenv("TRACE_SLOW_THRESHOLD_MS", "2000"))
+# Profiling writes files, so clients may only ask for it when it is switched on
+PROFILE_ENABLED = os.getenv("TRACE_PROFILE_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("TRACE_PROFILE_DIR", "/tmp/request-profiles")
+PROFILE_INTERVAL_SECONDS = float(os.getenv("TRACE_PROFILE_INTERVAL_MS", "5")) / 1000
+MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "5000"))
+SQL_PREVIEW_CHARS = 300
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children", "thread", "thread_id", "trace")
+
+    def __init__(self, name: str, attrs: Dict, trace: Optional["Trace"] = None):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        self.thread = threading.current_thread().name
+        self.thread_id = threading.get_ident()
+        self.trace = trace
+
+    def finish(self, **attrs):
+        if self.end is None and self.trace is not None:
+            self.trace.closed(self)
+        self.end = time.perf_counter()
+        self.attrs.update(attrs)
+
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def to_dict(self, origin: float) -> Dict:
+        span = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms(), 3),
+            "thread": self.thread
+        }
+        if self.attrs:
+            span["attrs"] = self.attrs
+        if self.children:
+            span["children"] = [child.to_dict(origin) for child in self.children]
+        return span
+
+class Trace:
+    def __init__(self, name: str, forced: bool, profile: bool):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.root = Span(name, {})
+        self.forced = forced
+        self.span_count = 1
+        self.dropped_spans = 0
+        # Open child spans per thread: a thread is working for this request, and
+        # gets profiled, only while it has one. The root span is left out because
+        # it spans the whole request on the event loop thread, which every other
+        # request shares.
+        self.open_spans: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.profiler = _SampledProfiler(self) if profile else None
+
+    def child(self, parent: Span, name: str, attrs: Dict) -> Optional[Span]:
+        with self._lock:
+            if self.span_count >= MAX_SPANS:
+                self.dropped_spans += 1
+                return None
+            self.span_count += 1
+            span = Span(name, attrs, self)
+            self.open_spans[span.thread_id] = self.open_spans.get(span.thread_id, 0) + 1
+        parent.children.append(span)
+        return span
+
+    def closed(self, span: Span):
+        with self._lock:
+            left = self.open_spans.get(span.thread_id, 0) - 1
+            if left > 0:
+                self.open_spans[span.thread_id] = left
+            else:
+                self.open_spans.pop(span.thread_id, None)
+
+    def busy_threads(self) -> List[int]:
+        with self._lock:
+            return list(self.open_spans)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Count and total time per span name, to see at a glance where the time went"""
+        totals = {}
+        stack = list(self.root.children)
+        while stack:
+            span = stack.pop()
+            entry = totals.setdefault(span.name, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + span.duration_ms(), 3)
+            stack.extend(span.children)
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["total_ms"]))
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+def active() -> bool:
+    return _trace.get() is not None
+
+def start_span(name: str, **attrs) -> Optional[Span]:
+    """Child of the current span that does not become current; the caller finishes it"""
+    trace = _trace.get()
+    if trace is None:
+        return None
+    return trace.child(_span.get() or trace.root, name, attrs)
+
+@contextmanager
+def span(name: str, **attrs):
+    trace = _trace.get()
+    child = trace.child(_span.get() or trace.root, name, attrs) if trace else None
+    if child is None:
+        yield None
+        return
+    token = _span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        child.finish()
+        _span.reset(token)
+
+def traced(fn=None, *, name: Optional[str] = None):
+    """Record a span for every call of a function while its request is traced"""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if _trace.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate(fn) if fn else decorate
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """Runs every task in a copy of the submitter's context, so spans and request stats follow the work"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+class _SampledProfiler:
+    """Samples the stacks of the threads a trace runs on and writes them in collapsed (flamegraph) format.
+
+    A thread is only sampled while it has an open span of the trace, so a pool
+    thread that moves on to another request drops out of the profile. The
+    event loop thread is the exception that remains: while one of this
+    request's async spans is open there, the loop may be running another
+    request's coroutine at the moment of the sample.
+    """
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self.counts: Dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{trace.trace_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(PROFILE_INTERVAL_SECONDS):
+            frames = sys._current_frames()
+            for ident in self.trace.busy_threads():
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def stop_and_dump(self) -> Optional[str]:
+        self._stop.set()
+        self._thread.join()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{self.trace.trace_id}.folded")
+            with open(path, "w") as f:
+                for stack, count in sorted(self.counts.items(), key=lambda item: -item[1]):
+                    f.write(f"{stack} {count}\n")
+            return path
+        except OSError as e:
+            logger.warning(f"Could not write profile for trace {self.trace.trace_id}: {str(e)}")
+            return None
+
+def _header(scope: dict, name: bytes) -> bool:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.lower() in (b"1", b"true", b"yes")
+    return False
+
+class TracingMiddleware:
+    """Pure ASGI middleware that opens a trace for forced and sampled requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        forced = _header(scope, TRACE_HEADER)
+        if not forced and not (SAMPLE_RATE and random.random() < SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}", forced, PROFILE_ENABLED and _header(scope, PROFILE_HEADER))
+        status = 500
+
+        async def send_with_trace_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace.trace_id.encode())]
+            await send(message)
+
+        trace_token = _trace.set(trace)
+        span_token = _span.set(trace.root)
+        if trace.profiler:
+            trace.profiler.start()
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            _span.reset(span_token)
+            _trace.reset(trace_token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                trace.root.name = f"{scope['method']} {route}"
+            trace.root.finish(status=status, path=scope["path"])
+            # Joining the profiler and writing its file would stall the event loop
+            profile_path = await run_in_threadpool(trace.profiler.stop_and_dump) if trace.profiler else None
+            _report(trace, profile_path)
+
+def _report(trace: Trace, profile_path: Optional[str]):
+    duration_ms = trace.root.duration_ms()
+    if not trace.forced and duration_ms < SLOW_THRESHOLD_MS and not profile_path:
+        return
+    logger.warning(json.dumps({
+        "event": "request_trace",
+        "trace_id": trace.trace_id,
+        "request": trace.root.name,
+        "status": trace.root.attrs.get("status"),
+        "duration_ms": round(duration_ms, 3),
+        "forced": trace.forced,
+        "slow": duration_ms >= SLOW_THRESHOLD_MS,
+        "span_count": trace.span_count,
+        "dropped_spans": trace.dropped_spans,
+        "profile": profile_path,
+        "summary": trace.summary(),
+        "spans": trace.root.to_dict(trace.root.start)
+    }, default=str))
+
+def instrument_engine(engine):
+    """One span per SQL statement, under whatever span issued it (lazy loads included)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _trace.get() is not None:
+            conn.info.setdefault("trace_spans", []).append(start_span("sql", statement=statement[:SQL_PREVIEW_CHARS]))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _finish_sql_span(conn, rows=cursor.rowcount)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        if exception_context.connection is not None:
+            _finish_sql_span(exception_context.connection, error=type(exception_context.original_exception).__name__)
+
+def _finish_sql_span(conn, **attrs):
+    if _trace.get() is None:
+        return
+    spans = conn.info.get("trace_spans")
+    if spans:
+        sql_span = spans.pop()
+        if sql_span is not None:
+            sql_span.finish(**attrs)
+
+def trace_boto_client(client, region: str):
+    """One span per boto3 API call, retries and backoff included"""
+    service = client.meta.service_model.service_name
+    events = client.meta.events
+
+    def before_call(model, context, **kwargs):
+        if _trace.get() is not None:
+            context["trace_span"] = start_span(f"aws {service}.{model.name}", region=region)
+
+    def after_call(http_response, context, **kwargs):
+        call_span = context.pop("trace_span", None)
+        if call_span is not None:
+            call_span.finish(status=http_response.status_code, retries=context.get("retries", {}).get("attempt", 1) - 1)
+
+    def after_call_error(exception, context, **kwargs):
+        call_span = context.pop("trace_span", None)
+        if call_span is not None:
+            call_span.finish(error=type(exception).__name__)
+
+    events.register("before-call", before_call)
+    events.register("after-call", after_call)
+    events.register("after-call-error", after_call_error)
+    return client
@@ -0,0 +1,73 @@
+"""Startup work that would otherwise land on the first requests of a new worker.
+
+Run from the app's lifespan handler, concurrently and within
+STARTUP_WARMUP_TIMEOUT_SECONDS: a step that overruns keeps going in the
+background and the worker starts serving anyway. A failed step only logs, since
+everything warmed here is also loaded on demand.
+"""
+import os
+import time
+import asyncio
+import logging
+from sqlalchemy.orm import configure_mappers
+from app.database import engine
+from app.migrations import missing_tables
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("STARTUP_WARMUP_TIMEOUT_SECONDS", "15"))
+WARMUP_AWS_REGION = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
+
+def warm_db_pool():
+    """Opens the pool's connections up front, checks the schema with one catalogue query and
+    configures the ORM mappers, which SQLAlchemy otherwise does on the first query"""
+    configure_mappers()
+    missing = missing_tables(engine)
+    if missing:
+        logger.warning(f"Database is missing tables {', '.join(missing)}, run app/scripts/init_db.py")
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = []
+    try:
+        for _ in range(size):
+            conn = engine.connect()
+            connections.append(conn)
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in connections:
+            conn.close()
+
+def warm_auth():
+    """Imports python-jose's crypto backends and fetches the Google JWKS"""
+    from jose import jwt  # noqa: F401
+    from app.dependencies import get_google_certs
+    get_google_certs()
+
+def warm_aws():
+    """Imports boto3 and loads the scan services' models into the shared session"""
+    from app.services.cloud_services import warm_clients
+    warm_clients(WARMUP_AWS_REGION)
+
+STEPS = {
+    "db_pool": warm_db_pool,
+    "auth": warm_auth,
+    "aws": warm_aws,
+}
+
+def _timed(name: str, step):
+    started = time.perf_counter()
+    try:
+        step()
+        logger.info(f"Warmed {name} in {(time.perf_counter() - started) * 1000:.1f}ms")
+    except Exception as e:
+        logger.warning(f"Warming {name} failed after {(time.perf_counter() - started) * 1000:.1f}ms: {str(e)}")
+
+async def warm_up():
+    if not WARMUP_ENABLED:
+        return
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(asyncio.to_thread(_timed, name, step)) for name, step in STEPS.items()]
+    _, pending = await asyncio.wait(tasks, timeout=WARMUP_TIMEOUT_SECONDS)
+    if pending:
+        logger.warning(f"Startup warmup still running after {WARMUP_TIMEOUT_SECONDS}s, serving anyway")
+    logger.info(f"Startup warmup took {(time.perf_counter() - started) * 1000:.1f}ms")
@@ -1,70 +1,33 @@
+import json
+from app import models
+from app.services.tracing import traced
+
+@traced
 def _format_fetch_aws_resources_response(cluster_name: str, account_id: str, region: str, aws_resource: models.AWSResource) -> dict:
     """Format database records into API response"""
     resources = {
         "cluster_name": cluster_name,
         "region": region,
         "timestamp": aws_resource.last_synced.isoformat(),
+        "topology_last_synced": aws_resource.topology_last_synced.isoformat() if aws_resource.topology_last_synced else None,
+        "metrics_last_synced": aws_resource.metrics_last_synced.isoformat() if aws_resource.metrics_last_synced else None,
         "eks": None,
         "rds": None,
-        "elasticsearch": None
+        "elasticsearch": None,
+        "redis": None,
+        "load_balancers": [_format_load_balancer(lb) for lb in aws_resource.load_balancers],
+        "public_ips": [_format_public_ip(ip) for ip in aws_resource.public_ips]
     }
     
     if aws_resource.eks:
-        eks = aws_resource.eks
-        resources["eks"] = {
-            "name": eks.name,
-            "status": eks.status,
-            "kubernetes_version": eks.kubernetes_version,
-            "endpoint": eks.endpoint,
-            "arn": eks.arn,
-            "vpc_id": eks.vpc_id,
-            "subnet_ids": eks.subnet_ids,
-            "nat_gateway_ips": eks.nat_gateway_ips,
-            "total_nodes": eks.total_nodes,
-            "node_groups": [
-                {
-                    "name": ng.name,
-                    "instance_types": ng.instance_types,
-                    "desired_size": ng.desired_size,
-                    "min_size": ng.min_size,
-                    "max_size": ng.max_size,
-                    "status": ng.status
-                }
-                for ng in eks.node_groups
-            ]
-        }
-    
+        resources["eks"] = _format_eks(aws_resource.eks)
     if aws_resource.rds:
-        rds = aws_resource.rds
-        resources["rds"] = {
-            "identifier": rds.identifier,
-            "endpoint": rds.endpoint,
-            "status": rds.status,
-            "engine": rds.engine,
-            "engine_version": rds.engine_version,
-            "instance_class": rds.instance_class,
-            "allocated_storage_gb": rds.allocated_storage_gb,
-            "multi_az": rds.multi_az,
-            "storage_encrypted": rds.storage_encrypted,
-            "performance": {
-                "cpu_percent": rds.cpu_percent,
-                "free_storage_gb": rds.free_storage_gb,
-                "connections": rds.connections
-            }
-        }
-    
+        resources["rds"] = _format_rds(aws_resource.rds)
     if aws_resource.elasticsearch:
-        es = aws_resource.elasticsearch
-        resources["elasticsearch"] = {
-            "domain_name": es.domain_name,
-            "status": es.status,
-            "version": es.version,
-            "endpoint": es.endpoint,
-            "instance_type": es.instance_type,
-            "instance_count": es.instance_count,
-            "volume_size_gb": es.volume_size_gb
-        }
-    
+        resources["elasticsearch"] = _format_elasticsearch(aws_resource.elasticsearch)
+    if aws_resource.redis:
+        resources["redis"] = _format_redis(aws_resource.redis)
+
     return {
         "success": True,
         "cluster_name": cluster_name,
@@ -72,3 +35,153 @@ def _format_fetch_aws_resources_response(cluster_name: str, account_id: str, reg
         "region": region,
         "resources": resources
     }
+
+
+def _format_eks(eks: models.EKSCluster) -> dict:
+    return {
+        "name": eks.name,
+        "status": eks.status,
+        "kubernetes_version": eks.kubernetes_version,
+        "endpoint": eks.endpoint,
+        "arn": eks.arn,
+        "vpc_id": eks.vpc_id,
+        "subnet_ids": eks.subnet_ids,
+        "nat_gateway_ips": eks.nat_gateway_ips,
+        "total_nodes": eks.total_nodes,
+        "node_groups": [_format_node_group(ng) for ng in eks.node_groups]
+    }
+
+def _format_node_group(ng: models.EKSNodeGroup) -> dict:
+    return {
+        "name": ng.name,
+        "instance_types": ng.instance_types,
+        "desired_size": ng.desired_size,
+        "min_size": ng.min_size,
+        "max_size": ng.max_size,
+        "status": ng.status
+    }
+
+def _format_rds(rds: models.RDSInstance) -> dict:
+    return {
+        "identifier": rds.identifier,
+        "endpoint": rds.endpoint,
+        "status": rds.status,
+        "engine": rds.engine,
+        "engine_version": rds.engine_version,
+        "instance_class": rds.instance_class,
+        "allocated_storage_gb": rds.allocated_storage_gb,
+        "multi_az": rds.multi_az,
+        "storage_encrypted": rds.storage_encrypted,
+        "performance": {
+            "cpu_percent": rds.cpu_percent,
+            "free_storage_gb": rds.free_storage_gb,
+            "connections": rds.connections
+        }
+    }
+
+def _format_elasticsearch(es: models.ElasticSearch) -> dict:
+    return {
+        "domain_name": es.domain_name,
+        "status": es.status,
+        "version": es.version,
+        "endpoint": es.endpoint,
+        "instance_type": es.instance_type,
+        "instance_count": es.instance_count,
+        "volume_size_gb": es.volume_size_gb
+    }
+
+def _format_redis(redis: models.RedisCache) -> dict:
+    return {
+        "name": redis.name,
+        "resource_id": redis.resource_id,
+        "host": redis.host,
+        "port": redis.port,
+        "status": redis.status,
+        "engine_version": redis.engine_version,
+        "node_type": redis.node_type,
+        "shard_count": redis.shard_count
+    }
+
+def _format_load_balancer(lb: models.LoadBalancer) -> dict:
+    return {
+        "name": lb.name,
+        "arn": lb.arn,
+        "dns_name": lb.dns_name,
+        "type": lb.type,
+        "scheme": lb.scheme,
+        "state": lb.state,
+        "vpc_id": lb.vpc_id,
+        "availability_zones": lb.availability_zones,
+        "security_groups": lb.security_groups,
+        "ip_address_type": lb.ip_address_type,
+        "hosted_zone_id": lb.hosted_zone_id,
+        "created_time": lb.created_time.isoformat() if lb.created_time else None,
+        "attributes": lb.attributes,
+        "tags": lb.tags,
+        "target_groups": [
+            {
+                "name": tg.name,
+                "arn": tg.arn,
+                "protocol": tg.protocol,
+                "port": tg.port,
+                "target_type": tg.target_type,
+                "health_check": tg.health_check,
+                "healthy_count": tg.healthy_count,
+                "unhealthy_count": tg.unhealthy_count,
+                "targets": tg.targets
+            }
+            for tg in lb.target_groups
+        ],
+        "listeners": [
+            {
+                "arn": listener.arn,
+                "protocol": listener.protocol,
+                "port": listener.port,
+                "ssl_policy": listener.ssl_policy,
+                "certificates": listener.certificates,
+                "default_actions": listener.default_actions
+            }
+            for listener in lb.listeners
+        ]
+    }
+
+def _format_public_ip(ip: models.PublicIP) -> dict:
+    return {
+        "public_ip": ip.public_ip,
+        "private_ip": ip.private_ip,
+        "allocation_id": ip.allocation_id,
+        "association_id": ip.association_id,
+        "domain": ip.domain,
+        "instance_id": ip.instance_id,
+        "network_interface_id": ip.network_interface_id,
+        "source_type": ip.source_type,
+        "source_id": ip.source_id,
+        "source_name": ip.source_name,
+        "tags": ip.tags
+    }
+
+def _format_sse_event(event: str, data) -> str:
+    """Encode a single Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _split_resource_sections(resources: dict) -> dict:
+    """Split a formatted resources block into the sections streamed by fetchCloudResourcesStream"""
+    eks = resources.get("eks")
+    sections = {
+        "eks": None,
+        "node_groups": None,
+        "rds": resources.get("rds"),
+        "elasticsearch": resources.get("elasticsearch"),
+        "redis": resources.get("redis"),
+        "nat_gateway_ips": [],
+        "load_balancers": resources.get("load_balancers", []),
+        "public_ips": resources.get("public_ips", [])
+    }
+    if not eks:
+        return sections
+
+    eks = dict(eks)
+    sections["node_groups"] = {"node_groups": eks.pop("node_groups", []), "total_nodes": eks.pop("total_nodes", None)}
+    sections["nat_gateway_ips"] = eks.pop("nat_gateway_ips", None) or []
+    sections["eks"] = eks
+    return sections
@@ -0,0 +1,35 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.database builds its engine at import, so this has to be set before anything imports app
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models
+
+@pytest.fixture
+def db():
+    """A session on a fresh in-memory database with every table created"""
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+@pytest.fixture
+def environment(db):
+    def create(slug: str = "acme-prod", **fields):
+        env = models.Environment(slug=slug, customer_name=slug.split("-")[0], environment=slug.split("-")[-1],
+                                 account_id=fields.pop("account_id", "123456789012"),
+                                 region=fields.pop("region", "us-east-1"), **fields)
+        db.add(env)
+        db.flush()
+        return env
+    return create
@@ -0,0 +1,103 @@
+import time
+import threading
+from types import SimpleNamespace
+import pytest
+import requests
+from app.scripts import fake_arm_server
+from app.scripts.fake_arm_server import FakeArmHandler, SAMPLE_SUBSCRIPTION, sample_fixtures
+from app.services import azure_services
+from app.services.azure_services import AzureResourceService, ClientSecretCredential
+from app.services.scan_engine import SharedListCache
+
+CLUSTER_PATH = (f"/subscriptions/{SAMPLE_SUBSCRIPTION}/resourceGroups/rg-sample"
+                "/providers/Microsoft.ContainerService/managedClusters/aks-sample")
+
+@pytest.fixture
+def arm(monkeypatch):
+    """The fake ARM and token endpoint on an ephemeral port, serving the sample subscription"""
+    server = fake_arm_server.serve(0, sample_fixtures())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    # Subscription listings are cached per process; every test starts from an empty cache
+    monkeypatch.setattr(azure_services, "_subscription_cache", SharedListCache(60))
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        FakeArmHandler.throttle_next = 0
+        FakeArmHandler.retry_after = "0"
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Backoff delays _arm_get asked for, without sleeping them"""
+    delays = []
+    monkeypatch.setattr(azure_services, "time", SimpleNamespace(
+        sleep=delays.append, perf_counter=time.perf_counter, monotonic=time.monotonic
+    ))
+    return delays
+
+def scanner(endpoint: str, resource_group: str = "rg-sample") -> AzureResourceService:
+    credential = ClientSecretCredential("tenant", "client", "secret", authority_host=endpoint, arm_endpoint=endpoint)
+    return AzureResourceService(credential, SAMPLE_SUBSCRIPTION, "eastus", resource_group=resource_group,
+                                arm_endpoint=endpoint)
+
+def test_scan_fills_the_aws_sections(arm):
+    resources = scanner(arm).get_cluster_resources(
+        "aks-sample", rds_endpoint="pg-sample.postgres.database.azure.com",
+        redis_host="redis-sample.redis.cache.windows.net"
+    )
+
+    eks = resources["eks"]
+    assert eks["name"] == "aks-sample"
+    assert eks["status"] == "Running"
+    assert eks["kubernetes_version"] == "1.29.4"
+    assert eks["vpc_id"].endswith("/virtualNetworks/vnet-sample")
+    assert eks["total_nodes"] == 7
+    pools = {pool["name"]: pool for pool in eks["node_groups"]}
+    assert (pools["system"]["min_size"], pools["system"]["max_size"]) == (3, 3)
+    assert (pools["user"]["min_size"], pools["user"]["max_size"]) == (2, 10)
+
+    rds = resources["rds"]
+    assert (rds["identifier"], rds["engine"], rds["multi_az"]) == ("pg-sample", "postgres", True)
+    assert rds["performance"] == {"cpu_percent": 37.5, "free_storage_gb": 160.0, "connections": 42}
+
+    assert resources["redis"]["node_type"] == "Premium P1"
+    assert resources["elasticsearch"] is None
+
+def test_node_pools_follow_next_links(arm, monkeypatch):
+    monkeypatch.setattr(fake_arm_server, "PAGE_SIZE", 1)
+    node_groups = scanner(arm)._get_node_pools("aks-sample")
+    assert sorted(pool["name"] for pool in node_groups["node_groups"]) == ["system", "user"]
+
+def test_stale_resource_group_falls_back_to_the_subscription_listing(arm):
+    eks = scanner(arm, resource_group="rg-moved")._describe_aks_cluster("aks-sample")
+    assert eks["arn"] == CLUSTER_PATH
+
+def test_missing_cluster_is_a_section_error(arm):
+    assert "error" in scanner(arm)._describe_aks_cluster("aks-missing")
+
+def test_throttled_get_waits_for_retry_after(arm, sleeps):
+    FakeArmHandler.throttle_next = 2
+    FakeArmHandler.retry_after = "7"
+
+    cluster = scanner(arm)._arm_get(CLUSTER_PATH, azure_services.AKS_API_VERSION)
+
+    assert cluster["name"] == "aks-sample"
+    assert sleeps == [7.0, 7.0]
+
+def test_throttled_get_gives_up_after_max_retries(arm, sleeps, monkeypatch):
+    monkeypatch.setattr(azure_services, "ARM_MAX_RETRIES", 2)
+    FakeArmHandler.throttle_next = 10
+
+    with pytest.raises(requests.HTTPError) as e:
+        scanner(arm)._arm_get(CLUSTER_PATH, azure_services.AKS_API_VERSION)
+
+    assert e.value.response.status_code == 429
+    assert len(sleeps) == 2
+
+def test_token_is_reused_across_calls(arm):
+    service = scanner(arm)
+    for _ in range(3):
+        service._arm_get(CLUSTER_PATH, azure_services.AKS_API_VERSION)
+    assert service.credential.stats == {"hits": 2, "misses": 1}
@@ -0,0 +1,92 @@
+import pytest
+from app.services import cache
+from app.services.cache import LocalBackend, TwoLevelCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+def test_get_serves_l1_then_backend_after_l1_expiry(clock):
+    inventory = TwoLevelCache(LocalBackend(), l1_ttl_seconds=30, ttl_seconds=300)
+    inventory.set("inventory:eks1", {"eks": {"name": "eks1"}})
+
+    assert inventory.get("inventory:eks1") == {"eks": {"name": "eks1"}}
+    assert inventory.stats == {"l1_hits": 1, "l2_hits": 0, "misses": 0}
+
+    clock.advance(31)
+    assert inventory.get("inventory:eks1") == {"eks": {"name": "eks1"}}
+    assert inventory.stats["l2_hits"] == 1
+
+    # The backend hit refilled L1
+    assert inventory.get("inventory:eks1") == {"eks": {"name": "eks1"}}
+    assert inventory.stats["l1_hits"] == 2
+
+def test_backend_ttl_expires_entries(clock):
+    inventory = TwoLevelCache(LocalBackend(), l1_ttl_seconds=30, ttl_seconds=300)
+    inventory.set("inventory:eks1", {"eks": None})
+
+    clock.advance(301)
+    assert inventory.get("inventory:eks1") is None
+    assert inventory.stats["misses"] == 1
+
+def test_l1_evicts_least_recently_used(clock):
+    backend = LocalBackend()
+    inventory = TwoLevelCache(backend, l1_max_entries=2)
+    for key in ("a", "b", "c"):
+        inventory.set(key, key)
+
+    assert inventory.get("a") == "a"
+    assert inventory.stats == {"l1_hits": 0, "l2_hits": 1, "misses": 0}
+    assert inventory.get("c") == "c"
+    assert inventory.stats["l1_hits"] == 1
+
+def test_invalidation_is_published_to_every_worker(clock):
+    backend = LocalBackend()
+    worker_a = TwoLevelCache(backend)
+    worker_b = TwoLevelCache(backend)
+    worker_a.set("inventory:eks1", {"rds": None})
+    assert worker_b.get("inventory:eks1") == {"rds": None}
+
+    worker_a.invalidate("inventory:eks1")
+
+    # worker_b's L1 copy is dropped by the published message, not by its TTL
+    assert worker_b.get("inventory:eks1") is None
+    assert worker_b.stats["misses"] == 1
+
+def test_claim_is_exclusive_until_it_expires(clock):
+    backend = LocalBackend()
+    assert backend.claim("event-refresh:1:rds", "1", ttl_seconds=60)
+    assert not backend.claim("event-refresh:1:rds", "2", ttl_seconds=60)
+    assert backend.get("event-refresh:1:rds") == "1"
+
+    clock.advance(61)
+    assert backend.claim("event-refresh:1:rds", "3", ttl_seconds=60)
+    assert backend.get("event-refresh:1:rds") == "3"
+
+def test_backend_errors_degrade_to_misses(clock):
+    class BrokenBackend(LocalBackend):
+        def get(self, key):
+            raise ConnectionError("backend down")
+
+        def set(self, key, value, ttl_seconds=None):
+            raise ConnectionError("backend down")
+
+    inventory = TwoLevelCache(BrokenBackend(), l1_ttl_seconds=30)
+    inventory.set("inventory:eks1", {"eks": None})
+    assert inventory.get("inventory:eks1") == {"eks": None}
+
+    clock.advance(31)
+    assert inventory.get("inventory:eks1") is None
+    assert inventory.stats["misses"] == 1
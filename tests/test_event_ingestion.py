@@ -0,0 +1,53 @@
+from app.services import event_ingestion, lookup_index
+
+def test_cloudtrail_record_yields_sections_and_request_identifiers():
+    record = {"eventSource": "rds.amazonaws.com", "eventName": "ModifyDBInstance",
+              "requestParameters": {"dBInstanceIdentifier": "acme-prod-db", "allocatedStorage": 200},
+              "responseElements": {"dBInstanceArn": "arn:aws:rds:us-east-1:123456789012:db:acme-prod-db"}}
+    assert event_ingestion.parse_event(record) == ({"rds"}, {"acme-prod-db"})
+
+def test_eventbridge_event_unwraps_detail_and_resources():
+    event = {"source": "aws.eks", "detail-type": "AWS API Call via CloudTrail",
+             "resources": ["arn:aws:eks:us-east-1:123456789012:cluster/eks-acme"],
+             "detail": {"eventSource": "eks.amazonaws.com", "eventName": "UpdateClusterConfig",
+                        "requestParameters": {"name": "eks-acme"}}}
+    sections, identifiers = event_ingestion.parse_event(event)
+    assert sections == {"eks"}
+    assert identifiers == {"eks-acme", "arn:aws:eks:us-east-1:123456789012:cluster/eks-acme"}
+
+def test_read_only_calls_are_ignored():
+    for name in ("DescribeDBInstances", "ListNodegroups", "GetMetricData"):
+        assert event_ingestion.parse_event({"eventSource": "rds.amazonaws.com", "eventName": name}) == (set(), set())
+
+def test_nodegroup_arn_maps_to_its_cluster():
+    arn = "arn:aws:eks:us-east-1:123456789012:nodegroup/eks-acme/workers/1a2b"
+    event = {"eventSource": "eks.amazonaws.com", "eventName": "UpdateNodegroupConfig",
+             "resources": [{"ARN": arn}]}
+    assert event_ingestion.parse_event(event) == ({"node_groups"}, {arn, "eks-acme"})
+
+def test_db_arn_maps_to_the_instance():
+    arn = "arn:aws:rds:us-east-1:123456789012:db:acme-prod-db"
+    assert event_ingestion._arn_identifiers(arn) == [arn, "acme-prod-db"]
+
+def test_ec2_events_only_count_for_nat_gateways_and_addresses():
+    nat = {"eventSource": "ec2.amazonaws.com", "eventName": "CreateNatGateway",
+           "requestParameters": {"subnetId": "subnet-01"}}
+    assert event_ingestion.parse_event(nat) == ({"nat_gateway_ips", "public_ips"}, {"subnet-01"})
+    assert event_ingestion.parse_event({"eventSource": "ec2.amazonaws.com", "eventName": "AssociateAddress"})[0] == {"public_ips"}
+    assert event_ingestion.parse_event({"eventSource": "ec2.amazonaws.com", "eventName": "RunInstances",
+                                        "requestParameters": {"subnetId": "subnet-01"}}) == (set(), set())
+
+def test_unknown_source_yields_nothing():
+    assert event_ingestion.parse_event({"eventSource": "s3.amazonaws.com", "eventName": "PutObject",
+                                        "requestParameters": {"name": "bucket"}}) == (set(), set())
+    assert event_ingestion.parse_event({}) == (set(), set())
+
+def test_resolve_environments_skips_broad_lookup_kinds(db, environment):
+    acme = environment("acme-prod")
+    lookup_index.reindex(db, acme.id, lookup_index.CATALOGUE,
+                         [("slug", "acme-prod"), ("account_id", "123456789012"), ("cluster_name", "eks-acme")])
+    db.commit()
+
+    assert event_ingestion.resolve_environments(db, ["EKS-ACME"]) == {acme.id}
+    assert event_ingestion.resolve_environments(db, ["123456789012", "acme-prod"]) == set()
+    assert event_ingestion.resolve_environments(db, []) == set()
@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from app import crud
+from app.services.scan_engine import ScanEngine
+from app.utils.format_responses import _format_fetch_aws_resources_response, _split_resource_sections
+
+SECTIONS = {
+    "eks": {"name": "eks-acme", "status": "ACTIVE", "kubernetes_version": "1.29", "endpoint": "https://abc.eks",
+            "arn": "arn:aws:eks:us-east-1:123456789012:cluster/eks-acme", "vpc_id": "vpc-0a1b", "subnet_ids": ["subnet-01"]},
+    "node_groups": {"node_groups": [{"name": "workers", "desired_size": 3, "instance_types": ["m5.large"]}], "total_nodes": 3},
+    "nat_gateway_ips": ["52.1.2.3"],
+    "rds": {"identifier": "acme-db", "engine": "postgres", "performance": {"cpu_percent": 12.5}},
+    "elasticsearch": {"domain_name": "acme-search", "instance_count": 2},
+    "redis": None,
+    "load_balancers": [{"name": "web", "arn": "arn:lb/web", "created_time": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+                        "target_groups": [{"name": "web-tg", "port": 443}], "listeners": [{"port": 443}]}],
+    "public_ips": [{"public_ip": "3.4.5.6", "source_type": "nat_gateway"}],
+}
+
+def test_streamed_sections_match_the_stored_response(db, environment):
+    # assemble_resources only needs the region, so no provider client is built
+    resources = ScanEngine.assemble_resources(SimpleNamespace(region="us-east-1"), "eks-acme", SECTIONS)
+    aws_resource = crud.create_aws_resource(db, environment().id, resources)
+    db.commit()
+    db.refresh(aws_resource)
+
+    stored = _split_resource_sections(
+        _format_fetch_aws_resources_response("eks-acme", "123456789012", "us-east-1", aws_resource)["resources"])
+    assert set(stored) == set(SECTIONS)
+    for section, data in SECTIONS.items():
+        assert crud.format_scan_section(section, data) == stored[section], section
+
+def test_failed_and_empty_sections_pass_through():
+    assert crud.format_scan_section("rds", {"error": "AccessDenied"}) == {"error": "AccessDenied"}
+    assert crud.format_scan_section("redis", None) is None
+    assert crud.format_scan_section("load_balancers", []) == []
@@ -0,0 +1,72 @@
+import pytest
+from app.services import lookup_index
+
+SCAN = {
+    "eks": {"name": "eks-acme", "arn": "arn:aws:eks:us-east-1:123456789012:cluster/eks-acme",
+            "endpoint": "https://ABC123.gr7.us-east-1.eks.amazonaws.com/", "vpc_id": "vpc-0a1b",
+            "subnet_ids": ["subnet-01", "subnet-02"], "nat_gateway_ips": ["52.1.2.3"]},
+    "rds": {"error": "not found"},
+    "load_balancers": [{"arn": "arn:aws:elasticloadbalancing:lb/app/web", "dns_name": "web-1.elb.amazonaws.com",
+                        "target_groups": [{"arn": "arn:aws:elasticloadbalancing:tg/web"}]}],
+    "public_ips": [{"public_ip": "52.1.2.3"}, {"public_ip": "3.4.5.6"}],
+}
+
+@pytest.fixture
+def indexed(db, environment):
+    acme = environment("acme-prod")
+    globex = environment("globex-dev", account_id="210987654321")
+    lookup_index.reindex(db, acme.id, lookup_index.SCAN, lookup_index.scan_entries(SCAN))
+    lookup_index.reindex(db, globex.id, lookup_index.CATALOGUE,
+                         [("vpc_cidr", "10.20.0.0/16"), ("subnet_cidr", "10.20.1.0/24"), ("slug", "globex-dev"),
+                          ("cluster_name", "eks_acme")])
+    db.commit()
+    return acme, globex
+
+def values(results):
+    return [(r["slug"], r["kind"], r["value"]) for r in results]
+
+def test_normalize_strips_scheme_case_and_trailing_slash():
+    assert lookup_index.normalize(" HTTPS://Web-1.elb.amazonaws.com/ ") == "web-1.elb.amazonaws.com"
+    assert lookup_index.normalize("/") is None
+    assert lookup_index.normalize(None) is None
+
+def test_scan_entries_skip_failed_sections_and_dedupe_on_reindex(db, indexed):
+    acme, _ = indexed
+    kinds = {r["kind"] for r in lookup_index.lookup(db, "52.1.2.3", mode="exact")}
+    assert kinds == {"nat_gateway_ip", "public_ip"}
+    assert lookup_index.lookup(db, "not found", mode="exact") == []
+
+    # Reindexing replaces the source's rows instead of adding to them
+    lookup_index.reindex(db, acme.id, lookup_index.SCAN, [("eks_name", "eks-acme")])
+    db.commit()
+    assert values(lookup_index.lookup(db, "eks-acme", mode="exact")) == [("acme-prod", "eks_name", "eks-acme")]
+    assert lookup_index.lookup(db, "52.1.2.3", mode="exact") == []
+
+def test_exact_matches_the_normalized_value(db, indexed):
+    results = lookup_index.lookup(db, "https://abc123.gr7.us-east-1.eks.amazonaws.com", mode="exact")
+    assert values(results) == [("acme-prod", "eks_endpoint", "abc123.gr7.us-east-1.eks.amazonaws.com")]
+    assert results[0]["exact"] and results[0]["source"] == "scan"
+    assert lookup_index.lookup(db, "abc123", mode="exact") == []
+
+def test_prefix_orders_shortest_first(db, indexed):
+    results = lookup_index.lookup(db, "arn:aws:elasticloadbalancing:", mode="prefix")
+    assert [r["kind"] for r in results] == ["target_group_arn", "load_balancer_arn"]
+    assert not any(r["exact"] for r in results)
+
+def test_prefix_escapes_like_wildcards(db, indexed):
+    # "_" is literal, so "eks_" matches the globex catalogue entry and not "eks-acme"
+    assert values(lookup_index.lookup(db, "eks_", mode="prefix")) == [("globex-dev", "cluster_name", "eks_acme")]
+    assert lookup_index.lookup(db, "eks%", mode="prefix") == []
+
+def test_cidr_matches_overlapping_ranges_narrowest_first(db, indexed):
+    results = lookup_index.lookup(db, "10.20.1.7", mode="cidr")
+    assert values(results) == [("globex-dev", "subnet_cidr", "10.20.1.0/24"), ("globex-dev", "vpc_cidr", "10.20.0.0/16")]
+
+    assert [r["value"] for r in lookup_index.lookup(db, "10.20.2.0/24", mode="cidr")] == ["10.20.0.0/16"]
+    assert lookup_index.lookup(db, "10.30.0.1", mode="cidr") == []
+    assert lookup_index.lookup(db, "vpc-0a1b", mode="cidr") == []
+
+def test_auto_picks_cidr_for_addresses_and_prefix_otherwise(db, indexed):
+    assert {r["value"] for r in lookup_index.lookup(db, "3.4.5.0/24")} == {"3.4.5.6"}
+    assert {r["value"] for r in lookup_index.lookup(db, "subnet-0")} == {"subnet-01", "subnet-02"}
+    assert lookup_index.lookup(db, "   ") == []
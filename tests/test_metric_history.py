@@ -0,0 +1,87 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import models
+from app.services import metric_history
+
+DAY = datetime(2026, 10, 19)
+
+def history(db, start, end, resolution, name="db1"):
+    return metric_history.query_history(db, "rds", [name], "cpu_percent", start, end, resolution)[name]
+
+def test_samples_roll_up_into_hours_and_days(db):
+    samples = [(DAY + timedelta(minutes=5 * i), float(i)) for i in range(24)]
+    metric_history.record_samples(db, "rds", "db1", "cpu_percent", samples)
+    db.commit()
+
+    assert history(db, DAY, DAY + timedelta(hours=2), "5m") == samples
+    # 00:00 holds 0..11, 01:00 holds 12..23
+    assert history(db, DAY, DAY + timedelta(days=1), "1h") == [(DAY, 5.5), (DAY + timedelta(hours=1), 17.5)]
+    assert history(db, DAY, DAY + timedelta(days=1), "1d") == [(DAY, 11.5)]
+
+def test_rerecording_a_slot_replaces_it_and_its_rollups(db):
+    metric_history.record_samples(db, "rds", "db1", "cpu_percent", [(DAY, 10.0), (DAY + timedelta(minutes=5), 20.0)])
+    metric_history.record_samples(db, "rds", "db1", "cpu_percent", [(DAY + timedelta(minutes=5), 40.0)])
+    db.commit()
+
+    assert history(db, DAY, DAY + timedelta(hours=1), "5m") == [(DAY, 10.0), (DAY + timedelta(minutes=5), 40.0)]
+    assert history(db, DAY, DAY + timedelta(days=1), "1h") == [(DAY, 25.0)]
+    assert db.query(models.MetricBlock).count() == 3
+
+def test_aware_timestamps_are_stored_in_utc(db):
+    ist = timezone(timedelta(hours=5, minutes=30))
+    metric_history.record_samples(db, "rds", "db1", "cpu_percent", [(datetime(2026, 10, 19, 5, 30, tzinfo=ist), 1.0)])
+    db.commit()
+
+    assert history(db, DAY - timedelta(hours=1), DAY + timedelta(hours=1), "5m") == [(DAY, 1.0)]
+    assert history(db, DAY.replace(tzinfo=timezone.utc), DAY.replace(tzinfo=timezone.utc) + timedelta(minutes=5), "5m") == [(DAY, 1.0)]
+
+def test_query_spans_blocks_and_excludes_the_end(db):
+    samples = [(DAY - timedelta(minutes=5), 1.0), (DAY, 2.0), (DAY + timedelta(minutes=5), 3.0)]
+    metric_history.record_samples(db, "rds", "db1", "cpu_percent", samples)
+    db.commit()
+
+    assert history(db, DAY - timedelta(hours=1), DAY + timedelta(minutes=5), "5m") == samples[:2]
+    assert history(db, DAY, DAY + timedelta(hours=1), "5m", name="db2") == []
+
+def test_evict_expired_keeps_blocks_inside_retention(db):
+    now = DAY + timedelta(hours=12)
+    old = now - metric_history.RETENTION["5m"] - timedelta(days=2)
+    metric_history.record_samples(db, "rds", "db1", "cpu_percent", [(old, 1.0), (now, 2.0)])
+    db.commit()
+
+    # Only the 5m block of the old day is past retention; its 1h and 1d rollups are not
+    assert metric_history.evict_expired(db, now) == 1
+    assert history(db, old, now + timedelta(minutes=5), "5m") == [(now, 2.0)]
+    assert history(db, old, now + timedelta(hours=1), "1h")[0][1] == 1.0
+
+def test_pick_resolution_follows_the_range():
+    assert metric_history.pick_resolution(DAY, DAY + timedelta(days=2)) == "5m"
+    assert metric_history.pick_resolution(DAY, DAY + timedelta(days=30)) == "1h"
+    assert metric_history.pick_resolution(DAY, DAY + timedelta(days=365)) == "1d"
+
+def test_concurrent_writers_to_one_block_keep_every_sample(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}?timeout=30")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    ready = threading.Barrier(6)
+
+    def refresh(n: int):
+        db = Session()
+        ready.wait()
+        metric_history.record_samples(db, "rds", "db1", "cpu_percent", [(DAY + timedelta(minutes=5 * n), float(n))])
+        db.commit()
+        db.close()
+
+    threads = [threading.Thread(target=refresh, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = Session()
+    assert [value for _, value in history(db, DAY, DAY + timedelta(hours=1), "5m")] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    assert history(db, DAY, DAY + timedelta(days=1), "1h") == [(DAY, 2.5)]
+    db.close()
+    engine.dispose()